@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Request, Query, Response
+from fastapi import FastAPI, Request, Query, Response, Header
 from fastapi.responses import StreamingResponse, HTMLResponse, FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -6,7 +6,55 @@ from fastapi.middleware.cors import CORSMiddleware
 from qdrant_client import QdrantClient
 from sentence_transformers import SentenceTransformer
 from api.routes import extract_terms, generate_description, related_terms
-from api.services.ollama_service import get_next_ollama_url
+from api.services.ollama_service import (
+    BACKGROUND_PRIORITY,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_MODEL,
+    ModelResidency,
+    interactive_ollama_call,
+    ollama_backends,
+)
+from api.services import search_sessions
+from api.services.retrieval import build_query_variants, reciprocal_rank_fusion
+from api.services.qdrant_service import (
+    ANY_SCOPE,
+    QDRANT_SEARCH_MODE,
+    PartitionRouter,
+    SearchScope,
+    parse_partitions,
+    parse_scope,
+    sparse_query_vector,
+)
+from api.services import metrics
+from api.services.dedup import DEDUP_CANDIDATES, cluster_candidates, link_duplicates, share_analysis
+from api.services.prefetch import PREFETCH_CANDIDATES, PREFETCH_WAIT_SECONDS, Prefetcher
+from api.services.score_stream import ScoreStreamParser, parse_ndjson_line
+from api.services.tracing import (
+    SEARCH_TIMINGS_IN_COMPLETE,
+    SearchTrace,
+    current_trace,
+    profiling,
+    set_current_trace,
+    trace_span,
+    write_trace,
+)
+from api.services.batch_jobs import (
+    BATCH_JOBS_DIR,
+    BATCH_MAX_BODY_BYTES,
+    BatchJobRunner,
+    BatchJobStore,
+    parse_batch_items,
+    results_as_csv,
+)
+from api.services.static_assets import RenderedPage, asset_manifest, asset_response
+from api.services.patent_details import (
+    PATENT_DETAILS_MAX_AGE,
+    PATENT_DETAILS_MAX_IDS,
+    parse_point_ids,
+    patent_details_cache,
+    to_qdrant_id,
+)
+from vectorization.doc_store import open_store
 import io
 import csv
 import asyncio
@@ -17,8 +65,10 @@ import httpx
 import logging
 import time
 import secrets
+import sqlite3
+import hashlib
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple, Deque
+from typing import Optional, Dict, Any, Tuple, Deque, List, Callable
 from collections import deque, defaultdict
 from starlette import status
 
@@ -61,11 +111,14 @@ app.include_router(generate_description.router)
 app.include_router(related_terms.router)
 app.mount("/static", StaticFiles(directory="frontend"), name="static")
 templates = Jinja2Templates(directory="frontend")
+templates.env.globals["asset_url"] = asset_manifest.url
+templates.env.globals["asset_image"] = asset_manifest.image
+_index_page = RenderedPage(templates, "index.html", "frontend/index.html")
 
 
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
-    if request.method == "OPTIONS" or request.url.path.startswith("/static"):
+    if request.method == "OPTIONS" or request.url.path.startswith(("/static", "/assets")):
         return await call_next(request)
 
     client_host = request.client.host if request.client else "unknown"
@@ -116,10 +169,13 @@ def _cleanup_search_state(now: float) -> None:
             except ValueError:
                 pass
             _search_queue_timestamps.pop(token, None)
+            _search_enqueued_at.pop(token, None)
 
     for token, timestamp in list(_search_active_tokens.items()):
         if now - timestamp > cutoff:
             _search_active_tokens.pop(token, None)
+            _search_enqueued_at.pop(token, None)
+            _search_granted_at.pop(token, None)
             if _search_inflight > 0:
                 _search_inflight -= 1
 
@@ -145,6 +201,7 @@ async def _acquire_search_slot(queue_token: Optional[str]) -> Tuple[bool, str, i
                     _search_queue_timestamps.pop(token, None)
                     _search_inflight += 1
                     _search_active_tokens[token] = now
+                    _search_granted_at[token] = now
                     return True, token, 0
                 return False, token, ahead
 
@@ -152,12 +209,15 @@ async def _acquire_search_slot(queue_token: Optional[str]) -> Tuple[bool, str, i
             token = token or secrets.token_urlsafe(8)
             _search_inflight += 1
             _search_active_tokens[token] = now
+            _search_enqueued_at.setdefault(token, now)
+            _search_granted_at[token] = now
             return True, token, 0
 
         token = token or secrets.token_urlsafe(8)
         if token not in _search_queue:
             _search_queue.append(token)
         _search_queue_timestamps[token] = now
+        _search_enqueued_at.setdefault(token, now)
         ahead = _search_inflight + (_search_queue.index(token) if token in _search_queue else 0)
         return False, token, ahead
 
@@ -177,6 +237,8 @@ async def _release_search_slot(token: Optional[str]) -> None:
         return
     async with _search_queue_lock:
         _search_active_tokens.pop(token, None)
+        _search_enqueued_at.pop(token, None)
+        _search_granted_at.pop(token, None)
         if _search_inflight > 0:
             _search_inflight -= 1
         _cleanup_search_state(time.monotonic())
@@ -198,13 +260,24 @@ if EMBED_MODEL_NAME == str(_DEFAULT_EMBED_MODEL_PATH) and not _DEFAULT_EMBED_MOD
 OLLAMA_URL = os.getenv(
     "OLLAMA_URL", "http://host.docker.internal:11434/api/generate")
 QDRANT_URL = os.getenv("QDRANT_URL", "http://qdrant:6333")
-QDRANT_COLLECTION = "uspto_patents"
+# Local/embedded Qdrant: a directory path, or QDRANT_URL=":memory:" for in-memory
+QDRANT_PATH = os.getenv("QDRANT_PATH")
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "uspto_patents")
+# Per jurisdiction/year-range collections searched in parallel; see qdrant_service
+QDRANT_PARTITIONS = os.getenv("QDRANT_PARTITIONS", "")
 OLLAMA_CONCURRENCY = _safe_int_env("OLLAMA_CONCURRENCY", 32)
 QDRANT_FETCH_COUNT = _safe_int_env("QDRANT_FETCH_COUNT", 100)
 HIGH_SCORE_THRESHOLD = _safe_int_env("HIGH_SCORE_THRESHOLD", 60)
 MEDIUM_SCORE_THRESHOLD = _safe_int_env("MEDIUM_SCORE_THRESHOLD", 80)
 ANALYSIS_PROGRESS_INTERVAL = _safe_int_env("ANALYSIS_PROGRESS_INTERVAL", 1)
 OLLAMA_TIMEOUT_SECONDS = _safe_float_env("OLLAMA_TIMEOUT_SECONDS", 120.0)
+# Stream scoring responses so results go out as soon as their score is known
+OLLAMA_STREAM_SCORES = os.getenv("OLLAMA_STREAM_SCORES", "1").lower() not in ("0", "false", "no")
+# Streamed scores below this end the generation before the reason (0 = off)
+OLLAMA_STOP_BELOW = _safe_int_env("OLLAMA_STOP_BELOW", 0, minimum=0)
+# Keyword endpoint result cap; it never calls Ollama
+KEYWORD_SEARCH_MAX_RESULTS = _safe_int_env("KEYWORD_SEARCH_MAX_RESULTS", 100)
+MULTI_QUERY_RETRIEVAL = os.getenv("MULTI_QUERY_RETRIEVAL", "1").lower() not in ("0", "false", "no")
 VECTOR_LOG_PATH = os.getenv(
     "VECTOR_LOG_PATH", "/mnt/storage_pool/global/vectorization_log.csv"
 )
@@ -216,16 +289,25 @@ _rate_limit_records: Dict[str, Deque[float]] = defaultdict(deque)
 _rate_limit_lock = asyncio.Lock()
 
 SEARCH_MAX_CONCURRENT = _safe_int_env("SEARCH_MAX_CONCURRENT", 5)
+# Longest accepted invention description, and largest JSON search body
+SEARCH_DESCRIPTION_MAX_CHARS = _safe_int_env("SEARCH_DESCRIPTION_MAX_CHARS", 10000)
+SEARCH_BODY_MAX_BYTES = _safe_int_env("SEARCH_BODY_MAX_BYTES", 64 * 1024)
 SEARCH_QUEUE_STALE_SECONDS = _safe_int_env("SEARCH_QUEUE_STALE_SECONDS", 180)
 
 _search_queue_lock = asyncio.Lock()
 _search_queue: Deque[str] = deque()
 _search_queue_timestamps: Dict[str, float] = {}
 _search_active_tokens: Dict[str, float] = {}
+# First enqueue and slot grant times per token, for the search trace
+_search_enqueued_at: Dict[str, float] = {}
+_search_granted_at: Dict[str, float] = {}
 _search_inflight = 0
 
-_qdrant = QdrantClient(url=QDRANT_URL)
+_qdrant = QdrantClient(path=QDRANT_PATH) if QDRANT_PATH else QdrantClient(location=QDRANT_URL)
+_qdrant_router = PartitionRouter(_qdrant, parse_partitions(QDRANT_PARTITIONS, QDRANT_COLLECTION))
 _model = SentenceTransformer(EMBED_MODEL_NAME)
+# Abstracts and file paths of slim-payload collections (DOC_STORE_PATH)
+_doc_store = open_store(readonly=True)
 logger = logging.getLogger(__name__)
 HTTPX_LIMITS = httpx.Limits(
     max_connections=max(OLLAMA_CONCURRENCY * 8, 1),
@@ -246,8 +328,9 @@ async def get_httpx_client() -> httpx.AsyncClient:
     return _httpx_client
 
 
-def format_sse(event: str, data: Dict[str, Any]) -> str:
-    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    id_line = f"id: {event_id}\n" if event_id else ""
+    return f"{id_line}event: {event}\ndata: {json.dumps(data)}\n\n"
 
 # ---- HELPERS ----
 
@@ -271,17 +354,8 @@ def read_total_patents_from_log() -> Optional[int]:
 
 def read_total_patents_from_qdrant() -> Optional[int]:
     try:
-        count_result = _qdrant.count(
-            collection_name=QDRANT_COLLECTION, exact=True)
-        count_value = getattr(count_result, "count", None)
-        if isinstance(count_value, (int, float)):
-            return int(count_value)
-        # Some Qdrant versions expose points_count only via get_collection
-        collection_info = _qdrant.get_collection(
-            collection_name=QDRANT_COLLECTION)
-        fallback_value = getattr(collection_info, "points_count", None)
-        if isinstance(fallback_value, (int, float)):
-            return int(fallback_value)
+        # Summed over all partitions
+        return _qdrant_router.count()
     except Exception as exc:
         logger.warning(
             "Failed to fetch total patent count from Qdrant: %s", exc)
@@ -292,30 +366,175 @@ def embed_text_sync(text: str):
     return _model.encode(text).tolist()
 
 
-def qdrant_search(query_vector, top_k=10):
-    points = _qdrant.search(collection_name=QDRANT_COLLECTION,
-                            query_vector=query_vector, limit=top_k, with_payload=True)
+def embed_texts_sync(texts):
+    return _model.encode(list(texts)).tolist()
+
+
+def patent_details_from_payload(point_id, payload: Dict[str, Any]) -> Dict[str, Any]:
+    patent_number = str(payload.get("patentNumber", "")).strip()
+    if patent_number and not patent_number.upper().startswith("US"):
+        patent_number = f"US{patent_number}"
+    google_patent_url = f"https://patents.google.com/patent/{patent_number}/en" if patent_number else None
+    return {
+        "id": str(point_id),
+        "title": payload.get("title"),
+        "abstract": payload.get("abstract"),
+        "filingDate": payload.get("filingDate"),
+        "patentNumber": patent_number,
+        "googlePatentUrl": google_patent_url,
+    }
+
+
+_DETAIL_FIELDS = ("id", "title", "abstract", "filingDate", "patentNumber", "googlePatentUrl")
+
+
+def patents_from_points(points):
+    """Candidates from search hits; `hydrate_patents` adds what slim payloads leave out."""
     results = []
     for p in points:
         payload = p.payload or {}
-        patent_number = str(payload.get("patentNumber", "")).strip()
-        if patent_number and not patent_number.upper().startswith("US"):
-            patent_number = f"US{patent_number}"
-        google_patent_url = f"https://patents.google.com/patent/{patent_number}/en" if patent_number else None
-        results.append({
-            "title": payload.get("title"),
-            "abstract": payload.get("abstract"),
-            "filingDate": payload.get("filingDate"),
-            "patentNumber": patent_number,
-            "googlePatentUrl": google_patent_url,
+        patent = patent_details_from_payload(p.id, payload)
+        patent.update({
             "preview": (payload.get("abstract") or "")[:400],
             "file_path": payload.get("file_path"),
             "score": None,
             "reason": "Pending"
         })
+        results.append(patent)
     return results
 
 
+def hydrate_patents(patents, fields=("abstract", "file_path")):
+    """
+    Fills `fields` (and the preview) from the doc store, in one batch, for
+    patents whose payload did not carry an abstract. Call it only for the
+    candidates that get scored or shown. Also warms the details cache.
+    """
+    missing = [patent for patent in patents if patent.get("abstract") is None]
+    if _doc_store is not None and missing:
+        try:
+            with metrics.DOC_STORE_SECONDS.time():
+                documents = _doc_store.get_many([patent["id"] for patent in missing])
+        except sqlite3.Error as exc:
+            logger.warning("Doc store lookup failed: %s", exc)
+            documents = {}
+        for patent in missing:
+            document = documents.get(patent["id"])
+            if not document:
+                continue
+            patent.update({field: document.get(field) for field in fields})
+            if "preview" in patent:
+                patent["preview"] = (document.get("abstract") or "")[:400]
+    # Warm the details cache so compact clients rarely hit Qdrant again
+    patent_details_cache.put_many(
+        {field: patent.get(field) for field in _DETAIL_FIELDS} for patent in patents
+    )
+    return patents
+
+
+def search_vectors(query_vectors, query_texts=None, mode: str = QDRANT_SEARCH_MODE):
+    """
+    Dense and sparse query lists for `PartitionRouter.search_batch` in
+    `mode`. Without texts, or in sparse mode when a text has no searchable
+    terms, the search stays dense.
+    """
+    if mode == "dense" or not query_texts:
+        return query_vectors, None
+    sparse_vectors = [sparse_query_vector(text) for text in query_texts]
+    if mode == "sparse":
+        if any(vector is None for vector in sparse_vectors):
+            return query_vectors, None
+        return None, sparse_vectors
+    return query_vectors, sparse_vectors
+
+
+def qdrant_search(query_vector, top_k=10, scope: SearchScope = ANY_SCOPE, query_text: Optional[str] = None):
+    """Candidates for one query; `query_text` adds the lexical vector in sparse and hybrid mode."""
+    return qdrant_search_batch([query_vector], top_k, scope, [query_text] if query_text else None)[0]
+
+
+def _candidate_lists(query_vectors, top_k, scope: SearchScope, query_texts=None):
+    dense, sparse = search_vectors(query_vectors, query_texts)
+    responses = _qdrant_router.search_batch(dense, top_k, scope, sparse)
+    return [patents_from_points(points) for points in responses]
+
+
+def qdrant_search_batch(query_vectors, top_k=10, scope: SearchScope = ANY_SCOPE, query_texts=None):
+    """One `search_batch` round-trip per partition, a merged candidate list per query vector."""
+    return [
+        hydrate_patents(patents)
+        for patents in _candidate_lists(query_vectors, top_k, scope, query_texts)
+    ]
+
+
+def qdrant_multi_search(query_vectors, top_k=10, scope: SearchScope = ANY_SCOPE, query_texts=None):
+    """
+    One `search_batch` round-trip for all query variants, merged with
+    reciprocal-rank fusion and cut back to `top_k` candidates. Only the
+    fused candidates are hydrated.
+    """
+    ranked_lists = _candidate_lists(query_vectors, top_k, scope, query_texts)
+    fused = reciprocal_rank_fusion(ranked_lists, key=lambda patent: patent["id"], limit=top_k)
+    return hydrate_patents(fused)
+
+
+def qdrant_keyword_search(query_text: str, top_k: int, scope: SearchScope = ANY_SCOPE):
+    """
+    Sparse-only search: scored patent details, best first. None when no
+    partition in the scope has lexical vectors.
+    """
+    if not _qdrant_router.supports_sparse(scope):
+        return None
+    sparse_vector = sparse_query_vector(query_text)
+    if sparse_vector is None:
+        return []
+    points = _qdrant_router.search(None, top_k, scope, sparse_vector=sparse_vector)
+    details = hydrate_patents(
+        [patent_details_from_payload(p.id, p.payload or {}) for p in points], fields=("abstract",)
+    )
+    return [
+        {
+            **{key: value for key, value in patent.items() if key != "abstract"},
+            "preview": (patent.get("abstract") or "")[:400],
+            "score": round(point.score, 4),
+        }
+        for patent, point in zip(details, points)
+    ]
+
+
+def candidate_vectors(point_ids):
+    """Main vectors of the candidates, in order; None where a point has none."""
+    points = _qdrant_router.retrieve(
+        [to_qdrant_id(point_id) for point_id in point_ids], with_payload=False, with_vectors=True
+    )
+    by_id = {}
+    for point in points:
+        vector = point.vector
+        if isinstance(vector, dict):
+            vector = vector.get("")
+        by_id[str(point.id)] = vector
+    return [by_id.get(str(point_id)) for point_id in point_ids]
+
+
+def qdrant_retrieve_details(point_ids):
+    points = _qdrant_router.retrieve([to_qdrant_id(point_id) for point_id in point_ids])
+    return hydrate_patents(
+        [patent_details_from_payload(p.id, p.payload or {}) for p in points], fields=("abstract",)
+    )
+
+
+def compact_result(patent: Dict[str, Any]) -> Dict[str, Any]:
+    """Result event body for compact streams; details come from /api/patents."""
+    result = {
+        "id": patent.get("id"),
+        "score": patent.get("score"),
+        "reason": patent.get("reason"),
+    }
+    if patent.get("duplicateOf"):
+        result["duplicateOf"] = patent["duplicateOf"]
+    return result
+
+
 def extract_json_from_text(text):
     match = re.search(r'\{.*\}', text, re.DOTALL)
     if not match:
@@ -330,14 +549,25 @@ def extract_json_from_text(text):
             return None
 
 
-async def analyze_patent_with_ollama_async(
-    client: httpx.AsyncClient, user_description: str, patent: dict
-):
-    """
-    Analyzes a single patent asynchronously using httpx.
-    This function is pure — it should NOT print or log stats.
-    """
-    prompt = f"""
+def ollama_timing_attributes(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Prompt/eval/load durations (ns in Ollama's response) as trace attributes."""
+    attributes = {}
+    for field, name in (
+        ("prompt_eval_duration", "promptEvalMs"),
+        ("eval_duration", "evalMs"),
+        ("load_duration", "loadMs"),
+    ):
+        if isinstance(body.get(field), (int, float)):
+            attributes[name] = round(body[field] / 1e6, 1)
+    for field, name in (("prompt_eval_count", "promptTokens"), ("eval_count", "evalTokens")):
+        if isinstance(body.get(field), int):
+            attributes[name] = body[field]
+    return attributes
+
+
+def build_scoring_prompt(user_description: str, patent: dict) -> str:
+    """Prompt for one candidate."""
+    return f"""
 You are acting as a PATENT ATTORNEY performing prior-art relevance analysis.
 
 Your goal is to determine how relevant the following patent is as prior art to the user's invention.
@@ -370,83 +600,271 @@ CANDIDATE PATENT:
 Title: {patent['title']}
 Abstract: {patent['abstract']}
 """
-    try:
-        url = get_next_ollama_url()
-        response = await client.post(
-            url,
-            json={
-                "model": "llama3.1-gpu-optimized:latest",
-                "prompt": prompt,
-                "stream": False,
-            },
-            timeout=OLLAMA_TIMEOUT_SECONDS,
-        )
-        response.raise_for_status()
 
-        full_response_text = response.json().get("response", "")
-        analysis_json = extract_json_from_text(full_response_text)
 
-        if analysis_json and "score" in analysis_json:
-            raw_score = analysis_json.get("score")
-            try:
-                score_value = float(raw_score)
-            except (TypeError, ValueError):
-                score_value = None
-
-            if score_value is not None:
-                patent["score"] = round(score_value, 2)
-                reason = analysis_json.get("reason")
-                if reason:
-                    patent["reason"] = reason
-            else:
-                patent.update({
-                    "score": None,
-                    "reason": "Failed to parse analysis."
-                })
+def apply_analysis(patent: dict, response_text: str, backend: str) -> dict:
+    """Sets `score` and `reason` on the candidate from the model's full response."""
+    analysis_json = extract_json_from_text(response_text)
+
+    if analysis_json and "score" in analysis_json:
+        raw_score = analysis_json.get("score")
+        try:
+            score_value = float(raw_score)
+        except (TypeError, ValueError):
+            score_value = None
+
+        if score_value is not None:
+            patent["score"] = round(score_value, 2)
+            reason = analysis_json.get("reason")
+            if reason:
+                patent["reason"] = reason
         else:
+            metrics.OLLAMA_PARSE_FAILURES.labels(backend).inc()
             patent.update({
                 "score": None,
                 "reason": "Failed to parse analysis."
             })
+    else:
+        metrics.OLLAMA_PARSE_FAILURES.labels(backend).inc()
+        patent.update({
+            "score": None,
+            "reason": "Failed to parse analysis."
+        })
+    return patent
 
-        return patent
 
-    except asyncio.CancelledError:
-        raise
-    except httpx.RequestError as e:
+def scoring_failed(patent: dict, backend: str, error: Exception) -> dict:
+    """Records a failed scoring call on the candidate and in the metrics."""
+    if isinstance(error, httpx.RequestError):
+        if isinstance(error, httpx.TimeoutException):
+            metrics.OLLAMA_TIMEOUTS.labels(backend).inc()
+        else:
+            metrics.OLLAMA_ERRORS.labels(backend).inc()
         print(
-            f"[ERROR][OLLAMA] Request failed for {patent.get('patentNumber')}: {e}")
+            f"[ERROR][OLLAMA] Request failed for {patent.get('patentNumber')}: {error}")
         patent.update({
             "score": None,
-            "reason": f"Analysis failed or timed out: {e}"
+            "reason": f"Analysis failed or timed out: {error}"
         })
-        return patent
-    except Exception as e:
+    else:
+        metrics.OLLAMA_ERRORS.labels(backend).inc()
         print(
-            f"[ERROR][OLLAMA] Unexpected error for {patent.get('patentNumber')}: {e}")
+            f"[ERROR][OLLAMA] Unexpected error for {patent.get('patentNumber')}: {error}")
         patent.update({
             "score": None,
-            "reason": f"Unexpected error: {e}"
+            "reason": f"Unexpected error: {error}"
         })
+    return patent
+
+
+async def analyze_patent_with_ollama_async(
+    client: httpx.AsyncClient, user_description: str, patent: dict, priority: int = 0
+):
+    """
+    Analyzes a single patent asynchronously using httpx.
+    This function is pure — it should NOT print or log stats.
+    `priority` orders the wait for a backend slot (lower goes first).
+    """
+    prompt = build_scoring_prompt(user_description, patent)
+    backend = "unknown"
+    try:
+        async with ollama_backends.lease(priority) as lease:
+            url, backend = lease.url, lease.backend
+            with trace_span("score", backend=backend) as span, \
+                    metrics.OLLAMA_OUTSTANDING.labels(backend).track_inprogress(), \
+                    metrics.OLLAMA_SECONDS.labels(backend).time():
+                span["status"] = "error"
+                span["limit"] = int(lease.limit.limit)
+                response = await client.post(
+                    url,
+                    json={
+                        "model": OLLAMA_MODEL,
+                        "keep_alive": OLLAMA_KEEP_ALIVE,
+                        "prompt": prompt,
+                        "stream": False,
+                    },
+                    timeout=OLLAMA_TIMEOUT_SECONDS,
+                )
+                response.raise_for_status()
+                body = response.json()
+                span.update(ollama_timing_attributes(body))
+                lease.observe(body)
+                span["status"] = "ok"
+
+        return apply_analysis(patent, body.get("response", ""), backend)
+
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        return scoring_failed(patent, backend, e)
+
+
+async def analyze_patent_with_ollama_streaming(
+    client: httpx.AsyncClient,
+    user_description: str,
+    patent: dict,
+    on_score: Optional[Callable[[dict], None]] = None,
+    stop_below: int = OLLAMA_STOP_BELOW,
+    priority: int = 0,
+):
+    """
+    Like `analyze_patent_with_ollama_async`, but reads Ollama's NDJSON token
+    stream and calls `on_score(patent)` as soon as the score is complete,
+    while the reason is still being generated. A score under `stop_below`
+    ends the generation there; the reason is left empty. The time to the
+    first token is the latency sample for the backend's adaptive limit.
+    """
+    prompt = build_scoring_prompt(user_description, patent)
+    backend = "unknown"
+    parser = ScoreStreamParser()
+    stopped = False
+    try:
+        async with ollama_backends.lease(priority) as lease:
+            url, backend = lease.url, lease.backend
+            with trace_span("score", backend=backend, streamed=True) as span, \
+                    metrics.OLLAMA_OUTSTANDING.labels(backend).track_inprogress(), \
+                    metrics.OLLAMA_SECONDS.labels(backend).time():
+                span["status"] = "error"
+                span["limit"] = int(lease.limit.limit)
+                started = time.perf_counter()
+                async with client.stream(
+                    "POST",
+                    url,
+                    json={
+                        "model": OLLAMA_MODEL,
+                        "keep_alive": OLLAMA_KEEP_ALIVE,
+                        "prompt": prompt,
+                        "stream": True,
+                    },
+                    timeout=OLLAMA_TIMEOUT_SECONDS,
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        body = parse_ndjson_line(line)
+                        if body is None:
+                            continue
+                        if body.get("response"):
+                            lease.first_token()
+                        score = parser.feed(body.get("response", ""))
+                        if score is not None:
+                            elapsed = time.perf_counter() - started
+                            span["scoreMs"] = round(elapsed * 1000, 1)
+                            metrics.OLLAMA_SCORE_SECONDS.labels(backend).observe(elapsed)
+                            patent["score"] = round(score, 2)
+                            if on_score is not None:
+                                on_score(patent)
+                            if stop_below and score < stop_below:
+                                # Leaving the block closes the connection, which
+                                # makes Ollama abort the generation
+                                stopped = True
+                                break
+                        if body.get("done"):
+                            span.update(ollama_timing_attributes(body))
+                            lease.observe(body)
+                            break
+                span["stoppedEarly"] = stopped
+                span["status"] = "ok"
+
+        if stopped:
+            metrics.OLLAMA_EARLY_STOPS.labels(backend).inc()
+            patent["reason"] = None
+            return patent
+        if parser.score is None:
+            return apply_analysis(patent, parser.text, backend)
+        analysis_json = extract_json_from_text(parser.text) or {}
+        patent["reason"] = analysis_json.get("reason") or None
         return patent
 
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        scoring_failed(patent, backend, e)
+        if parser.score is not None:
+            # The score already went out; only the reason is lost
+            patent.update({"score": round(parser.score, 2), "reason": None})
+        return patent
 
-async def event_stream(user_description: str, max_display_results: int):
+
+async def event_stream(
+    user_description: str,
+    max_display_results: int,
+    compact: bool = False,
+    query_terms: Optional[Dict[str, Any]] = None,
+    scope: SearchScope = ANY_SCOPE,
+    prefetch_key: Optional[str] = None,
+):
     """
     Runs the end-to-end embedding, retrieval, and analysis pipeline.
-    Streams incremental results via SSE to the frontend.
+    Yields `(event, data)` pairs; `_run_search_session` records them in the
+    search session log that SSE clients stream from. With `compact`, result
+    events carry only the point ID, score and reason. `query_terms` (extracted
+    and related terms) turn on multi-query retrieval. `scope` limits
+    retrieval to some jurisdictions and a filing date range. With streamed
+    scoring, a result goes out as soon as its score is known and a `reason`
+    event with the same index follows once the reason is generated. Near-
+    duplicate candidates are scored once: each sibling's result (with
+    `duplicateOf`) follows its representative's. With a `prefetch_key` whose
+    draft was prefetched for the same or a close enough search, embedding,
+    retrieval and pre-scored calls are taken from that warm state.
     """
     try:
         print("🟣 SEARCH EVENT_STREAM TRIGGERED")
-        yield format_sse("log", {"message": "[SEARCH] Starting search..."})
-        qvec = await asyncio.to_thread(embed_text_sync, user_description)
-
-        yield format_sse("log", {"message": "[SEARCH] Finding candidate patents..."})
-        patents = await asyncio.to_thread(qdrant_search, qvec, QDRANT_FETCH_COUNT)
+        yield ("log", {"message": "[SEARCH] Starting search..."})
+        variants = (
+            build_query_variants(user_description, query_terms)
+            if MULTI_QUERY_RETRIEVAL and query_terms
+            else [user_description]
+        )
+        # Candidates retrieved for the draft while the user was writing
+        warm = _prefetcher.get(prefetch_key, scope) if PREFETCH_CANDIDATES else None
+        reuse = None
+        if warm is not None and warm.same_search(variants, scope):
+            with trace_span("prefetch_wait"):
+                if await warm.wait_retrieved(PREFETCH_WAIT_SECONDS):
+                    reuse = "exact"
+        if reuse == "exact":
+            qvecs = warm.query_vectors
+        else:
+            with trace_span("embed", variants=len(variants)), metrics.EMBED_SECONDS.time():
+                if len(variants) > 1:
+                    qvecs = await asyncio.to_thread(embed_texts_sync, variants)
+                else:
+                    qvecs = [await asyncio.to_thread(embed_text_sync, user_description)]
+            if warm is not None and warm.is_close(qvecs):
+                reuse = "close"
+        prescored: Dict[str, Dict[str, Any]] = {}
+        warm_vectors = None
+        if warm is not None:
+            # The draft is superseded; only its results are still of use
+            warm.stop()
+            metrics.PREFETCH_REUSE.labels(reuse or "miss").inc()
+            trace = current_trace()
+            if trace is not None:
+                trace.attributes["prefetch"] = reuse or "miss"
+
+        yield ("log", {"message": "[SEARCH] Finding candidate patents..."})
+        if reuse:
+            patents = warm.candidates()
+            warm_vectors = warm.candidate_vectors
+            prescored = warm.prescored(user_description)
+        else:
+            with trace_span("retrieve") as span, metrics.QDRANT_SECONDS.time():
+                span["partitions"] = len(_qdrant_router.select(scope))
+                span["filtered"] = scope.is_filtered
+                span["mode"] = QDRANT_SEARCH_MODE
+                if len(variants) > 1:
+                    patents = await asyncio.to_thread(
+                        qdrant_multi_search, qvecs, QDRANT_FETCH_COUNT, scope, variants
+                    )
+                else:
+                    patents = await asyncio.to_thread(
+                        qdrant_search, qvecs[0], QDRANT_FETCH_COUNT, scope, user_description
+                    )
+                span["candidates"] = len(patents)
 
         if not patents:
-            yield format_sse("log", {"message": "[SEARCH] No candidates found."})
-            yield format_sse("complete", {
+            yield ("log", {"message": "[SEARCH] No candidates found."})
+            yield ("complete", {
                 "message": "Search complete",
                 "results": 0,
                 "analyzed": 0
@@ -454,46 +872,125 @@ async def event_stream(user_description: str, max_display_results: int):
             return
 
         total_candidates = len(patents)
-        yield format_sse("log", {
+        yield ("log", {
             "message": f"[SEARCH] Found candidates, starting analysis..."
         })
 
+        # Continuations and republications share one scoring call
+        representatives = list(range(total_candidates))
+        siblings: Dict[int, List[int]] = {}
+        collapsed = 0
+        if DEDUP_CANDIDATES and total_candidates > 1:
+            with trace_span("dedup") as span:
+                vectors = warm_vectors
+                try:
+                    if vectors is None:
+                        vectors = await asyncio.to_thread(candidate_vectors, [p["id"] for p in patents])
+                except Exception as exc:
+                    logger.warning("Candidate vectors unavailable, deduplicating by text only: %s", exc)
+                clusters = cluster_candidates(patents, vectors)
+                collapsed = link_duplicates(patents, clusters)
+                representatives = [cluster[0] for cluster in clusters]
+                siblings = {cluster[0]: cluster[1:] for cluster in clusters if len(cluster) > 1}
+                span["clusters"] = len(clusters)
+                span["collapsed"] = collapsed
+            metrics.DEDUP_COLLAPSED.inc(collapsed)
+            if collapsed:
+                yield ("log", {
+                    "message": f"[SEARCH] {collapsed} near-duplicate candidates share a score with another"
+                })
+
         client = await get_httpx_client()
         analyzed_patents = []
         processed = 0
         semaphore = asyncio.Semaphore(OLLAMA_CONCURRENCY)
 
+        # Scoring tasks report ("score", idx, patent) as soon as a streamed
+        # score is known and ("done", idx, patent) when the call finishes
+        updates: asyncio.Queue = asyncio.Queue()
+
         async def analyze_with_limit(idx, patent):
-            async with semaphore:
-                analyzed = await analyze_patent_with_ollama_async(client, user_description, patent)
-                return idx, analyzed
+            try:
+                if patent["id"] in prescored:
+                    patent.update(prescored[patent["id"]])
+                    return
+                async with semaphore, interactive_ollama_call():
+                    if OLLAMA_STREAM_SCORES:
+                        await analyze_patent_with_ollama_streaming(
+                            client, user_description, patent,
+                            on_score=lambda scored: updates.put_nowait(("score", idx, scored)),
+                            priority=idx,
+                        )
+                    else:
+                        await analyze_patent_with_ollama_async(client, user_description, patent, priority=idx)
+            finally:
+                updates.put_nowait(("done", idx, patent))
+
+        def result_event(idx, patent):
+            return ("result", {
+                "index": idx,
+                "result": compact_result(patent) if compact else patent,
+                "original_index": idx
+            })
+
+        def cluster_results(idx, patent):
+            """Result events of a representative and then of its near-duplicates."""
+            events = [result_event(idx, patent)]
+            for sibling_idx in siblings.get(idx, ()):
+                events.append(result_event(sibling_idx, share_analysis(patent, patents[sibling_idx])))
+            return events
 
         tasks = [
-            asyncio.create_task(analyze_with_limit(idx, patent))
-            for idx, patent in enumerate(patents)
+            asyncio.create_task(analyze_with_limit(idx, patents[idx]))
+            for idx in representatives
         ]
+        prescored_used = sum(patents[idx]["id"] in prescored for idx in representatives)
+        metrics.PREFETCH_PRESCORED.inc(prescored_used)
+        # Reason sent with each result already published from its score
+        published_reasons: Dict[int, Any] = {}
 
         # Process results as they complete
-        for future in asyncio.as_completed(tasks):
-            idx, analyzed_patent = await future
-            processed += 1
-
-            # Send each result as soon as it's done
-            if analyzed_patent.get("score") is not None:
-                yield format_sse("result", {
-                    "index": idx,
-                    "result": analyzed_patent,
-                    "original_index": idx
-                })
-                await asyncio.sleep(0)
-
-            # Log progress
-            if ANALYSIS_PROGRESS_INTERVAL and processed % ANALYSIS_PROGRESS_INTERVAL == 0:
-                yield format_sse("log", {
-                    "message": f"[ANALYZE] Discovering patents…"
-                })
-
-            analyzed_patents.append(analyzed_patent)
+        try:
+            while processed < len(tasks):
+                kind, idx, analyzed_patent = await updates.get()
+                if kind == "score":
+                    # Send the result on its score; the reason follows
+                    published_reasons[idx] = analyzed_patent.get("reason")
+                    for event in cluster_results(idx, analyzed_patent):
+                        yield event
+                    await asyncio.sleep(0)
+                    continue
+                processed += 1
+
+                # Send each result as soon as it's done
+                if analyzed_patent.get("score") is not None:
+                    if idx not in published_reasons:
+                        for event in cluster_results(idx, analyzed_patent):
+                            yield event
+                        await asyncio.sleep(0)
+                    elif analyzed_patent.get("reason") != published_reasons[idx]:
+                        for reason_idx in [idx, *siblings.get(idx, ())]:
+                            yield ("reason", {
+                                "index": reason_idx,
+                                "id": patents[reason_idx].get("id"),
+                                "reason": analyzed_patent.get("reason"),
+                            })
+
+                # Log progress
+                if ANALYSIS_PROGRESS_INTERVAL and processed % ANALYSIS_PROGRESS_INTERVAL == 0:
+                    yield ("log", {
+                        "message": f"[ANALYZE] Discovering patents…"
+                    })
+
+                analyzed_patents.append(analyzed_patent)
+                analyzed_patents.extend(
+                    share_analysis(analyzed_patent, patents[sibling_idx])
+                    for sibling_idx in siblings.get(idx, ())
+                )
+        finally:
+            # A cancelled session must not leave scoring calls running on Ollama
+            for task in tasks:
+                task.cancel()
 
         # ---- Summarize scores (for debugging / analytics) ----
         scored_patents = [
@@ -513,7 +1010,7 @@ async def event_stream(user_description: str, max_display_results: int):
                 print(f"  Mean:   {avg}")
                 print(f"  Median: {med}\n")
 
-                yield format_sse("log", {
+                yield ("log", {
                     "message": f"[SUMMARY] Score range {low}–{high}, mean={avg}, median={med}"
                 })
             else:
@@ -536,36 +1033,162 @@ async def event_stream(user_description: str, max_display_results: int):
 
         top_results = high_confidence_total[:max_display_results]
 
-        yield format_sse("complete", {
+        complete = {
             "message": "Search complete",
             "results": len(top_results),
-            "analyzed": processed,
+            "analyzed": len(analyzed_patents),
+            "scoring_calls": processed - prescored_used,
+            "duplicates_collapsed": collapsed,
+            "prefetch": reuse,
+            "prescored": prescored_used,
             "high_confidence": len(high_confidence_total),
             "medium_confidence": len(medium_confidence_total),
             "score_threshold": HIGH_SCORE_THRESHOLD,
             "total_candidates": total_candidates
-        })
+        }
+        trace = current_trace()
+        if SEARCH_TIMINGS_IN_COMPLETE and trace is not None:
+            complete["timings"] = trace.summary()
+        yield ("complete", complete)
 
     except Exception as e:
         import traceback
         print(
             f"[ERROR][SEARCH] event_stream failed:\n{traceback.format_exc()}")
-        yield format_sse("error", {"message": str(e)})
+        yield ("error", {"message": str(e)})
+
+
+async def _run_search_session(
+    session: search_sessions.SearchSession,
+    user_description: str,
+    max_display_results: int,
+    compact: bool,
+    query_terms: Optional[Dict[str, Any]],
+    scope: SearchScope = ANY_SCOPE,
+    prefetch_key: Optional[str] = None,
+) -> None:
+    outcome = "error"
+    trace = SearchTrace()
+    trace.attributes["session"] = session.id
+    started_at = time.monotonic()
+    enqueued_at = _search_enqueued_at.get(session.queue_token or "")
+    granted_at = _search_granted_at.get(session.queue_token or "")
+    if enqueued_at is not None and granted_at is not None:
+        trace.add_span("queue_wait", enqueued_at, granted_at)
+        trace.add_span("slot_to_stream", granted_at, started_at)
+    set_current_trace(trace)
+    profile = profiling.maybe_start(trace)
+    try:
+        with trace.span("stream"):
+            async for event, data in event_stream(
+                user_description, max_display_results, compact, query_terms, scope, prefetch_key
+            ):
+                await session.append(event, data)
+                if event == "complete":
+                    outcome = "completed"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        print(f"[SEARCH] Session {session.id} cancelled")
+    finally:
+        profiling.finish(trace, profile)
+        trace.attributes["outcome"] = outcome
+        write_trace(trace)
+        metrics.SEARCHES.labels(outcome).inc()
+        await session.finish()
+        await _release_search_slot(session.queue_token)
+
 
+async def _stream_search_session(session: search_sessions.SearchSession, after_seq: int):
+    async for seq, event, data in session.subscribe(after_seq):
+        yield format_sse(event, data, session.event_id(seq))
 
-async def search_stream_with_release(
-    user_description: str, max_display_results: int, queue_token: Optional[str]
+
+def _search_streaming_response(session: search_sessions.SearchSession, after_seq: int = 0):
+    response = StreamingResponse(
+        _stream_search_session(session, after_seq),
+        media_type="text/event-stream",
+    )
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Search-Session"] = session.id
+    return response
+
+
+async def _settle_replay_token(session: search_sessions.SearchSession, queue_token: Optional[str]) -> None:
+    """
+    A replay starts no search. The running session's own token is kept
+    alive; a slot granted to any other token is given back.
+    """
+    if not queue_token:
+        return
+    if queue_token == session.queue_token and not session.done:
+        await _confirm_active_search_token(queue_token)
+    elif await _confirm_active_search_token(queue_token):
+        await _release_search_slot(queue_token)
+
+
+async def _start_or_resume_search(
+    user_description: str,
+    max_display_results: int,
+    queue_token: Optional[str],
+    last_event_id: Optional[str],
+    compact: bool = False,
+    query_terms: Optional[Dict[str, Any]] = None,
+    scope: SearchScope = ANY_SCOPE,
+    prefetch_key: Optional[str] = None,
 ):
-    try:
-        async for chunk in event_stream(user_description, max_display_results):
-            yield chunk
-    finally:
+    query = (user_description, max_display_results, compact, query_terms, scope)
+    session_id, after_seq = search_sessions.parse_event_id(last_event_id)
+    session = search_sessions.get_session(session_id)
+    if session is None and not session_id:
+        # A stream that dropped before its first event carries no id yet
+        session = search_sessions.find_session_for_token(queue_token, query)
+    if session is not None:
+        # Reconnect or page reload: replay the missed events and follow the
+        # run that is already in progress rather than searching again.
+        await _settle_replay_token(session, queue_token)
+        return _search_streaming_response(session, after_seq)
+    if session_id:
+        return JSONResponse(
+            status_code=status.HTTP_410_GONE,
+            content={"error": "Search session has expired."},
+        )
+
+    if not queue_token:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": "queueToken is required."},
+        )
+
+    if not await _confirm_active_search_token(queue_token):
+        await _release_search_slot(queue_token)
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"error": "Queue token is not active."},
+        )
+    error = _description_error(user_description)
+    if error is not None:
         await _release_search_slot(queue_token)
+        return error
+
+    session = search_sessions.create_session(queue_token, query)
+    session.task = asyncio.create_task(
+        _run_search_session(
+            session, user_description, max_display_results, compact, query_terms, scope, prefetch_key
+        )
+    )
+    return _search_streaming_response(session)
 
 
 @app.get("/", response_class=HTMLResponse)
 async def serve_frontend(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    # Rendered once per template/manifest change, precompressed
+    return _index_page.response(request)
+
+
+@app.get("/assets/{path:path}")
+async def serve_asset(request: Request, path: str):
+    """Content-hashed build output: immutable caching, br/gzip negotiation."""
+    return asset_response(request, path)
 
 
 @app.post("/api/search/enqueue")
@@ -604,31 +1227,96 @@ async def enqueue_search(request: Request):
     )
 
 
-@app.post("/api/search")
-async def search_api(request: Request):
-    body = await request.json()
-    queue_token = body.get("queueToken")
-    if not queue_token:
-        return JSONResponse(
+def _scope_or_error(date_from, date_to, jurisdictions, excluded_numbers=None):
+    """Search scope from request parameters, or a 400 response."""
+    if isinstance(jurisdictions, str):
+        jurisdictions = [jurisdictions]
+    if isinstance(excluded_numbers, str):
+        excluded_numbers = [excluded_numbers]
+    try:
+        return parse_scope(date_from, date_to, jurisdictions, excluded_numbers), None
+    except ValueError as exc:
+        return None, JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
-            content={"error": "queueToken is required."},
+            content={"error": str(exc)},
         )
 
-    if not await _confirm_active_search_token(queue_token):
-        await _release_search_slot(queue_token)
-        return JSONResponse(
-            status_code=status.HTTP_409_CONFLICT,
-            content={"error": "Queue token is not active."},
+
+def _query_terms_from_body(body: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "technology": body.get("term") or [],
+        "subject": body.get("subject") or [],
+        "related": body.get("related") or [],
+        "description": body.get("description") or "",
+    }
+
+
+def _description_error(user_description: str) -> Optional[JSONResponse]:
+    """A 400 response for a description over `SEARCH_DESCRIPTION_MAX_CHARS`."""
+    if len(user_description) <= SEARCH_DESCRIPTION_MAX_CHARS:
+        return None
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"error": f"userDescription is longer than {SEARCH_DESCRIPTION_MAX_CHARS} characters."},
+    )
+
+
+async def _read_body(request: Request, max_bytes: int) -> Tuple[Optional[bytes], Optional[JSONResponse]]:
+    """The request body, or a 413 response once it is over `max_bytes`."""
+    too_large = JSONResponse(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        content={"error": f"Request body is larger than {max_bytes} bytes."},
+    )
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        return None, too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            return None, too_large
+    return bytes(body), None
+
+
+async def _json_body(request: Request) -> Tuple[Optional[Dict[str, Any]], Optional[JSONResponse]]:
+    """A JSON object body of at most `SEARCH_BODY_MAX_BYTES`, or an error response."""
+    raw_body, error = await _read_body(request, SEARCH_BODY_MAX_BYTES)
+    if error is not None:
+        return None, error
+    try:
+        body = json.loads(raw_body or b"{}")
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        return None, JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": "Expected a JSON object."},
         )
+    return body, None
+
 
+@app.post("/api/search")
+async def search_api(request: Request):
+    body, error = await _json_body(request)
+    if error is not None:
+        return error
     user_description = body.get("userDescription", "")
     max_display_results = int(body.get("maxDisplayResults", 15))
-    response = StreamingResponse(
-        search_stream_with_release(user_description, max_display_results, queue_token),
-        media_type="text/event-stream",
+    scope, error = _scope_or_error(
+        body.get("dateFrom"), body.get("dateTo"), body.get("jurisdiction"), body.get("excludePatents")
+    )
+    if error is not None:
+        return error
+    return await _start_or_resume_search(
+        user_description,
+        max_display_results,
+        body.get("queueToken"),
+        request.headers.get("last-event-id") or body.get("lastEventId"),
+        bool(body.get("compact", False)),
+        _query_terms_from_body(body),
+        scope,
+        body.get("prefetchKey"),
     )
-    response.headers["Cache-Control"] = "no-store"
-    return response
 
 
 @app.get("/api/search")
@@ -637,35 +1325,316 @@ async def search_stream(
     userDescription: str = "",
     maxDisplayResults: int = 50,
     queueToken: Optional[str] = Query(None),
+    lastEventId: Optional[str] = Query(None),
+    compact: bool = Query(False),
+    term: List[str] = Query([]),
+    subject: List[str] = Query([]),
+    related: List[str] = Query([]),
+    description: str = "",
+    dateFrom: Optional[str] = Query(None),
+    dateTo: Optional[str] = Query(None),
+    jurisdiction: List[str] = Query([]),
+    excludePatents: List[str] = Query([]),
+    prefetchKey: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    GET-based streaming endpoint for EventSource (used by frontend).
+    EventSource sends `Last-Event-ID` when it reconnects; the `lastEventId`
+    query parameter lets a reloaded page resume a session the same way.
+    Repeated `term`/`subject`/`related` parameters and the raw `description`
+    feed multi-query retrieval. `dateFrom`/`dateTo` (`YYYY[-MM[-DD]]`) and
+    repeated `jurisdiction` skip partitions outside that scope; dates and
+    `excludePatents` (repeated or comma-separated) filter in Qdrant.
+    `prefetchKey` picks up the candidates prefetched for the draft.
+    """
+    scope, error = _scope_or_error(dateFrom, dateTo, jurisdiction, excludePatents)
+    if error is not None:
+        return error
+    return await _start_or_resume_search(
+        userDescription,
+        maxDisplayResults,
+        queueToken,
+        last_event_id or lastEventId,
+        compact,
+        {
+            "technology": term,
+            "subject": subject,
+            "related": related,
+            "description": description,
+        },
+        scope,
+        prefetchKey,
+    )
+
+
+@app.get("/api/search/keyword")
+async def keyword_search(
+    q: str = Query(...),
+    limit: int = Query(20, ge=1),
+    dateFrom: Optional[str] = Query(None),
+    dateTo: Optional[str] = Query(None),
+    jurisdiction: List[str] = Query([]),
+    excludePatents: List[str] = Query([]),
 ):
     """
-    GET-based streaming endpoint for EventSource (used by frontend)
+    Ranked keyword hits from the lexical sparse vectors (BM25 with IDF from
+    Qdrant). No embedding and no Ollama scoring, so it answers in
+    milliseconds; the scope parameters work as for `/api/search`.
     """
-    if not queueToken:
+    if not q.strip():
         return JSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
-            content={"error": "queueToken is required."},
+            content={"error": "q must not be empty."},
+        )
+    scope, error = _scope_or_error(dateFrom, dateTo, jurisdiction, excludePatents)
+    if error is not None:
+        return error
+    started = time.perf_counter()
+    try:
+        with metrics.KEYWORD_SEARCH_SECONDS.time():
+            results = await asyncio.to_thread(
+                qdrant_keyword_search, q, min(limit, KEYWORD_SEARCH_MAX_RESULTS), scope
+            )
+    except Exception as exc:
+        logger.warning("Keyword search failed: %s", exc)
+        return JSONResponse(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            content={"error": "Keyword search is unavailable."},
+        )
+    if results is None:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"error": "Keyword search needs a collection indexed with lexical sparse vectors."},
         )
+    return {
+        "results": results,
+        "tookMs": round((time.perf_counter() - started) * 1000, 1),
+    }
 
-    if not await _confirm_active_search_token(queueToken):
-        await _release_search_slot(queueToken)
+
+@app.get("/api/patents")
+async def get_patents(request: Request, ids: str = Query(...)):
+    """
+    Batched patent details for compact search results, keyed by point ID.
+    Served from an in-process LRU with Qdrant `retrieve` for misses.
+    """
+    point_ids = parse_point_ids(ids)
+    if point_ids is None:
         return JSONResponse(
-            status_code=status.HTTP_409_CONFLICT,
-            content={"error": "Queue token is not active."},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": "ids must be a comma-separated list of point IDs."},
+        )
+    if len(point_ids) > PATENT_DETAILS_MAX_IDS:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": f"At most {PATENT_DETAILS_MAX_IDS} ids per request."},
         )
 
-    response = StreamingResponse(
-        search_stream_with_release(userDescription, maxDisplayResults, queueToken),
-        media_type="text/event-stream",
+    found = patent_details_cache.get_many(point_ids)
+    missing = [point_id for point_id in point_ids if point_id not in found]
+    metrics.CACHE_LOOKUPS.labels("patent_details", "hit").inc(len(found))
+    metrics.CACHE_LOOKUPS.labels("patent_details", "miss").inc(len(missing))
+    if missing:
+        try:
+            fetched = await asyncio.to_thread(qdrant_retrieve_details, missing)
+        except Exception as exc:
+            logger.warning("Failed to retrieve patent details from Qdrant: %s", exc)
+            return JSONResponse(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                content={"error": "Patent details are unavailable."},
+            )
+        patent_details_cache.put_many(fetched)
+        found.update({patent["id"]: patent for patent in fetched})
+
+    body = json.dumps(
+        {"patents": [found[point_id] for point_id in point_ids if point_id in found]},
+        separators=(",", ":"),
+    )
+    etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={PATENT_DETAILS_MAX_AGE}",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.delete("/api/search/session/{session_id}")
+async def cancel_search_session(session_id: str):
+    session = search_sessions.get_session(session_id)
+    if session is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"error": "Search session not found."},
+        )
+    session.cancel()
+    return {"cancelled": not session.done}
+
+
+async def _score_for_batch(description: str, patent: dict) -> dict:
+    client = await get_httpx_client()
+    return await analyze_patent_with_ollama_async(client, description, patent, priority=BACKGROUND_PRIORITY)
+
+
+_batch_runner = BatchJobRunner(
+    BatchJobStore(BATCH_JOBS_DIR),
+    embed_batch=embed_texts_sync,
+    search_batch=qdrant_search_batch,
+    score=_score_for_batch,
+)
+
+
+@app.post("/api/batch-jobs")
+async def create_batch_job(
+    request: Request,
+    topK: int = Query(QDRANT_FETCH_COUNT, ge=1, le=1000),
+    maxResults: int = Query(15, ge=1, le=1000),
+    minScore: float = Query(0, ge=0, le=100),
+):
+    """
+    Submit a JSONL body (one invention description per line) for offline
+    prior-art search. The job runs in the background; poll its status and
+    download results when it completes.
+    """
+    raw_body, error = await _read_body(request, BATCH_MAX_BODY_BYTES)
+    if error is not None:
+        return error
+    try:
+        items = parse_batch_items(raw_body.decode("utf-8", errors="replace"), SEARCH_DESCRIPTION_MAX_CHARS)
+    except ValueError as exc:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": f"Invalid job input: {exc}"},
+        )
+    if not items:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": "Job input is empty."},
+        )
+    state = _batch_runner.store.create(
+        items, {"topK": topK, "maxResults": maxResults, "minScore": minScore}
+    )
+    _batch_runner.submit(state["jobId"])
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=state)
+
+
+@app.get("/api/batch-jobs/{job_id}")
+async def get_batch_job(job_id: str):
+    state = _batch_runner.store.load_state(job_id)
+    if state is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"error": "Batch job not found."},
+        )
+    return JSONResponse(content=state, headers={"Cache-Control": "no-store"})
+
+
+@app.delete("/api/batch-jobs/{job_id}")
+async def cancel_batch_job(job_id: str):
+    job_status = _batch_runner.cancel(job_id)
+    if job_status is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"error": "Batch job not found."},
+        )
+    return {"jobId": job_id, "status": job_status, "cancelled": job_status == "cancelled"}
+
+
+@app.get("/api/batch-jobs/{job_id}/results")
+async def download_batch_results(job_id: str, format: str = Query("jsonl", pattern="^(jsonl|csv)$")):
+    if _batch_runner.store.load_state(job_id) is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"error": "Batch job not found."},
+        )
+    if format == "csv":
+        records = list(_batch_runner.store.iter_results(job_id))
+        headers = {"Content-Disposition": f'attachment; filename="{job_id}.csv"'}
+        return Response(content=results_as_csv(records), media_type="text/csv", headers=headers)
+    headers = {"Content-Disposition": f'attachment; filename="{job_id}.jsonl"'}
+    return FileResponse(
+        _batch_runner.store.results_path(job_id),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
+
+
+async def _prefetch_retrieve(variants: List[str], scope: SearchScope):
+    """Query vectors, candidates and their main vectors for a draft search."""
+    with metrics.PREFETCH_SECONDS.time():
+        if len(variants) > 1:
+            qvecs = await asyncio.to_thread(embed_texts_sync, variants)
+            patents = await asyncio.to_thread(qdrant_multi_search, qvecs, QDRANT_FETCH_COUNT, scope, variants)
+        else:
+            qvecs = [await asyncio.to_thread(embed_text_sync, variants[0])]
+            patents = await asyncio.to_thread(qdrant_search, qvecs[0], QDRANT_FETCH_COUNT, scope, variants[0])
+        vectors = None
+        if DEDUP_CANDIDATES and len(patents) > 1:
+            try:
+                vectors = await asyncio.to_thread(candidate_vectors, [p["id"] for p in patents])
+            except Exception as exc:
+                logger.warning("Candidate vectors unavailable for prefetch: %s", exc)
+    return qvecs, patents, vectors
+
+
+_prefetcher = Prefetcher(_prefetch_retrieve, score=_score_for_batch)
+_PREFETCH_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+@app.post("/api/search/prefetch")
+async def prefetch_search(request: Request):
+    """
+    Starts embedding and retrieving candidates for a draft search in the
+    background. Takes the body of POST /api/search (no queue token needed)
+    and a `prefetchKey`, issued here when missing; the search later sent
+    with that key starts from the prefetched state.
+    """
+    body, error = await _json_body(request)
+    if error is not None:
+        return error
+    if not PREFETCH_CANDIDATES:
+        return JSONResponse(content={"prefetchKey": None, "started": False})
+    user_description = str(body.get("userDescription") or "")
+    if not user_description.strip():
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": "userDescription is required."},
+        )
+    error = _description_error(user_description)
+    if error is not None:
+        return error
+    prefetch_key = body.get("prefetchKey") or secrets.token_urlsafe(16)
+    if not isinstance(prefetch_key, str) or not _PREFETCH_KEY_PATTERN.match(prefetch_key):
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": "Invalid prefetchKey."},
+        )
+    scope, error = _scope_or_error(
+        body.get("dateFrom"), body.get("dateTo"), body.get("jurisdiction"), body.get("excludePatents")
+    )
+    if error is not None:
+        return error
+    query_terms = _query_terms_from_body(body)
+    variants = (
+        build_query_variants(user_description, query_terms)
+        if MULTI_QUERY_RETRIEVAL and query_terms
+        else [user_description]
+    )
+    _, started = _prefetcher.start(prefetch_key, user_description, variants, scope)
+    metrics.PREFETCH_REQUESTS.labels("started" if started else "unchanged").inc()
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"prefetchKey": prefetch_key, "started": started},
+        headers={"Cache-Control": "no-store"},
     )
-    response.headers["Cache-Control"] = "no-store"
-    return response
 
 
 @app.get("/export_csv")
 async def export_csv(query: str = Query("", alias="userDescription"), maxDisplayResults: int = Query(50)):
     qvec = await asyncio.to_thread(embed_text_sync, query)
-    patents = await asyncio.to_thread(qdrant_search, qvec, maxDisplayResults)
+    patents = await asyncio.to_thread(qdrant_search, qvec, maxDisplayResults, ANY_SCOPE, query)
     output = io.StringIO()
     writer = csv.DictWriter(output, fieldnames=list(patents[0].keys()))
     writer.writeheader()
@@ -675,6 +1644,31 @@ async def export_csv(query: str = Query("", alias="userDescription"), maxDisplay
     return StreamingResponse(output, media_type="text/csv", headers=headers)
 
 
+_model_residency = ModelResidency(ollama_backends, get_httpx_client)
+
+
+@app.on_event("startup")
+async def start_model_residency():
+    # Preloads the scoring model on every backend in the background
+    _model_residency.start()
+
+
+@app.on_event("shutdown")
+async def stop_model_residency():
+    await _model_residency.stop()
+
+
+@app.on_event("startup")
+async def start_batch_runner():
+    # Picks up queued/running jobs left over from a previous process
+    _batch_runner.start()
+
+
+@app.on_event("shutdown")
+async def stop_batch_runner():
+    await _batch_runner.stop()
+
+
 @app.on_event("shutdown")
 async def shutdown_http_client():
     global _httpx_client
@@ -683,6 +1677,62 @@ async def shutdown_http_client():
         _httpx_client = None
 
 
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def _is_admin(request: Request) -> bool:
+    supplied = request.headers.get("x-admin-token", "")
+    return bool(ADMIN_TOKEN) and secrets.compare_digest(supplied, ADMIN_TOKEN)
+
+
+@app.get("/api/admin/profiling")
+async def get_profiling(request: Request):
+    if not _is_admin(request):
+        return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"error": "Forbidden."})
+    return profiling.settings()
+
+
+@app.put("/api/admin/profiling")
+async def update_profiling(request: Request):
+    """
+    Admin switch for sampled cProfile (`sampleRate`, 0–1 share of searches)
+    and event-loop lag monitoring (`loopLag`). Requires `X-Admin-Token`.
+    """
+    if not _is_admin(request):
+        return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"error": "Forbidden."})
+    body = await request.json()
+    try:
+        sample_rate = float(body.get("sampleRate", 0.0))
+    except (TypeError, ValueError):
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": "sampleRate must be a number between 0 and 1."},
+        )
+    profiling.configure(sample_rate, bool(body.get("loopLag", False)))
+    return profiling.settings()
+
+
+@app.get("/api/admin/ollama-limits")
+async def get_ollama_limits(request: Request):
+    """Adaptive limit, in-flight calls, latencies and model residency per backend."""
+    if not _is_admin(request):
+        return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"error": "Forbidden."})
+    backends = ollama_backends.snapshot()
+    for backend, residency in _model_residency.snapshot().items():
+        backends[backend].update(residency)
+    return {"adaptive": ollama_backends.adaptive, "backends": backends}
+
+
+metrics.QUEUE_DEPTH.set_function(lambda: len(_search_queue))
+metrics.SEARCHES_INFLIGHT.set_function(lambda: _search_inflight)
+metrics.RATE_LIMIT_BUCKETS.set_function(lambda: len(_rate_limit_records))
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(content=metrics.generate_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -0,0 +1,292 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence
+
+from api.services.ollama_service import wait_for_idle_capacity
+
+BATCH_JOBS_DIR = os.getenv("BATCH_JOBS_DIR", "batch_jobs")
+BATCH_QUERY_CHUNK = int(os.getenv("BATCH_QUERY_CHUNK", "16"))
+BATCH_OLLAMA_CONCURRENCY = int(os.getenv("BATCH_OLLAMA_CONCURRENCY", "16"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "5000"))
+BATCH_MAX_BODY_BYTES = int(os.getenv("BATCH_MAX_BODY_BYTES", str(8 * 1024 * 1024)))
+
+_JOB_ID_PATTERN = re.compile(r"^[a-f0-9]{12}$")
+_DESCRIPTION_FIELDS = ("description", "userDescription", "text", "body")
+_ID_FIELDS = ("id", "request_id")
+RESULT_CSV_FIELDS = [
+    "item_id", "rank", "patentNumber", "title", "filingDate",
+    "score", "reason", "googlePatentUrl",
+]
+
+
+def parse_batch_items(text: str, max_description_chars: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Parse JSONL job input. Each line needs a description (`description`,
+    `userDescription`, `text` or `body`, prefixed by `title` when present)
+    of at most `max_description_chars` characters and may carry an
+    `id`/`request_id`. Raises ValueError naming the line.
+    """
+    items: List[Dict[str, Any]] = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"line {line_number}: invalid JSON ({exc.msg})") from exc
+        if not isinstance(record, dict):
+            raise ValueError(f"line {line_number}: expected a JSON object")
+        description = next(
+            (str(record[f]) for f in _DESCRIPTION_FIELDS if record.get(f)), ""
+        ).strip()
+        if record.get("title") and description:
+            description = f"{record['title']}. {description}"
+        if not description:
+            raise ValueError(f"line {line_number}: no description field")
+        if max_description_chars is not None and len(description) > max_description_chars:
+            raise ValueError(f"line {line_number}: description longer than {max_description_chars} characters")
+        if len(items) >= BATCH_MAX_ITEMS:
+            raise ValueError(f"at most {BATCH_MAX_ITEMS} items per job")
+        item_id = next((str(record[f]) for f in _ID_FIELDS if record.get(f)), None)
+        items.append({
+            "index": len(items),
+            "id": item_id or str(len(items)),
+            "description": description,
+        })
+    return items
+
+
+class BatchJobStore:
+    """
+    One directory per job: `items.jsonl` (input), `state.json` (status and
+    counters) and `results.jsonl` (one line per finished item). Results are
+    appended as items finish, so a restarted job skips what is already done.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _job_dir(self, job_id: str) -> Path:
+        if not _JOB_ID_PATTERN.match(job_id):
+            raise KeyError(job_id)
+        return self.root / job_id
+
+    def create(self, items: List[Dict[str, Any]], options: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = self._job_dir(job_id)
+        job_dir.mkdir(parents=True, exist_ok=False)
+        with open(job_dir / "items.jsonl", "w", encoding="utf-8") as items_file:
+            for item in items:
+                items_file.write(json.dumps(item) + "\n")
+        (job_dir / "results.jsonl").touch()
+        state = {
+            "jobId": job_id,
+            "status": "queued",
+            "total": len(items),
+            "completed": 0,
+            "failed": 0,
+            "options": options,
+            "createdAt": time.time(),
+            "updatedAt": time.time(),
+        }
+        self.save_state(state)
+        return state
+
+    def load_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._job_dir(job_id) / "state.json", "r", encoding="utf-8") as state_file:
+                return json.load(state_file)
+        except (KeyError, OSError, ValueError):
+            return None
+
+    def save_state(self, state: Dict[str, Any]) -> None:
+        state["updatedAt"] = time.time()
+        job_dir = self._job_dir(state["jobId"])
+        tmp_path = job_dir / "state.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as state_file:
+            json.dump(state, state_file)
+        os.replace(tmp_path, job_dir / "state.json")
+
+    def items(self, job_id: str) -> List[Dict[str, Any]]:
+        with open(self._job_dir(job_id) / "items.jsonl", "r", encoding="utf-8") as items_file:
+            return [json.loads(line) for line in items_file if line.strip()]
+
+    def iter_results(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        with open(self._job_dir(job_id) / "results.jsonl", "r", encoding="utf-8") as results_file:
+            for line in results_file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write leaves a torn last line; that item reruns
+                    continue
+
+    def completed_indices(self, job_id: str) -> set:
+        return {record["index"] for record in self.iter_results(job_id)}
+
+    def append_result(self, job_id: str, record: Dict[str, Any]) -> None:
+        with open(self._job_dir(job_id) / "results.jsonl", "a", encoding="utf-8") as results_file:
+            results_file.write(json.dumps(record) + "\n")
+
+    def results_path(self, job_id: str) -> Path:
+        return self._job_dir(job_id) / "results.jsonl"
+
+    def resumable_job_ids(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        states = [self.load_state(path.name) for path in self.root.iterdir() if path.is_dir()]
+        pending = [s for s in states if s and s["status"] in ("queued", "running")]
+        return [s["jobId"] for s in sorted(pending, key=lambda s: s["createdAt"])]
+
+
+def results_as_csv(records: Sequence[Dict[str, Any]]) -> str:
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=RESULT_CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for record in sorted(records, key=lambda r: r["index"]):
+        for rank, patent in enumerate(record.get("results", []), start=1):
+            writer.writerow({"item_id": record["id"], "rank": rank, **patent})
+    return output.getvalue()
+
+
+class BatchJobRunner:
+    """
+    Runs queued jobs one at a time in the background, tuned for throughput
+    rather than latency: each chunk of items is embedded in one call and
+    retrieved in one batched Qdrant request, then all of the chunk's
+    candidates are scored concurrently. Every Ollama call first waits for
+    idle capacity, so interactive searches keep priority on the GPUs.
+    """
+
+    def __init__(
+        self,
+        store: BatchJobStore,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        search_batch: Callable[..., List[List[Dict[str, Any]]]],
+        score: Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    ):
+        self.store = store
+        self._embed_batch = embed_batch
+        self._search_batch = search_batch
+        self._score = score
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._cancelled: set = set()
+        self._semaphore = asyncio.Semaphore(max(BATCH_OLLAMA_CONCURRENCY, 1))
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run_forever())
+        for job_id in self.store.resumable_job_ids():
+            self._queue.put_nowait(job_id)
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def submit(self, job_id: str) -> None:
+        self._queue.put_nowait(job_id)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        The job's status after the request: "cancelled" for a queued job,
+        "cancelling" for a running one (it stops before its next chunk and
+        never completes), the final status of a finished one, or None.
+        """
+        state = self.store.load_state(job_id)
+        if state is None:
+            return None
+        if state["status"] == "queued":
+            self._cancelled.add(job_id)
+            state["status"] = "cancelled"
+            self.store.save_state(state)
+        elif state["status"] == "running":
+            self._cancelled.add(job_id)
+            return "cancelling"
+        return state["status"]
+
+    async def _run_forever(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                print(f"[ERROR][BATCH] Job {job_id} failed: {exc}")
+                state = self.store.load_state(job_id)
+                if state:
+                    state["status"] = "failed"
+                    state["error"] = str(exc)
+                    self.store.save_state(state)
+
+    async def _score_limited(self, description: str, patent: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._semaphore:
+            await wait_for_idle_capacity()
+            return await self._score(description, patent)
+
+    async def _run_item(self, state: Dict[str, Any], item: Dict[str, Any], candidates) -> None:
+        options = state["options"]
+        scored = await asyncio.gather(
+            *(self._score_limited(item["description"], patent) for patent in candidates)
+        )
+        ranked = sorted(
+            (p for p in scored if p.get("score") is not None and p["score"] >= options["minScore"]),
+            key=lambda p: p["score"],
+            reverse=True,
+        )[: options["maxResults"]]
+        self.store.append_result(state["jobId"], {
+            "index": item["index"],
+            "id": item["id"],
+            "candidates": len(candidates),
+            "failed": sum(1 for p in scored if p.get("score") is None),
+            "results": [
+                {field: patent.get(field) for field in RESULT_CSV_FIELDS[2:]}
+                for patent in ranked
+            ],
+        })
+        state["completed"] += 1
+        if not scored or all(p.get("score") is None for p in scored):
+            state["failed"] += 1
+        self.store.save_state(state)
+
+    async def _run_job(self, job_id: str) -> None:
+        state = self.store.load_state(job_id)
+        if not state or state["status"] not in ("queued", "running") or job_id in self._cancelled:
+            return
+        done = self.store.completed_indices(job_id)
+        pending = [item for item in self.store.items(job_id) if item["index"] not in done]
+        state.update({"status": "running", "completed": len(done)})
+        self.store.save_state(state)
+
+        top_k = state["options"]["topK"]
+        for start in range(0, len(pending), max(BATCH_QUERY_CHUNK, 1)):
+            if job_id in self._cancelled:
+                state["status"] = "cancelled"
+                self.store.save_state(state)
+                return
+            chunk = pending[start:start + BATCH_QUERY_CHUNK]
+            descriptions = [item["description"] for item in chunk]
+            vectors = await asyncio.to_thread(self._embed_batch, descriptions)
+            candidate_lists = await asyncio.to_thread(
+                self._search_batch, vectors, top_k, query_texts=descriptions
+            )
+            await asyncio.gather(*(
+                self._run_item(state, item, candidates)
+                for item, candidates in zip(chunk, candidate_lists)
+            ))
+
+        # A cancel during the last chunk still leaves the job cancelled
+        state["status"] = "cancelled" if job_id in self._cancelled else "completed"
+        self.store.save_state(state)
@@ -0,0 +1,109 @@
+"""
+Near-duplicate collapsing between retrieval and LLM scoring.
+
+USPTO data holds many near-identical documents: continuations, divisionals
+and republished applications with almost the same abstract. A top-100 often
+contains clusters of them, and scoring each one separately costs an Ollama
+call per copy for the same answer.
+
+`cluster_candidates` walks the candidates in rank order. A candidate joins
+the cluster of an earlier representative when their normalized title and
+abstract are identical, or when their main vectors have a cosine similarity
+of at least `DEDUP_SIMILARITY`. Otherwise it starts a cluster of its own.
+Comparing only against representatives keeps every member close to the
+candidate that is actually scored. Only representatives go to Ollama;
+`share_analysis` copies the score and reason to their siblings, which link
+back through `duplicateOf`.
+"""
+import hashlib
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEDUP_CANDIDATES = os.getenv("DEDUP_CANDIDATES", "1").lower() not in ("0", "false", "no")
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "0.97"))
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def fingerprint(patent: Dict[str, Any]) -> Optional[str]:
+    """
+    Hash of the lowercased title and abstract words, or None without an
+    abstract (titles alone are too generic to match on).
+    """
+    abstract = patent.get("abstract")
+    if not abstract:
+        return None
+    words = _WORD_PATTERN.findall(f"{patent.get('title') or ''} {abstract}".lower())
+    return hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+
+def cluster_candidates(
+    patents: Sequence[Dict[str, Any]],
+    vectors: Optional[Sequence[Optional[Sequence[float]]]] = None,
+    similarity: float = DEDUP_SIMILARITY,
+) -> List[List[int]]:
+    """
+    Candidate indices grouped into clusters, in rank order. The first index
+    of each cluster is its representative. `vectors` holds each candidate's
+    main vector, or None where it is unknown (fingerprints still apply).
+    """
+    units: List[Optional[np.ndarray]] = [None] * len(patents)
+    for index, vector in enumerate(vectors or []):
+        if vector is not None and len(vector):
+            array = np.asarray(vector, dtype=np.float32)
+            norm = float(np.linalg.norm(array))
+            if norm:
+                units[index] = array / norm
+
+    clusters: Dict[int, List[int]] = {}
+    by_fingerprint: Dict[str, int] = {}
+    leader_ids: List[int] = []
+    leader_vectors: List[np.ndarray] = []
+    for index, patent in enumerate(patents):
+        key = fingerprint(patent)
+        leader = by_fingerprint.get(key) if key else None
+        if leader is None and units[index] is not None and leader_vectors:
+            similarities = np.stack(leader_vectors) @ units[index]
+            best = int(np.argmax(similarities))
+            if similarities[best] >= similarity:
+                leader = leader_ids[best]
+        if leader is None:
+            leader = index
+            clusters[index] = []
+            if units[index] is not None:
+                leader_ids.append(index)
+                leader_vectors.append(units[index])
+        clusters[leader].append(index)
+        if key:
+            by_fingerprint.setdefault(key, leader)
+    return list(clusters.values())
+
+
+def link_duplicates(patents: Sequence[Dict[str, Any]], clusters: Sequence[Sequence[int]]) -> int:
+    """
+    Marks each representative with its siblings' IDs (`duplicates`) and each
+    sibling with its representative's (`duplicateOf`). Returns how many
+    candidates were collapsed.
+    """
+    collapsed = 0
+    for representative, *siblings in clusters:
+        if not siblings:
+            continue
+        patents[representative]["duplicates"] = [patents[index].get("id") for index in siblings]
+        for index in siblings:
+            patents[index]["duplicateOf"] = patents[representative].get("id")
+        collapsed += len(siblings)
+    return collapsed
+
+
+def share_analysis(representative: Dict[str, Any], sibling: Dict[str, Any]) -> Dict[str, Any]:
+    """Copies the representative's score and reason onto a sibling."""
+    sibling.update({
+        "score": representative.get("score"),
+        "reason": representative.get("reason"),
+        "duplicateOf": representative.get("id"),
+    })
+    return sibling
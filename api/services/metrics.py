@@ -0,0 +1,127 @@
+"""
+Prometheus metrics for the search pipeline.
+
+Label values are limited to fixed sets (Ollama backend port, configured
+Qdrant partition, stage and outcome names) so series count stays bounded
+no matter the traffic.
+"""
+from urllib.parse import urlsplit
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+__all__ = ["CONTENT_TYPE_LATEST", "generate_latest", "backend_label"]
+
+_FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+_OLLAMA_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+
+EMBED_SECONDS = Histogram(
+    "patent_search_embed_seconds", "Query embedding time.", buckets=_FAST_BUCKETS
+)
+QDRANT_SECONDS = Histogram(
+    "patent_search_qdrant_seconds", "Qdrant candidate retrieval time.", buckets=_FAST_BUCKETS
+)
+KEYWORD_SEARCH_SECONDS = Histogram(
+    "patent_search_keyword_seconds", "Keyword (sparse-only) search time.", buckets=_FAST_BUCKETS
+)
+DOC_STORE_SECONDS = Histogram(
+    "patent_search_doc_store_seconds", "Doc store batch lookup time.", buckets=_FAST_BUCKETS
+)
+DEDUP_COLLAPSED = Counter(
+    "patent_search_dedup_collapsed_total",
+    "Near-duplicate candidates that took their representative's score instead of an Ollama call.",
+)
+PREFETCH_SECONDS = Histogram(
+    "patent_search_prefetch_seconds", "Draft prefetch embedding and retrieval time.", buckets=_FAST_BUCKETS
+)
+PREFETCH_REQUESTS = Counter(
+    "patent_search_prefetch_requests_total",
+    "Draft prefetch requests, by whether they started a prefetch or matched the cached one.",
+    ["outcome"],
+)
+PREFETCH_REUSE = Counter(
+    "patent_search_prefetch_reuse_total",
+    "Searches with a prefetched draft, by what they reused (exact, close, miss).",
+    ["reuse"],
+)
+PREFETCH_PRESCORED = Counter(
+    "patent_search_prefetch_prescored_total",
+    "Candidates whose prefetched score replaced an Ollama call.",
+)
+QDRANT_PARTITION_SECONDS = Histogram(
+    "patent_search_qdrant_partition_seconds",
+    "Qdrant call time per partition collection.",
+    ["partition"],
+    buckets=_FAST_BUCKETS,
+)
+QDRANT_PARTITION_ERRORS = Counter(
+    "patent_search_qdrant_partition_errors_total",
+    "Qdrant partition calls left out of a fanned-out search.",
+    ["partition"],
+)
+OLLAMA_SECONDS = Histogram(
+    "patent_search_ollama_seconds",
+    "Ollama scoring call latency per backend.",
+    ["backend"],
+    buckets=_OLLAMA_BUCKETS,
+)
+OLLAMA_SCORE_SECONDS = Histogram(
+    "patent_search_ollama_score_seconds",
+    "Time until a streamed scoring call yields its score, per backend.",
+    ["backend"],
+    buckets=_OLLAMA_BUCKETS,
+)
+OLLAMA_EARLY_STOPS = Counter(
+    "patent_search_ollama_early_stops_total",
+    "Streamed scoring calls cut off after a below-threshold score.",
+    ["backend"],
+)
+OLLAMA_PARSE_FAILURES = Counter(
+    "patent_search_ollama_parse_failures_total",
+    "Ollama responses without a parseable score.",
+    ["backend"],
+)
+OLLAMA_TIMEOUTS = Counter(
+    "patent_search_ollama_timeouts_total", "Ollama scoring calls that timed out.", ["backend"]
+)
+OLLAMA_ERRORS = Counter(
+    "patent_search_ollama_errors_total", "Ollama scoring calls that failed.", ["backend"]
+)
+OLLAMA_OUTSTANDING = Gauge(
+    "patent_search_ollama_outstanding_requests",
+    "Ollama scoring calls currently in flight per backend.",
+    ["backend"],
+)
+OLLAMA_COLD_STARTS = Counter(
+    "patent_search_ollama_cold_starts_total",
+    "Ollama calls that had to load the model first, by trigger (call/preload).",
+    ["backend", "trigger"],
+)
+OLLAMA_COLD_START_SECONDS = Histogram(
+    "patent_search_ollama_cold_start_seconds",
+    "Model load time reported by Ollama for cold starts.",
+    ["backend"],
+    buckets=_OLLAMA_BUCKETS,
+)
+OLLAMA_CONCURRENCY_LIMIT = Gauge(
+    "patent_search_ollama_concurrency_limit",
+    "Adaptive in-flight limit per Ollama backend.",
+    ["backend"],
+)
+SEARCHES = Counter(
+    "patent_search_searches_total", "Finished search runs by outcome.", ["outcome"]
+)
+CACHE_LOOKUPS = Counter(
+    "patent_search_cache_lookups_total", "Cache lookups by cache and result.", ["cache", "result"]
+)
+
+QUEUE_DEPTH = Gauge("patent_search_queue_depth", "Searches waiting for a slot.")
+SEARCHES_INFLIGHT = Gauge("patent_search_inflight", "Searches holding a slot.")
+RATE_LIMIT_BUCKETS = Gauge(
+    "patent_search_rate_limit_buckets", "Clients tracked by the rate limiter."
+)
+
+
+def backend_label(url: str) -> str:
+    """Backend port (or host when no port) so the label set stays fixed."""
+    parts = urlsplit(url)
+    return str(parts.port) if parts.port else (parts.hostname or "unknown")
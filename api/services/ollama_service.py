@@ -1,12 +1,537 @@
+import asyncio
 import itertools
 import os
+import time
+import heapq
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
 
-OLLAMA_PORTS = [11430, 11431, 11432, 11433, 11434, 11435, 11436, 11437]
+import httpx
+
+from api.services import metrics
+
+OLLAMA_PORTS = [
+    int(port)
+    for port in os.getenv("OLLAMA_PORTS", "11430,11431,11432,11433,11434,11435,11436,11437").split(",")
+    if port.strip()
+]
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://host.docker.internal")
 OLLAMA_URLS = [f"{OLLAMA_HOST}:{p}/api/generate" for p in OLLAMA_PORTS]
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1-gpu-optimized:latest")
+# Sent with every call, so Ollama keeps the model loaded between searches
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
 _ollama_cycle = itertools.cycle(OLLAMA_URLS)
 
 
 def get_next_ollama_url() -> str:
     """Round-robin load balancing across all GPU-bound Ollama services."""
     return next(_ollama_cycle)
+
+
+# ---- Adaptive per-backend concurrency ----
+# Each backend gets its own in-flight limit, found by AIMD: it grows by one
+# per limit's worth of completions while latency stays near the backend's
+# baseline, and shrinks on latency spikes, timeouts and 5xx errors, so
+# calls wait here instead of queueing inside Ollama until they time out.
+OLLAMA_ADAPTIVE_LIMITS = os.getenv("OLLAMA_ADAPTIVE_LIMITS", "1").lower() not in ("0", "false", "no")
+OLLAMA_LIMIT_INITIAL = float(os.getenv("OLLAMA_LIMIT_INITIAL", "2"))
+OLLAMA_LIMIT_MIN = float(os.getenv("OLLAMA_LIMIT_MIN", "1"))
+OLLAMA_LIMIT_MAX = float(os.getenv("OLLAMA_LIMIT_MAX", "32"))
+# Smoothed latency above baseline × tolerance counts as queueing
+OLLAMA_LIMIT_TOLERANCE = float(os.getenv("OLLAMA_LIMIT_TOLERANCE", "2.0"))
+OLLAMA_LIMIT_LATENCY_BACKOFF = float(os.getenv("OLLAMA_LIMIT_LATENCY_BACKOFF", "0.9"))
+OLLAMA_LIMIT_ERROR_BACKOFF = float(os.getenv("OLLAMA_LIMIT_ERROR_BACKOFF", "0.5"))
+# Backend-slot priority of batch calls: behind every interactive call
+BACKGROUND_PRIORITY = 1 << 30
+# Smoothing of the latency samples, and how fast the baseline may rise
+# (share per second; about 2.3 minutes to double)
+_LATENCY_SMOOTHING = 0.2
+_BASELINE_DRIFT = 0.005
+
+
+class LatencyEstimate:
+    """
+    Smoothed latency of one kind of sample and its baseline: the lowest
+    smoothed latency seen, allowed to creep up slowly so it follows real
+    changes (another model, longer prompts).
+    """
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self._last_sample = 0.0
+
+    def add(self, latency: float, now: float) -> None:
+        if self.latency is None:
+            self.latency = self.baseline = latency
+        else:
+            self.latency += (latency - self.latency) * _LATENCY_SMOOTHING
+            drift = _BASELINE_DRIFT * min(now - self._last_sample, 1.0)
+            self.baseline = min(self.latency, self.baseline * (1 + drift))
+        self._last_sample = now
+
+
+class AdaptiveLimit:
+    """
+    AIMD concurrency limit for one backend. Time to first token (streamed
+    calls) and full generation time (non-streamed calls) are tracked as
+    separate `LatencyEstimate`s, since only like samples are comparable.
+    Decreases happen at most once per smoothed latency, like TCP's once
+    per round trip, so one burst of slow calls counts as one signal.
+    """
+
+    def __init__(
+        self,
+        initial: float = OLLAMA_LIMIT_INITIAL,
+        minimum: float = OLLAMA_LIMIT_MIN,
+        maximum: float = OLLAMA_LIMIT_MAX,
+        tolerance: float = OLLAMA_LIMIT_TOLERANCE,
+        latency_backoff: float = OLLAMA_LIMIT_LATENCY_BACKOFF,
+        error_backoff: float = OLLAMA_LIMIT_ERROR_BACKOFF,
+    ):
+        self.minimum = max(minimum, 1.0)
+        self.maximum = max(maximum, self.minimum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.tolerance = tolerance
+        self.latency_backoff = latency_backoff
+        self.error_backoff = error_backoff
+        self.inflight = 0
+        self.estimates = {kind: LatencyEstimate() for kind in ("firstToken", "generation")}
+        self._last_decrease = float("-inf")
+
+    @property
+    def available(self) -> int:
+        return int(self.limit) - self.inflight
+
+    def _decrease(self, factor: float, now: float, round_trip: float = 0.0) -> None:
+        if now - self._last_decrease < round_trip:
+            return
+        self.limit = max(self.limit * factor, self.minimum)
+        self._last_decrease = now
+
+    def on_success(self, latency: float, saturated: bool, now: float, kind: str = "firstToken") -> None:
+        """
+        A completed call; `saturated` if it was started at the limit. `kind`
+        is "firstToken" for a streamed call's time to first token and
+        "generation" for a non-streamed call's full response time.
+        """
+        estimate = self.estimates[kind]
+        estimate.add(latency, now)
+        if estimate.latency > estimate.baseline * self.tolerance:
+            self._decrease(self.latency_backoff, now, estimate.latency)
+        elif saturated:
+            self.limit = min(self.limit + 1 / self.limit, self.maximum)
+
+    def on_failure(self, now: float) -> None:
+        """A timeout, 5xx or connection failure."""
+        known = [estimate.latency for estimate in self.estimates.values() if estimate.latency is not None]
+        self._decrease(self.error_backoff, now, min(known, default=0.0))
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        snapshot: Dict[str, Optional[float]] = {"limit": round(self.limit, 2), "inflight": self.inflight}
+        for kind, estimate in self.estimates.items():
+            snapshot[f"{kind}LatencyMs"] = round(estimate.latency * 1000, 1) if estimate.latency is not None else None
+            snapshot[f"{kind}BaselineMs"] = round(estimate.baseline * 1000, 1) if estimate.baseline is not None else None
+        return snapshot
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Errors that mean the backend is overloaded or down, not a bad response."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return isinstance(error, httpx.TransportError)
+
+
+class BackendLease:
+    """One call's hold on a backend slot."""
+
+    def __init__(self, url: str, limit: AdaptiveLimit, saturated: bool):
+        self.url = url
+        self.backend = metrics.backend_label(url)
+        self.limit = limit
+        self.saturated = saturated
+        self.started = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.cold = False
+
+    def first_token(self) -> None:
+        """Marks the first streamed token; its latency is then the sample."""
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+
+    def observe(self, body: Dict) -> None:
+        """Checks Ollama's final response body for a cold model load."""
+        self.cold = record_model_load(self.backend, body, trigger="call")
+
+
+class BackendPool:
+    """
+    Picks the backend with the most free slots under its adaptive limit,
+    round-robin among ties. When every backend is at its limit, callers
+    wait and each freed slot goes to the waiter with the lowest `priority`,
+    then the longest waiting. Searches pass the candidate's rank, so a new
+    search's first calls go ahead of the tail of searches already running.
+    """
+
+    def __init__(self, urls, adaptive: bool = OLLAMA_ADAPTIVE_LIMITS, **limit_options):
+        self.urls = list(urls)
+        self.adaptive = adaptive
+        self.limits = {url: AdaptiveLimit(**limit_options) for url in self.urls}
+        self._order = itertools.cycle(self.urls)
+        # Heap of (priority, arrival, future)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self.avoided: set = set()
+        # ModelResidency attaches itself here
+        self.residency = None
+        for url, limit in self.limits.items():
+            metrics.OLLAMA_CONCURRENCY_LIMIT.labels(metrics.backend_label(url)).set(limit.limit)
+
+    def _candidates(self) -> List[str]:
+        """Backends to use: all but the avoided ones, unless that is none."""
+        usable = [url for url in self.urls if url not in self.avoided]
+        return usable or self.urls
+
+    def _pick(self) -> Optional[str]:
+        candidates = self._candidates()
+        best, free = None, 0
+        for _ in range(len(self.urls)):
+            url = next(self._order)
+            if url not in candidates:
+                continue
+            available = self.limits[url].available
+            if available > free:
+                best, free = url, available
+        return best
+
+    def avoid(self, url: str, avoided: bool) -> None:
+        """Steers calls away from a backend (loading its model) or back to it."""
+        if avoided:
+            self.avoided.add(url)
+        else:
+            self.avoided.discard(url)
+            self._dispatch()
+
+    def _take(self, url: str) -> Tuple[str, bool]:
+        limit = self.limits[url]
+        limit.inflight += 1
+        return url, limit.available <= 0
+
+    def _dispatch(self) -> None:
+        while self._waiters:
+            if self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+                continue
+            url = self._pick()
+            if url is None:
+                return
+            waiter = heapq.heappop(self._waiters)[2]
+            waiter.set_result(self._take(url))
+
+    async def _acquire(self, priority: int) -> Tuple[str, bool]:
+        # Cancelled waiters stay in the heap until they reach the top
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        url = None if self._waiters else self._pick()
+        if url is not None:
+            return self._take(url)
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._arrivals), waiter))
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as the caller was cancelled
+                self._release(waiter.result()[0])
+            raise
+
+    def _release(self, url: str) -> None:
+        limit = self.limits[url]
+        limit.inflight -= 1
+        metrics.OLLAMA_CONCURRENCY_LIMIT.labels(metrics.backend_label(url)).set(limit.limit)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def lease(self, priority: int = 0):
+        if self.residency is not None:
+            self.residency.note_demand()
+        if not self.adaptive:
+            candidates = self._candidates()
+            url = next(url for url in self._order if url in candidates)
+            lease = BackendLease(url, self.limits[url], saturated=False)
+            yield lease
+            if self.residency is not None:
+                self.residency.note_call(url, lease.cold)
+            return
+
+        url, saturated = await self._acquire(priority)
+        limit = self.limits[url]
+        lease = BackendLease(url, limit, saturated)
+        try:
+            yield lease
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            if is_overload_error(error):
+                limit.on_failure(time.monotonic())
+            raise
+        else:
+            # A call that waited for the model to load says nothing about queueing
+            if not lease.cold:
+                now = time.monotonic()
+                if lease.first_token_at is not None:
+                    limit.on_success(lease.first_token_at - lease.started, saturated, now)
+                else:
+                    limit.on_success(now - lease.started, saturated, now, kind="generation")
+            if self.residency is not None:
+                self.residency.note_call(url, lease.cold)
+        finally:
+            self._release(url)
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        return {metrics.backend_label(url): limit.snapshot() for url, limit in self.limits.items()}
+
+
+ollama_backends = BackendPool(OLLAMA_URLS)
+
+
+# ---- Interactive vs background priority ----
+# Background work (batch jobs) only starts an Ollama call while interactive
+# searches have at most this many calls outstanding.
+OLLAMA_BACKGROUND_MAX_INTERACTIVE = int(os.getenv("OLLAMA_BACKGROUND_MAX_INTERACTIVE", "0"))
+
+_interactive_inflight = 0
+_capacity_changed: Optional[asyncio.Condition] = None
+
+
+def _get_capacity_condition() -> asyncio.Condition:
+    global _capacity_changed
+    if _capacity_changed is None:
+        _capacity_changed = asyncio.Condition()
+    return _capacity_changed
+
+
+@asynccontextmanager
+async def interactive_ollama_call():
+    """Marks an Ollama call made on behalf of an interactive search."""
+    global _interactive_inflight
+    _interactive_inflight += 1
+    try:
+        yield
+    finally:
+        _interactive_inflight -= 1
+        condition = _get_capacity_condition()
+        async with condition:
+            condition.notify_all()
+
+
+async def wait_for_idle_capacity() -> None:
+    """Blocks a background Ollama call until interactive load is low enough."""
+    condition = _get_capacity_condition()
+    async with condition:
+        await condition.wait_for(
+            lambda: _interactive_inflight <= OLLAMA_BACKGROUND_MAX_INTERACTIVE
+        )
+
+
+# ---- Model residency ----
+# Ollama unloads the model after `keep_alive` without calls, and the next
+# call on that port pays the load. The residency manager preloads the model
+# on every backend at startup, re-pings idle backends during working hours,
+# and reloads backends whose model is gone, steering calls away meanwhile.
+OLLAMA_PRELOAD_ON_STARTUP = os.getenv("OLLAMA_PRELOAD_ON_STARTUP", "1").lower() not in ("0", "false", "no")
+OLLAMA_RESIDENCY_CHECK_SECONDS = float(os.getenv("OLLAMA_RESIDENCY_CHECK_SECONDS", "60"))
+# Backends idle this long get a keepalive ping during warm hours
+OLLAMA_PING_IDLE_SECONDS = float(os.getenv("OLLAMA_PING_IDLE_SECONDS", "600"))
+# Local hours (0-23) and weekdays (0 = Monday) to keep the model loaded;
+# comma-separated values or inclusive ranges, empty for always
+OLLAMA_WARM_HOURS = os.getenv("OLLAMA_WARM_HOURS", "7-19")
+OLLAMA_WARM_DAYS = os.getenv("OLLAMA_WARM_DAYS", "0-4")
+# A `load_duration` above this counts as a cold start
+OLLAMA_COLD_LOAD_SECONDS = float(os.getenv("OLLAMA_COLD_LOAD_SECONDS", "1.0"))
+OLLAMA_PRELOAD_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_PRELOAD_TIMEOUT_SECONDS", "300"))
+
+
+def parse_ranges(spec: str) -> Optional[set]:
+    """`"7-19"` or `"0-4,6"` to a set of ints; None (always) when empty."""
+    values = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        values.update(range(int(first), int(last or first) + 1))
+    return values or None
+
+
+def record_model_load(backend: str, body: Dict, trigger: str) -> bool:
+    """Counts a cold start when Ollama reports a long `load_duration`."""
+    load_ns = body.get("load_duration")
+    if not isinstance(load_ns, (int, float)) or load_ns / 1e9 < OLLAMA_COLD_LOAD_SECONDS:
+        return False
+    metrics.OLLAMA_COLD_STARTS.labels(backend, trigger).inc()
+    metrics.OLLAMA_COLD_START_SECONDS.labels(backend).observe(load_ns / 1e9)
+    return True
+
+
+class ModelResidency:
+    """
+    Keeps `OLLAMA_MODEL` loaded on the pool's backends. Each check asks
+    every backend's `/api/ps` whether the model is loaded. During warm
+    hours, or when calls are waiting, a backend without the model is
+    preloaded (a generate call without a prompt) and avoided by the pool
+    until the load finishes; idle backends that still have it get the same
+    call as a keepalive ping. Backends without `/api/ps` are only pinged.
+    """
+
+    def __init__(
+        self,
+        pool: BackendPool,
+        get_client,
+        warm_hours: str = OLLAMA_WARM_HOURS,
+        warm_days: str = OLLAMA_WARM_DAYS,
+    ):
+        self.pool = pool
+        self._get_client = get_client
+        self.warm_hours = parse_ranges(warm_hours)
+        self.warm_days = parse_ranges(warm_days)
+        self.state: Dict[str, str] = {url: "unknown" for url in pool.urls}
+        self.last_active: Dict[str, float] = {url: 0.0 for url in pool.urls}
+        self.last_load_seconds: Dict[str, Optional[float]] = {url: None for url in pool.urls}
+        self._worker: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        pool.residency = self
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._wake = asyncio.Event()
+            self._worker = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def is_warm_time(self, now: Optional[float] = None) -> bool:
+        moment = time.localtime(now)
+        return (
+            (self.warm_hours is None or moment.tm_hour in self.warm_hours)
+            and (self.warm_days is None or moment.tm_wday in self.warm_days)
+        )
+
+    def note_call(self, url: str, cold: bool) -> None:
+        """A scoring call finished on `url`; wakes the manager on cold loads."""
+        self.last_active[url] = time.monotonic()
+        self.state[url] = "loaded"
+        if url in self.pool.avoided:
+            # The call just ran on the model, so something has loaded it
+            self.pool.avoid(url, False)
+        if cold and self._wake is not None:
+            # Other backends were probably unloaded too
+            self._wake.set()
+
+    def note_demand(self) -> None:
+        """Calls are coming in; load any backend known to be unloaded."""
+        if self._wake is not None and "unloaded" in self.state.values():
+            self._wake.set()
+
+    @staticmethod
+    def _ps_url(url: str) -> str:
+        return url.rsplit("/api/", 1)[0] + "/api/ps"
+
+    async def _is_loaded(self, url: str) -> Optional[bool]:
+        """Whether `/api/ps` lists the model; None when it can't tell."""
+        try:
+            client = await self._get_client()
+            response = await client.get(self._ps_url(url), timeout=10.0)
+            response.raise_for_status()
+            models = response.json().get("models") or []
+        except (httpx.HTTPError, ValueError):
+            return None
+        return any(OLLAMA_MODEL in (entry.get("name"), entry.get("model")) for entry in models)
+
+    async def load(self, url: str, steer: bool) -> bool:
+        """
+        Loads the model (or refreshes its keep-alive) with an empty prompt.
+        With `steer`, calls avoid the backend until the load is done.
+        """
+        backend = metrics.backend_label(url)
+        if steer:
+            self.state[url] = "loading"
+            self.pool.avoid(url, True)
+        started = time.monotonic()
+        try:
+            client = await self._get_client()
+            response = await client.post(
+                url,
+                json={"model": OLLAMA_MODEL, "keep_alive": OLLAMA_KEEP_ALIVE},
+                timeout=OLLAMA_PRELOAD_TIMEOUT_SECONDS,
+            )
+            response.raise_for_status()
+            body = response.json()
+        except (httpx.HTTPError, ValueError) as exc:
+            print(f"[WARN][OLLAMA] Could not load {OLLAMA_MODEL} on {backend}: {exc}")
+            self.state[url] = "unknown"
+            return False
+        finally:
+            if steer:
+                self.pool.avoid(url, False)
+        if record_model_load(backend, body, trigger="preload"):
+            self.last_load_seconds[url] = round(body["load_duration"] / 1e9, 2)
+        self.state[url] = "loaded"
+        self.last_active[url] = started
+        return True
+
+    async def _check(self, url: str, warm: bool, demand: bool) -> None:
+        loaded = await self._is_loaded(url)
+        if loaded is False:
+            self.state[url] = "unloaded"
+            # Other backends serve calls until this one is loaded again
+            self.pool.avoid(url, True)
+            if warm or demand:
+                await self.load(url, steer=True)
+            return
+        if loaded:
+            # Possibly loaded again from elsewhere (another client, a manual run)
+            self.state[url] = "loaded"
+            if url in self.pool.avoided:
+                self.pool.avoid(url, False)
+        if warm and time.monotonic() - self.last_active[url] >= OLLAMA_PING_IDLE_SECONDS:
+            await self.load(url, steer=False)
+
+    async def check_all(self, demand: bool = False) -> None:
+        warm = self.is_warm_time()
+        await asyncio.gather(*(self._check(url, warm, demand) for url in self.pool.urls))
+
+    async def _run_forever(self) -> None:
+        if OLLAMA_PRELOAD_ON_STARTUP:
+            await asyncio.gather(*(self.load(url, steer=True) for url in self.pool.urls))
+        while True:
+            demand = False
+            try:
+                await asyncio.wait_for(self._wake.wait(), OLLAMA_RESIDENCY_CHECK_SECONDS)
+                demand = True
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.check_all(demand)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                print(f"[ERROR][OLLAMA] Residency check failed: {exc}")
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        now = time.monotonic()
+        return {
+            metrics.backend_label(url): {
+                "state": self.state[url],
+                "idleSeconds": round(now - self.last_active[url], 1) if self.last_active[url] else None,
+                "lastColdLoadSeconds": self.last_load_seconds[url],
+            }
+            for url in self.pool.urls
+        }
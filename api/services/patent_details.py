@@ -0,0 +1,80 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+PATENT_DETAILS_CACHE_SIZE = int(os.getenv("PATENT_DETAILS_CACHE_SIZE", "20000"))
+PATENT_DETAILS_MAX_IDS = int(os.getenv("PATENT_DETAILS_MAX_IDS", "100"))
+PATENT_DETAILS_MAX_AGE = int(os.getenv("PATENT_DETAILS_MAX_AGE", "604800"))
+
+PointId = Union[str, int]
+
+
+class PatentDetailsCache:
+    """
+    Bounded LRU of patent detail dicts keyed by Qdrant point ID.
+
+    Searches warm it with the payloads they already fetched, so the detail
+    requests that follow a compact search rarely need a Qdrant round-trip.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max(max_size, 0)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for point_id in ids:
+                entry = self._entries.get(point_id)
+                if entry is None:
+                    continue
+                self._entries.move_to_end(point_id)
+                found[point_id] = entry
+        return found
+
+    def put_many(self, entries: Iterable[Dict[str, Any]]) -> None:
+        if self.max_size == 0:
+            return
+        with self._lock:
+            for entry in entries:
+                point_id = entry.get("id")
+                if not point_id:
+                    continue
+                self._entries[point_id] = entry
+                self._entries.move_to_end(point_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+patent_details_cache = PatentDetailsCache(PATENT_DETAILS_CACHE_SIZE)
+
+
+def parse_point_ids(raw: str) -> Optional[List[str]]:
+    """
+    Parse a comma-separated `ids` query value into normalized point IDs.
+    Returns None when any ID is malformed; duplicates are dropped in order.
+    """
+    ids: List[str] = []
+    seen = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if part.isdigit():
+            normalized = part
+        else:
+            try:
+                normalized = str(uuid.UUID(part))
+            except ValueError:
+                return None
+        if normalized not in seen:
+            seen.add(normalized)
+            ids.append(normalized)
+    return ids
+
+
+def to_qdrant_id(point_id: str) -> PointId:
+    return int(point_id) if point_id.isdigit() else point_id
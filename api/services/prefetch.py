@@ -0,0 +1,192 @@
+"""
+Speculative candidate retrieval while the user is still writing.
+
+Once term extraction settles on a draft, the frontend posts the search it
+would run for it to /api/search/prefetch under a per-tab prefetch key. The
+`Prefetcher` embeds the query variants and retrieves the candidates in the
+background, and keeps the result under that key. When the search for the
+key arrives, `event_stream` starts from that warm state:
+
+- same query variants and scope: the prefetched query vectors, candidates
+  and candidate vectors are used as they are, and candidates that were
+  pre-scored for the same search text skip their Ollama call;
+- same scope and every variant's vector within `PREFETCH_SIMILARITY`
+  (cosine) of the draft's: the search embeds its own text but reuses the
+  candidates instead of querying Qdrant again.
+
+Pre-scoring (`PREFETCH_PRESCORE` top candidates, off by default) runs one
+call at a time at background priority and only while no interactive search
+is waiting on Ollama, so it only uses capacity nobody else needs.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from api.services.ollama_service import wait_for_idle_capacity
+from api.services.qdrant_service import SearchScope
+
+PREFETCH_CANDIDATES = os.getenv("PREFETCH_CANDIDATES", "1").lower() not in ("0", "false", "no")
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "300"))
+PREFETCH_MAX = int(os.getenv("PREFETCH_MAX", "500"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+PREFETCH_SIMILARITY = float(os.getenv("PREFETCH_SIMILARITY", "0.98"))
+PREFETCH_WAIT_SECONDS = float(os.getenv("PREFETCH_WAIT_SECONDS", "2"))
+PREFETCH_PRESCORE = int(os.getenv("PREFETCH_PRESCORE", "0"))
+
+logger = logging.getLogger(__name__)
+
+# (query variants, scope) -> (query vectors, candidates, candidate vectors or None)
+RetrieveFn = Callable[
+    [List[str], SearchScope],
+    Awaitable[Tuple[List[List[float]], List[Dict[str, Any]], Optional[List[Any]]]],
+]
+ScoreFn = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class PrefetchEntry:
+    """Warm retrieval state of one draft search."""
+
+    def __init__(self, key: str, description: str, variants: Sequence[str], scope: SearchScope):
+        self.key = key
+        self.description = description
+        self.variants = list(variants)
+        self.scope = scope
+        self.query_vectors: Optional[List[List[float]]] = None
+        self.patents: Optional[List[Dict[str, Any]]] = None
+        self.candidate_vectors: Optional[List[Any]] = None
+        # Point ID -> {"score", "reason"} for `description`
+        self.scores: Dict[str, Dict[str, Any]] = {}
+        self.created_at = time.monotonic()
+        self.retrieved = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def same_search(self, variants: Sequence[str], scope: SearchScope) -> bool:
+        return self.variants == list(variants) and self.scope == scope
+
+    async def wait_retrieved(self, timeout: float) -> bool:
+        """Whether the candidates are ready, waiting up to `timeout` seconds."""
+        if not self.retrieved.is_set():
+            try:
+                await asyncio.wait_for(self.retrieved.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return self.patents is not None
+
+    def is_close(self, query_vectors: Sequence[Sequence[float]], similarity: float = PREFETCH_SIMILARITY) -> bool:
+        """Whether every query vector is within `similarity` of the draft's."""
+        if self.patents is None or not self.query_vectors or len(query_vectors) != len(self.query_vectors):
+            return False
+        draft = np.asarray(self.query_vectors, dtype=np.float32)
+        final = np.asarray(query_vectors, dtype=np.float32)
+        norms = np.linalg.norm(draft, axis=1) * np.linalg.norm(final, axis=1)
+        if not np.all(norms):
+            return False
+        return bool(np.min(np.sum(draft * final, axis=1) / norms) >= similarity)
+
+    def stop(self) -> None:
+        """Cancels work still running for the draft; what it produced stays."""
+        if self.task is not None:
+            self.task.cancel()
+
+    def candidates(self) -> List[Dict[str, Any]]:
+        """Fresh copies of the candidates; a search annotates its own."""
+        return [dict(patent) for patent in self.patents or []]
+
+    def prescored(self, description: str) -> Dict[str, Dict[str, Any]]:
+        """Pre-scores, which only hold for the text they were scored against."""
+        return dict(self.scores) if description == self.description else {}
+
+
+class Prefetcher:
+    """Bounded, expiring map of prefetch key to the latest draft's `PrefetchEntry`."""
+
+    def __init__(
+        self,
+        retrieve: RetrieveFn,
+        score: Optional[ScoreFn] = None,
+        max_entries: int = PREFETCH_MAX,
+        ttl: float = PREFETCH_TTL_SECONDS,
+        concurrency: int = PREFETCH_CONCURRENCY,
+        prescore: int = PREFETCH_PRESCORE,
+    ):
+        self._retrieve = retrieve
+        self._score = score
+        self.max_entries = max(max_entries, 1)
+        self.ttl = ttl
+        self.prescore = prescore if score is not None else 0
+        self._entries: "OrderedDict[str, PrefetchEntry]" = OrderedDict()
+        self._slots = asyncio.Semaphore(max(concurrency, 1))
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.stop()
+
+    def _prune(self, now: float) -> None:
+        for key in [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl]:
+            self._drop(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def start(
+        self, key: str, description: str, variants: Sequence[str], scope: SearchScope
+    ) -> Tuple[PrefetchEntry, bool]:
+        """
+        The entry for `key`, prefetching it unless the same search is already
+        cached there. Returns `(entry, started)`; a new draft replaces the
+        key's previous one and cancels its work.
+        """
+        self._prune(time.monotonic())
+        entry = self._entries.get(key)
+        usable = entry is not None and (entry.patents is not None or not entry.retrieved.is_set())
+        if usable and entry.same_search(variants, scope) and entry.description == description:
+            self._entries.move_to_end(key)
+            return entry, False
+        self._drop(key)
+        entry = PrefetchEntry(key, description, variants, scope)
+        entry.task = asyncio.create_task(self._run(entry))
+        self._entries[key] = entry
+        self._prune(time.monotonic())
+        return entry, True
+
+    def get(self, key: Optional[str], scope: SearchScope) -> Optional[PrefetchEntry]:
+        """The unexpired entry for `key` if it was prefetched in `scope`."""
+        if not key:
+            return None
+        self._prune(time.monotonic())
+        entry = self._entries.get(key)
+        if entry is None or entry.scope != scope:
+            return None
+        return entry
+
+    async def _run(self, entry: PrefetchEntry) -> None:
+        try:
+            async with self._slots:
+                entry.query_vectors, patents, entry.candidate_vectors = await self._retrieve(
+                    entry.variants, entry.scope
+                )
+                entry.patents = patents
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Prefetch %s failed: %s", entry.key, exc)
+            return
+        finally:
+            entry.retrieved.set()
+
+        for patent in (entry.patents or [])[: self.prescore]:
+            await wait_for_idle_capacity()
+            try:
+                scored = await self._score(entry.description, dict(patent))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Prefetch pre-scoring failed for %s: %s", patent.get("id"), exc)
+                continue
+            if scored.get("score") is not None:
+                entry.scores[patent["id"]] = {"score": scored.get("score"), "reason": scored.get("reason")}
@@ -0,0 +1,465 @@
+"""
+Partitioned Qdrant collections and the router that fans searches out to them.
+
+`QDRANT_PARTITIONS` lists one collection per jurisdiction and year range,
+e.g. `uspto_2001_2015:uspto:2001-2015,uspto_2016_2024:uspto:2016-,epo_all:epo`.
+Each entry is `collection[:jurisdiction[:first-last]]`; a missing
+jurisdiction or bound means "any". Without it the single `QDRANT_COLLECTION`
+is the only partition, so nothing changes for an unpartitioned deployment.
+
+Every partition is searched in parallel and the per-partition top-k lists
+are merged by score. All partitions must therefore be built with the same
+embedding model and distance. A `SearchScope` skips partitions that cannot
+hold matches for the requested jurisdictions or date range. Partitions can
+be rebuilt or added by changing the list; the rest are untouched.
+
+Date ranges and excluded patent numbers are sent to Qdrant as a query filter
+on the payload-indexed `filingDateInt` and `patentNumber` fields, so the top-k
+already satisfies them. With `QDRANT_SERVER_FILTERS=0` (collections not yet
+backfilled) they are applied to over-fetched hits instead.
+
+Searches can also use the `lexical` sparse vector (BM25 term weights written
+by the vectorizer): sparse-only for keyword search, or both vectors fused
+with reciprocal-rank fusion inside Qdrant (`QDRANT_SEARCH_MODE=hybrid`).
+Partitions built before sparse vectors existed answer hybrid searches with
+dense results and contribute nothing to keyword searches.
+
+Partitions indexed with claim vectors (`CLAIM_VECTORS`) hold a `claims`
+multivector per patent: the title and abstract plus each independent claim.
+Dense searches there score each patent by its best-matching vector (MaxSim)
+instead of the main vector, which only covers the start of the text. Each
+hit is still one patent. `QDRANT_CLAIM_SEARCH=0` keeps the main vector.
+"""
+import heapq
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from qdrant_client import QdrantClient
+from qdrant_client import models as qdrant_models
+
+from api.services import metrics
+from vectorization.claims import CLAIM_VECTOR_NAME
+from vectorization.lexical import SPARSE_VECTOR_NAME, query_vector as lexical_query_vector
+
+QDRANT_FANOUT_WORKERS = int(os.getenv("QDRANT_FANOUT_WORKERS", "8"))
+# Extra candidates fetched from partitions that straddle a date range, since
+# their out-of-range hits are dropped after the search
+QDRANT_SCOPE_OVERFETCH = max(int(os.getenv("QDRANT_SCOPE_OVERFETCH", "4")), 1)
+QDRANT_SERVER_FILTERS = os.getenv("QDRANT_SERVER_FILTERS", "1").lower() not in ("0", "false", "no")
+QDRANT_MAX_EXCLUDED = int(os.getenv("QDRANT_MAX_EXCLUDED", "500"))
+QDRANT_CLAIM_SEARCH = os.getenv("QDRANT_CLAIM_SEARCH", "1").lower() not in ("0", "false", "no")
+
+SEARCH_MODES = ("dense", "sparse", "hybrid")
+QDRANT_SEARCH_MODE = os.getenv("QDRANT_SEARCH_MODE", "dense").strip().lower()
+if QDRANT_SEARCH_MODE not in SEARCH_MODES:
+    logging.getLogger(__name__).warning(
+        "Unknown QDRANT_SEARCH_MODE %r; using dense search", QDRANT_SEARCH_MODE
+    )
+    QDRANT_SEARCH_MODE = "dense"
+# How long a partition's named vectors (sparse, claims) are cached; an alias
+# swap to a re-indexed version is picked up after this
+_VECTOR_CHECK_SECONDS = 300
+
+FILING_DATE_FIELD = "filingDateInt"
+PATENT_NUMBER_FIELD = "patentNumber"
+
+logger = logging.getLogger(__name__)
+
+_YEARS_PATTERN = re.compile(r"^(\d{4})?(?:(-)(\d{4})?)?$")
+_DATE_PATTERN = re.compile(r"^(\d{4})(?:-?(\d{2}))?(?:-?(\d{2}))?$")
+# "US 2024/0012345 A1" -> "20240012345": country prefix, separators, kind code
+_PATENT_NUMBER_PATTERN = re.compile(r"^(?:US)?([A-Z]{0,2}\d+?)(?:[A-Z]\d?)?$")
+
+
+@dataclass(frozen=True)
+class Partition:
+    collection: str
+    jurisdiction: Optional[str] = None
+    first_year: Optional[int] = None
+    last_year: Optional[int] = None
+
+    def covers(self, scope: "SearchScope") -> bool:
+        if scope.jurisdictions and self.jurisdiction and self.jurisdiction not in scope.jurisdictions:
+            return False
+        if scope.date_from and self.last_year is not None and int(scope.date_from[:4]) > self.last_year:
+            return False
+        if scope.date_to and self.first_year is not None and int(scope.date_to[:4]) < self.first_year:
+            return False
+        return True
+
+    def within(self, scope: "SearchScope") -> bool:
+        """True when every document of the partition falls inside the scope's dates."""
+        if scope.date_from and (self.first_year is None or f"{self.first_year}0101" < scope.date_from):
+            return False
+        if scope.date_to and (self.last_year is None or f"{self.last_year}1231" > scope.date_to):
+            return False
+        return True
+
+
+def normalize_patent_number(value: str) -> Optional[str]:
+    """Publication/grant number as stored in `patentNumber`, or None when unrecognisable."""
+    compact = re.sub(r"[\s/,.-]", "", str(value or "")).upper()
+    match = _PATENT_NUMBER_PATTERN.match(compact)
+    return match.group(1) if match else None
+
+
+@dataclass(frozen=True)
+class SearchScope:
+    """
+    Optional jurisdictions, inclusive `YYYYMMDD` date bounds and normalized
+    patent numbers to leave out of a search.
+    """
+    jurisdictions: Tuple[str, ...] = ()
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    excluded_numbers: Tuple[str, ...] = ()
+
+    @property
+    def has_dates(self) -> bool:
+        return bool(self.date_from or self.date_to)
+
+    @property
+    def is_filtered(self) -> bool:
+        return self.has_dates or bool(self.excluded_numbers)
+
+    def matches(self, payload: Dict[str, Any]) -> bool:
+        """Client-side check, for hits from a search that was not filtered by Qdrant."""
+        if self.excluded_numbers:
+            number = normalize_patent_number(payload.get(PATENT_NUMBER_FIELD))
+            if number and number.lstrip("0") in {n.lstrip("0") for n in self.excluded_numbers}:
+                return False
+        if not self.has_dates:
+            return True
+        filing_date = str(payload.get("filingDate") or "").replace("-", "")
+        if not filing_date:
+            return False
+        return (
+            (not self.date_from or filing_date >= self.date_from)
+            and (not self.date_to or filing_date <= self.date_to)
+        )
+
+    def query_filter(self, dates: bool = True) -> Optional[qdrant_models.Filter]:
+        """Qdrant filter for the scope; `dates=False` when the partition lies inside the range."""
+        must, must_not = [], []
+        if dates and self.has_dates:
+            must.append(qdrant_models.FieldCondition(
+                key=FILING_DATE_FIELD,
+                range=qdrant_models.Range(
+                    gte=int(self.date_from) if self.date_from else None,
+                    lte=int(self.date_to) if self.date_to else None,
+                ),
+            ))
+        if self.excluded_numbers:
+            # Stored grant numbers may or may not be zero-padded to 8 digits
+            variants = sorted({
+                v for n in self.excluded_numbers
+                for v in (n, n.lstrip("0"), n.zfill(8) if n.isdigit() else n) if v
+            })
+            must_not.append(qdrant_models.FieldCondition(
+                key=PATENT_NUMBER_FIELD, match=qdrant_models.MatchAny(any=variants)
+            ))
+        if not must and not must_not:
+            return None
+        return qdrant_models.Filter(must=must or None, must_not=must_not or None)
+
+
+ANY_SCOPE = SearchScope()
+
+
+def sparse_query_vector(*texts: Optional[str]) -> Optional[qdrant_models.SparseVector]:
+    """Lexical query vector for `texts`, or None when they hold no searchable terms."""
+    indices, values = lexical_query_vector(texts)
+    if not indices:
+        return None
+    return qdrant_models.SparseVector(indices=indices, values=values)
+
+
+def _query_request(
+    vector: Optional[List[float]],
+    sparse_vector: Optional[qdrant_models.SparseVector],
+    query_filter: Optional[qdrant_models.Filter],
+    limit: int,
+    claims: bool = False,
+    fuse: bool = True,
+) -> Optional[qdrant_models.QueryRequest]:
+    """
+    Sparse-only request when there is no dense vector, a plain dense one
+    without `fuse`, otherwise an RRF fusion of the dense and (when present)
+    sparse prefetches. A dense-only fusion still scores by rank, so hits stay
+    comparable with fused partitions. With `claims` the dense vector is
+    matched against the `claims` multivector, as a one-vector multivector.
+    """
+    if vector is None:
+        if sparse_vector is None:
+            return None
+        return qdrant_models.QueryRequest(
+            query=sparse_vector, using=SPARSE_VECTOR_NAME, filter=query_filter,
+            limit=limit, with_payload=True,
+        )
+    using = CLAIM_VECTOR_NAME if claims else None
+    dense_query = [vector] if claims else vector
+    if not fuse:
+        return qdrant_models.QueryRequest(
+            query=dense_query, using=using, filter=query_filter, limit=limit, with_payload=True,
+        )
+    prefetch = [qdrant_models.Prefetch(query=dense_query, using=using, filter=query_filter, limit=limit)]
+    if sparse_vector is not None:
+        prefetch.append(qdrant_models.Prefetch(
+            query=sparse_vector, using=SPARSE_VECTOR_NAME, filter=query_filter, limit=limit
+        ))
+    return qdrant_models.QueryRequest(
+        prefetch=prefetch, query=qdrant_models.FusionQuery(fusion=qdrant_models.Fusion.RRF),
+        limit=limit, with_payload=True,
+    )
+
+
+def parse_partitions(spec: str, default_collection: str) -> List[Partition]:
+    """Partitions from a `QDRANT_PARTITIONS` value; raises ValueError naming the bad entry."""
+    partitions: List[Partition] = []
+    for entry in (part.strip() for part in (spec or "").split(",")):
+        if not entry:
+            continue
+        collection, _, rest = entry.partition(":")
+        jurisdiction, _, years = rest.partition(":")
+        match = _YEARS_PATTERN.match(years.strip())
+        if not collection.strip() or match is None:
+            raise ValueError(f"invalid QDRANT_PARTITIONS entry: {entry!r}")
+        first, dash, last = match.groups()
+        partitions.append(Partition(
+            collection=collection.strip(),
+            jurisdiction=jurisdiction.strip().lower() or None,
+            first_year=int(first) if first else None,
+            # "2016" alone is one year, "2016-" is open-ended
+            last_year=int(last) if last else (None if dash else (int(first) if first else None)),
+        ))
+    return partitions or [Partition(default_collection)]
+
+
+def _date_bound(value: Optional[str], end: bool) -> Optional[str]:
+    """`YYYY`, `YYYY-MM` or `YYYY-MM-DD` (dashes optional) as an inclusive `YYYYMMDD` bound."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    match = _DATE_PATTERN.match(value)
+    if match is None:
+        raise ValueError(f"invalid date {value!r}; use YYYY, YYYY-MM or YYYY-MM-DD")
+    year, month, day = match.groups()
+    month = month or ("12" if end else "01")
+    day = day or ("31" if end else "01")
+    return f"{year}{month}{day}"
+
+
+def parse_scope(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    jurisdictions: Optional[Iterable[str]] = None,
+    excluded_numbers: Optional[Iterable[str]] = None,
+) -> SearchScope:
+    """Scope from request parameters; raises ValueError on malformed dates or numbers."""
+    excluded = set()
+    for raw in excluded_numbers or []:
+        for value in str(raw).split(","):
+            if not value.strip():
+                continue
+            number = normalize_patent_number(value)
+            if number is None:
+                raise ValueError(f"invalid patent number {value.strip()!r}")
+            excluded.add(number)
+    if len(excluded) > QDRANT_MAX_EXCLUDED:
+        raise ValueError(f"at most {QDRANT_MAX_EXCLUDED} excluded patent numbers")
+    scope = SearchScope(
+        jurisdictions=tuple(sorted({j.strip().lower() for j in jurisdictions or [] if j and j.strip()})),
+        date_from=_date_bound(date_from, end=False),
+        date_to=_date_bound(date_to, end=True),
+        excluded_numbers=tuple(sorted(excluded)),
+    )
+    if scope.date_from and scope.date_to and scope.date_from > scope.date_to:
+        raise ValueError("dateFrom is after dateTo")
+    return scope
+
+
+class PartitionRouter:
+    """
+    Runs each Qdrant call against every selected partition on a small thread
+    pool and merges the results. A failing partition (for example one being
+    rebuilt) is logged and left out; the call only fails if all of them do.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        partitions: Sequence[Partition],
+        max_workers: int = QDRANT_FANOUT_WORKERS,
+        server_filters: bool = QDRANT_SERVER_FILTERS,
+        claim_search: bool = QDRANT_CLAIM_SEARCH,
+    ):
+        self.client = client
+        self.partitions = list(partitions)
+        self.server_filters = server_filters
+        self.claim_search = claim_search
+        # collection -> (names of its sparse and named dense vectors, checked at)
+        self._vector_names: Dict[str, Tuple[FrozenSet[str], float]] = {}
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="qdrant-fanout")
+            if len(self.partitions) > 1 else None
+        )
+
+    def select(self, scope: SearchScope = ANY_SCOPE) -> List[Partition]:
+        return [partition for partition in self.partitions if partition.covers(scope)]
+
+    def vector_names(self, collection: str) -> FrozenSet[str]:
+        """Sparse and named dense vectors of the collection (cached for a few minutes)."""
+        known = self._vector_names.get(collection)
+        if known is not None and time.monotonic() - known[1] < _VECTOR_CHECK_SECONDS:
+            return known[0]
+        try:
+            params = self.client.get_collection(collection_name=collection).config.params
+        except Exception as exc:
+            logger.warning("Could not read the vector config of %s: %s", collection, exc)
+            return frozenset()
+        names = set(params.sparse_vectors or {})
+        if isinstance(params.vectors, dict):
+            names.update(params.vectors)
+        self._vector_names[collection] = (frozenset(names), time.monotonic())
+        return self._vector_names[collection][0]
+
+    def has_sparse(self, collection: str) -> bool:
+        """Whether the collection has the `lexical` sparse vector."""
+        return SPARSE_VECTOR_NAME in self.vector_names(collection)
+
+    def has_claims(self, collection: str) -> bool:
+        """Whether the collection has the `claims` multivector."""
+        return CLAIM_VECTOR_NAME in self.vector_names(collection)
+
+    def supports_sparse(self, scope: SearchScope = ANY_SCOPE) -> bool:
+        """True when any partition in the scope can answer keyword searches."""
+        return any(self.has_sparse(partition.collection) for partition in self.select(scope))
+
+    def _timed(self, partition: Partition, call: Callable[[str], Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            return call(partition.collection)
+        finally:
+            metrics.QDRANT_PARTITION_SECONDS.labels(partition.collection).observe(
+                time.perf_counter() - started
+            )
+
+    def _fan_out(self, partitions: Sequence[Partition], call: Callable[[str], Any]) -> List[Any]:
+        if not partitions:
+            return []
+        if len(partitions) == 1:
+            return [self._timed(partitions[0], call)]
+        futures = [(p, self._executor.submit(self._timed, p, call)) for p in partitions]
+        results, errors = [], []
+        for partition, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as exc:
+                logger.warning("Qdrant partition %s failed: %s", partition.collection, exc)
+                metrics.QDRANT_PARTITION_ERRORS.labels(partition.collection).inc()
+                errors.append(exc)
+        if errors and not results:
+            raise errors[0]
+        return results
+
+    def search_batch(
+        self,
+        query_vectors,
+        limit: int,
+        scope: SearchScope = ANY_SCOPE,
+        sparse_vectors: Optional[Sequence[Optional[qdrant_models.SparseVector]]] = None,
+    ):
+        """
+        Merged top-`limit` scored points per query, best first. Without
+        `sparse_vectors` this is a dense search; with them and no
+        `query_vectors` a sparse one; with both, each query is an RRF fusion
+        of the two. A None sparse vector (no searchable terms) leaves that
+        query dense-only, or empty in a sparse search. Dense queries use the
+        `claims` multivector on partitions that have it.
+        """
+        partitions = self.select(scope)
+        straddling = {p.collection for p in partitions if not p.within(scope)}
+        count = len(query_vectors if query_vectors is not None else sparse_vectors)
+
+        def search_partition(collection: str):
+            query_filter, fetch = None, limit
+            if self.server_filters:
+                query_filter = scope.query_filter(dates=collection in straddling)
+            elif scope.excluded_numbers or collection in straddling:
+                fetch = limit * QDRANT_SCOPE_OVERFETCH
+            claims = self.claim_search and query_vectors is not None and self.has_claims(collection)
+            fuse = sparse_vectors is not None
+            sparse = sparse_vectors if fuse and self.has_sparse(collection) else [None] * count
+            dense = query_vectors if query_vectors is not None else [None] * count
+            requests, slots = [], []
+            for index, (vector, sparse_vector) in enumerate(zip(dense, sparse)):
+                request = _query_request(vector, sparse_vector, query_filter, fetch, claims, fuse)
+                if request is not None:
+                    requests.append(request)
+                    slots.append(index)
+            results = [[] for _ in range(count)]
+            if requests:
+                responses = self.client.query_batch_points(collection_name=collection, requests=requests)
+                for index, response in zip(slots, responses):
+                    results[index] = response.points
+            return results
+
+        per_partition = self._fan_out(partitions, search_partition)
+        post_filter = not self.server_filters and scope.is_filtered
+        merged = []
+        for index in range(count):
+            hits = (
+                point
+                for responses in per_partition
+                for point in responses[index]
+                if not post_filter or scope.matches(point.payload or {})
+            )
+            merged.append(heapq.nlargest(limit, hits, key=lambda point: point.score))
+        return merged
+
+    def search(self, query_vector, limit: int, scope: SearchScope = ANY_SCOPE, sparse_vector=None):
+        """Single-query `search_batch`; pass only `sparse_vector` for a keyword search."""
+        return self.search_batch(
+            [query_vector] if query_vector is not None else None,
+            limit,
+            scope,
+            [sparse_vector] if sparse_vector is not None or query_vector is None else None,
+        )[0]
+
+    def retrieve(self, ids, with_payload: bool = True, with_vectors: bool = False):
+        """
+        Points by ID from whichever partitions hold them. `with_vectors`
+        returns only the main vector, never the sparse or claim vectors.
+        """
+        def retrieve_partition(collection: str):
+            vectors: Any = False
+            if with_vectors:
+                # "" names the main vector once a collection has named ones too
+                vectors = [""] if self.vector_names(collection) else True
+            return self.client.retrieve(
+                collection_name=collection, ids=ids, with_payload=with_payload, with_vectors=vectors
+            )
+
+        per_partition = self._fan_out(self.partitions, retrieve_partition)
+        points, seen = [], set()
+        for partition_points in per_partition:
+            for point in partition_points:
+                if point.id not in seen:
+                    seen.add(point.id)
+                    points.append(point)
+        return points
+
+    def _count_collection(self, collection: str) -> int:
+        count_value = getattr(self.client.count(collection_name=collection, exact=True), "count", None)
+        if isinstance(count_value, (int, float)):
+            return int(count_value)
+        # Some Qdrant versions expose points_count only via get_collection
+        return int(self.client.get_collection(collection_name=collection).points_count or 0)
+
+    def count(self) -> int:
+        return sum(self._fan_out(self.partitions, self._count_collection))
@@ -0,0 +1,81 @@
+import os
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence
+
+RRF_K = int(os.getenv("RRF_K", "60"))
+RETRIEVAL_MAX_VARIANTS = int(os.getenv("RETRIEVAL_MAX_VARIANTS", "5"))
+_MAX_TERMS_PER_VARIANT = 12
+
+
+def _clean_terms(terms: Optional[Iterable[str]]) -> List[str]:
+    cleaned: List[str] = []
+    seen = set()
+    for term in terms or []:
+        if not isinstance(term, str):
+            continue
+        term = " ".join(term.split())
+        if term and term.lower() not in seen:
+            seen.add(term.lower())
+            cleaned.append(term)
+    return cleaned[:_MAX_TERMS_PER_VARIANT]
+
+
+def build_query_variants(
+    user_description: str,
+    query_terms: Optional[Dict[str, Any]] = None,
+    max_variants: int = RETRIEVAL_MAX_VARIANTS,
+) -> List[str]:
+    """
+    Query texts for multi-query retrieval: the search text itself, the raw
+    invention description, and one focused sentence each for the extracted
+    technology terms, subject terms and their related terms. Phrasing
+    mirrors the query the frontend builds from terms.
+    """
+    query_terms = query_terms or {}
+    technology = _clean_terms(query_terms.get("technology"))
+    subject = _clean_terms(query_terms.get("subject"))
+    related = _clean_terms(query_terms.get("related"))
+    description = " ".join(str(query_terms.get("description") or "").split())
+
+    candidates = [user_description, description]
+    if technology:
+        candidates.append(
+            f"A patent describing a device or technology such as: {' or '.join(technology)}."
+        )
+    if subject:
+        candidates.append(
+            f"Applied in the subject matter or field of: {' or '.join(subject)}."
+        )
+    if related:
+        candidates.append(
+            f"A patent describing a device or technology related to: {' or '.join(related)}."
+        )
+
+    variants: List[str] = []
+    seen = set()
+    for text in candidates:
+        text = (text or "").strip()
+        if text and text.lower() not in seen:
+            seen.add(text.lower())
+            variants.append(text)
+    return variants[:max(max_variants, 1)]
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Sequence[Any]],
+    key: Callable[[Any], Hashable],
+    limit: int,
+    k: int = RRF_K,
+) -> List[Any]:
+    """
+    Merge ranked lists with reciprocal-rank fusion (sum of 1 / (k + rank)).
+    The first occurrence of each item is kept; ties keep first-seen order.
+    """
+    fused: Dict[Hashable, float] = {}
+    items: Dict[Hashable, Any] = {}
+    for ranked in ranked_lists:
+        for rank, item in enumerate(ranked, start=1):
+            item_key = key(item)
+            fused[item_key] = fused.get(item_key, 0.0) + 1.0 / (k + rank)
+            items.setdefault(item_key, item)
+    ordered = sorted(fused, key=lambda item_key: fused[item_key], reverse=True)
+    return [items[item_key] for item_key in ordered[:limit]]
@@ -0,0 +1,59 @@
+"""
+Incremental parsing of streamed scoring responses.
+
+Ollama streams a generation as NDJSON lines, each carrying a few characters
+of `response`. The scoring prompt asks for `{"score": ..., "reason": ...}`,
+so the score is complete long before the reason sentence is; the parser
+reports it as soon as the number is terminated, and the full object is
+parsed once the stream ends.
+"""
+import json
+import re
+from typing import Any, Dict, Optional
+
+# A number is only complete once something other than a digit follows it
+_SCORE_PATTERN = re.compile(r'"score"\s*:\s*"?(-?\d+(?:\.\d+)?)\s*"?\s*[,}]')
+# Longest tail that can hold a partial match, so each chunk rescans only that
+_SCAN_OVERLAP = 64
+
+
+class ScoreStreamParser:
+    """Accumulates `response` fragments and finds the score early."""
+
+    def __init__(self):
+        self._parts = []
+        self._buffer = ""
+        self._scan_from = 0
+        self.score: Optional[float] = None
+
+    def feed(self, fragment: str) -> Optional[float]:
+        """Adds a fragment; returns the score the first time it is complete."""
+        if not fragment:
+            return None
+        self._parts.append(fragment)
+        if self.score is not None:
+            return None
+        self._buffer += fragment
+        match = _SCORE_PATTERN.search(self._buffer, self._scan_from)
+        if match is None:
+            self._scan_from = max(len(self._buffer) - _SCAN_OVERLAP, 0)
+            return None
+        self.score = float(match.group(1))
+        self._buffer = ""
+        return self.score
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+def parse_ndjson_line(line: str) -> Optional[Dict[str, Any]]:
+    """One streamed Ollama line, or None for blank or broken lines."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        body = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return body if isinstance(body, dict) else None
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import secrets
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+SEARCH_SESSION_TTL_SECONDS = float(os.getenv("SEARCH_SESSION_TTL_SECONDS", "900"))
+SEARCH_SESSION_ORPHAN_SECONDS = float(os.getenv("SEARCH_SESSION_ORPHAN_SECONDS", "45"))
+SEARCH_SESSION_MAX = int(os.getenv("SEARCH_SESSION_MAX", "200"))
+
+
+class SearchSession:
+    """
+    Server-side state for a single search run.
+
+    The producer task appends `(event, data)` pairs to an append-only log and
+    any number of subscribers stream from a given sequence number, so a
+    reconnecting EventSource replays what it missed and then follows the run
+    that is still in progress instead of starting a new one.
+    """
+
+    def __init__(self, session_id: str, queue_token: Optional[str], query: Any = None):
+        self.id = session_id
+        self.queue_token = queue_token
+        # What was searched, so a token-only reconnect resumes only the same search
+        self.query = query
+        self.events: List[Tuple[str, Dict[str, Any]]] = []
+        self.done = False
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+        self.created_at = time.monotonic()
+        self.touched_at = self.created_at
+        self._changed = asyncio.Condition()
+        self._orphan_handle: Optional[asyncio.TimerHandle] = None
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.id}:{seq}"
+
+    async def append(self, event: str, data: Dict[str, Any]) -> int:
+        async with self._changed:
+            self.events.append((event, data))
+            self.touched_at = time.monotonic()
+            self._changed.notify_all()
+            return len(self.events)
+
+    async def finish(self) -> None:
+        async with self._changed:
+            self.done = True
+            self.touched_at = time.monotonic()
+            self._changed.notify_all()
+        if self._orphan_handle is not None:
+            self._orphan_handle.cancel()
+            self._orphan_handle = None
+
+    def cancel(self) -> None:
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+    def _cancel_if_orphaned(self) -> None:
+        self._orphan_handle = None
+        if self.subscribers == 0 and not self.done:
+            self.cancel()
+
+    async def subscribe(
+        self, after_seq: int = 0
+    ) -> AsyncIterator[Tuple[int, str, Dict[str, Any]]]:
+        """Yield `(seq, event, data)` for every event after `after_seq`."""
+        self.subscribers += 1
+        if self._orphan_handle is not None:
+            self._orphan_handle.cancel()
+            self._orphan_handle = None
+        seq = max(after_seq, 0)
+        try:
+            while True:
+                async with self._changed:
+                    while seq >= len(self.events) and not self.done:
+                        await self._changed.wait()
+                    pending = self.events[seq:]
+                    finished = self.done
+                for event, data in pending:
+                    seq += 1
+                    yield seq, event, data
+                if finished and seq >= len(self.events):
+                    return
+        finally:
+            self.subscribers -= 1
+            self.touched_at = time.monotonic()
+            if self.subscribers == 0 and not self.done and SEARCH_SESSION_ORPHAN_SECONDS > 0:
+                loop = asyncio.get_running_loop()
+                self._orphan_handle = loop.call_later(
+                    SEARCH_SESSION_ORPHAN_SECONDS, self._cancel_if_orphaned
+                )
+
+
+_sessions: Dict[str, SearchSession] = {}
+
+
+def parse_event_id(raw: Optional[str]) -> Tuple[Optional[str], int]:
+    """Split a `<session_id>:<seq>` SSE id into its parts."""
+    if not raw or ":" not in raw:
+        return None, 0
+    session_id, _, seq_text = raw.rpartition(":")
+    try:
+        seq = int(seq_text)
+    except ValueError:
+        return None, 0
+    return (session_id or None), max(seq, 0)
+
+
+def _prune_sessions(now: float) -> None:
+    for session_id, session in list(_sessions.items()):
+        if session.done and session.subscribers == 0 and (
+            now - session.touched_at > SEARCH_SESSION_TTL_SECONDS
+        ):
+            _sessions.pop(session_id, None)
+
+    if len(_sessions) <= SEARCH_SESSION_MAX:
+        return
+    finished = sorted(
+        (s for s in _sessions.values() if s.done and s.subscribers == 0),
+        key=lambda s: s.touched_at,
+    )
+    for session in finished[: len(_sessions) - SEARCH_SESSION_MAX]:
+        _sessions.pop(session.id, None)
+
+
+def create_session(queue_token: Optional[str], query: Any = None) -> SearchSession:
+    _prune_sessions(time.monotonic())
+    session = SearchSession(secrets.token_urlsafe(8), queue_token, query)
+    _sessions[session.id] = session
+    return session
+
+
+def get_session(session_id: Optional[str]) -> Optional[SearchSession]:
+    _prune_sessions(time.monotonic())
+    if not session_id:
+        return None
+    return _sessions.get(session_id)
+
+
+def find_session_for_token(queue_token: Optional[str], query: Any) -> Optional[SearchSession]:
+    """
+    The run still in progress for `queue_token` and the same `query`. A
+    finished run is never matched: its token may since have been granted
+    again for a new search.
+    """
+    if not queue_token:
+        return None
+    for session in _sessions.values():
+        if session.queue_token == queue_token and not session.done and session.query == query:
+            return session
+    return None
@@ -0,0 +1,188 @@
+"""
+Fingerprinted, precompressed frontend assets.
+
+`scripts/build_assets.py` writes content-hashed copies of the files under
+`frontend/` (plus resized WebP/AVIF variants of raster images and `.br`/`.gz`
+siblings of text files) and a `manifest.json` into `ASSET_BUILD_DIR`. The
+template helpers here map logical paths like `discover/smart-toaster.png`
+to those files; without a build they fall back to the plain `/static` mount.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import brotli
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from starlette import status
+
+ASSET_BUILD_DIR = os.getenv("ASSET_BUILD_DIR", "frontend/dist")
+ASSET_URL_PREFIX = "/assets"
+STATIC_URL_PREFIX = "/static"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# Preferred order when the client accepts several
+_ENCODING_PREFERENCE = ("br", "gzip")
+
+mimetypes.add_type("image/avif", ".avif")
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/svg+xml", ".svg")
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available) -> Optional[str]:
+    """Best of `available` ("br"/"gzip") the client accepts, or None for identity."""
+    if not accept_encoding or not available:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip().lower()] = quality
+    for encoding in _ENCODING_PREFERENCE:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if encoding in available and quality > 0:
+            return encoding
+    return None
+
+
+class AssetManifest:
+    """
+    Reads `manifest.json` from the build directory and reloads it when the
+    file changes, so a rebuild is picked up without restarting the API.
+    """
+
+    def __init__(self, build_dir: str):
+        self.build_dir = Path(build_dir)
+        self._path = self.build_dir / "manifest.json"
+        self._mtime: Optional[float] = None
+        self._data: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _current(self) -> Dict[str, Any]:
+        try:
+            mtime = self._path.stat().st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            with self._lock:
+                data: Dict[str, Any] = {}
+                if mtime is not None:
+                    try:
+                        with open(self._path, "r", encoding="utf-8") as source:
+                            data = json.load(source)
+                    except (OSError, ValueError) as exc:
+                        print(f"[WARN][ASSETS] Could not read {self._path}: {exc}")
+                self._data, self._mtime = data, mtime
+        return self._data
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._current().get("version")
+
+    def url(self, path: str) -> str:
+        entry = self._current().get("assets", {}).get(path)
+        if entry is None:
+            return f"{STATIC_URL_PREFIX}/{path}"
+        return f"{ASSET_URL_PREFIX}/{entry}"
+
+    def image(self, path: str) -> Dict[str, Any]:
+        """`src` plus per-format `srcset` strings for a `<picture>` element."""
+        image = self._current().get("images", {}).get(path)
+        if image is None:
+            return {"src": self.url(path), "srcset": {}}
+        srcset = {
+            fmt: ", ".join(
+                f"{ASSET_URL_PREFIX}/{variant['path']} {variant['width']}w" for variant in variants
+            )
+            for fmt, variants in image["variants"].items()
+        }
+        return {"src": f"{ASSET_URL_PREFIX}/{image['src']}", "srcset": srcset}
+
+    def file_entry(self, served_path: str) -> Optional[Dict[str, Any]]:
+        return self._current().get("files", {}).get(served_path)
+
+
+asset_manifest = AssetManifest(ASSET_BUILD_DIR)
+
+
+def asset_response(request: Request, served_path: str) -> Response:
+    """
+    Serve one built file with `Accept-Encoding` negotiation. Only paths
+    listed in the manifest are served, so nothing outside the build leaks.
+    """
+    entry = asset_manifest.file_entry(served_path)
+    if entry is None:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), entry.get("encodings", []))
+    etag = f'"{entry["hash"]}-{encoding or "identity"}"'
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    file_path = asset_manifest.build_dir / served_path
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        file_path = file_path.with_name(file_path.name + ENCODING_SUFFIXES[encoding])
+    media_type = mimetypes.guess_type(served_path)[0] or "application/octet-stream"
+    return FileResponse(file_path, media_type=media_type, headers=headers)
+
+
+class RenderedPage:
+    """
+    A template rendered once, with gzip/brotli copies, and re-rendered only
+    when the template file or the asset manifest changes.
+    """
+
+    def __init__(self, templates, name: str, template_path: str):
+        self.templates = templates
+        self.name = name
+        self.template_path = template_path
+        self._key: Optional[Tuple[Any, ...]] = None
+        self._bodies: Dict[Optional[str], bytes] = {}
+        self._etag = ""
+        self._lock = threading.Lock()
+
+    def _render(self) -> Tuple[Dict[Optional[str], bytes], str]:
+        try:
+            mtime = os.stat(self.template_path).st_mtime
+        except OSError:
+            mtime = None
+        key = (mtime, asset_manifest.version)
+        with self._lock:
+            if key != self._key:
+                html = self.templates.get_template(self.name).render().encode("utf-8")
+                self._bodies = {
+                    None: html,
+                    "gzip": gzip.compress(html, compresslevel=9),
+                    "br": brotli.compress(html, quality=11),
+                }
+                self._etag = '"' + hashlib.sha1(html).hexdigest()[:16]
+                self._key = key
+            return self._bodies, self._etag
+
+    def response(self, request: Request) -> Response:
+        bodies, etag_base = self._render()
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), ("br", "gzip"))
+        etag = f'{etag_base}-{encoding or "identity"}"'
+        # Fingerprinted assets are immutable, the page itself must revalidate
+        headers = {"Cache-Control": "no-cache", "ETag": etag, "Vary": "Accept-Encoding"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=bodies[encoding], media_type="text/html", headers=headers)
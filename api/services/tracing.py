@@ -0,0 +1,223 @@
+"""
+Per-search timeline traces and opt-in profiling.
+
+Each search run gets a `SearchTrace` held in a context variable, so code
+deep in the pipeline (scoring calls run as separate tasks) can add spans
+without threading the trace through every signature. Finished traces are
+appended as one JSON line each to `TRACE_SINK_PATH`.
+
+Profiling is off by default. An admin can enable it at runtime: a share
+of searches is then profiled with cProfile (one at a time, since the
+profiler covers the whole event-loop thread) and an event-loop lag monitor
+records how long the loop was blocked during each traced search.
+"""
+import asyncio
+import contextvars
+import cProfile
+import json
+import os
+import random
+import secrets
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+TRACE_SINK_PATH = os.getenv("TRACE_SINK_PATH", "traces/search_traces.jsonl")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "traces/profiles")
+SEARCH_TIMINGS_IN_COMPLETE = os.getenv("SEARCH_TIMINGS_IN_COMPLETE", "0").lower() in ("1", "true", "yes")
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.05"))
+
+_current_trace: contextvars.ContextVar[Optional["SearchTrace"]] = contextvars.ContextVar(
+    "search_trace", default=None
+)
+_sink_lock = threading.Lock()
+
+
+class SearchTrace:
+    def __init__(self, kind: str = "search"):
+        self.trace_id = secrets.token_hex(8)
+        self.kind = kind
+        self.mono_start = time.monotonic()
+        self.wall_start = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self.attributes: Dict[str, Any] = {}
+
+    def add_span(self, name: str, start: float, end: float, **attributes: Any) -> None:
+        """Record a span from two `time.monotonic()` readings."""
+        span = {
+            "name": name,
+            "start": round(self.wall_start + (start - self.mono_start), 6),
+            "durationMs": round((end - start) * 1000, 3),
+        }
+        if attributes:
+            span["attributes"] = attributes
+        self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any):
+        """Time a block; the yielded dict can be filled with attributes."""
+        start = time.monotonic()
+        try:
+            yield attributes
+        finally:
+            self.add_span(name, start, time.monotonic(), **attributes)
+
+    def summary(self) -> Dict[str, Any]:
+        """Compact per-stage timings for the `complete` SSE event."""
+        stages: Dict[str, Any] = {}
+        score_ms = []
+        for span in self.spans:
+            if span["name"] == "score":
+                score_ms.append(span["durationMs"])
+            else:
+                stages[span["name"]] = span["durationMs"]
+        if score_ms:
+            stages["score"] = {
+                "count": len(score_ms),
+                "p50": round(statistics.median(score_ms), 1),
+                "max": round(max(score_ms), 1),
+            }
+        return {
+            "traceId": self.trace_id,
+            "elapsedMs": round((time.monotonic() - self.mono_start) * 1000, 1),
+            "stages": stages,
+        }
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "kind": self.kind,
+            "start": self.wall_start,
+            "durationMs": round((time.monotonic() - self.mono_start) * 1000, 3),
+            "attributes": self.attributes,
+            "spans": self.spans,
+        }
+
+
+def current_trace() -> Optional[SearchTrace]:
+    return _current_trace.get()
+
+
+def set_current_trace(trace: Optional[SearchTrace]) -> None:
+    _current_trace.set(trace)
+
+
+@contextmanager
+def trace_span(name: str, **attributes: Any):
+    """Span on the current trace, or a no-op outside a traced search."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield attributes
+        return
+    with trace.span(name, **attributes) as attrs:
+        yield attrs
+
+
+def write_trace(trace: SearchTrace) -> None:
+    if not TRACE_SINK_PATH:
+        return
+    line = json.dumps(trace.to_record()) + "\n"
+    try:
+        path = Path(TRACE_SINK_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with _sink_lock, open(path, "a", encoding="utf-8") as sink:
+            sink.write(line)
+    except OSError as exc:
+        print(f"[WARN][TRACE] Could not write trace {trace.trace_id}: {exc}")
+
+
+# ---- Opt-in profiling ----
+
+class LoopLagMonitor:
+    """Samples how late a periodic sleep wakes up; that delay is loop blocking."""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS, keep: int = 12000):
+        self.interval = interval
+        self.samples: Deque[Tuple[float, float]] = deque(maxlen=keep)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.samples.append((now, max(now - expected, 0.0)))
+
+    def max_lag_since(self, since: float) -> Optional[float]:
+        lags = [lag for at, lag in self.samples if at >= since]
+        return max(lags) if lags else None
+
+
+class ProfilingController:
+    def __init__(self):
+        self.sample_rate = 0.0
+        self.loop_lag = False
+        self.loop_monitor = LoopLagMonitor()
+        self._active_profile: Optional[cProfile.Profile] = None
+
+    def configure(self, sample_rate: float, loop_lag: bool) -> None:
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.loop_lag = loop_lag
+        if loop_lag:
+            self.loop_monitor.start()
+        else:
+            self.loop_monitor.stop()
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "sampleRate": self.sample_rate,
+            "loopLag": self.loop_lag,
+            "profiling": self._active_profile is not None,
+        }
+
+    def maybe_start(self, trace: SearchTrace) -> Optional[cProfile.Profile]:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if self._active_profile is not None:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) already owns the thread
+            return None
+        self._active_profile = profile
+        trace.attributes["profiled"] = True
+        return profile
+
+    def finish(self, trace: SearchTrace, profile: Optional[cProfile.Profile]) -> None:
+        if self.loop_monitor.running:
+            lag = self.loop_monitor.max_lag_since(trace.mono_start)
+            if lag is not None:
+                trace.attributes["loopLagMaxMs"] = round(lag * 1000, 1)
+        if profile is None:
+            return
+        profile.disable()
+        self._active_profile = None
+        try:
+            Path(PROFILE_DIR).mkdir(parents=True, exist_ok=True)
+            path = Path(PROFILE_DIR) / f"{trace.trace_id}.prof"
+            profile.dump_stats(str(path))
+            trace.attributes["profile"] = str(path)
+        except OSError as exc:
+            print(f"[WARN][TRACE] Could not write profile {trace.trace_id}: {exc}")
+
+
+profiling = ProfilingController()
@@ -0,0 +1,182 @@
+"""
+Run the real search API against in-memory Qdrant and fake Ollama backends.
+
+Environment is set before `api.main` is imported because the app reads its
+configuration at import time. The `uspto_patents` collection is filled with
+synthetic patents (random unit vectors of the embedding model's dimension,
+plus lexical sparse vectors of their titles and abstracts), so retrieval
+costs look like production without any data on disk. Payloads are slim, with
+the text fields in a temporary doc store, unless `--full-payloads` is given.
+`--claim-vectors N` adds a `claims` multivector of N + 1 vectors per patent.
+`--duplicate-rate` makes that share of patents near-copies of a recent one
+(same title and abstract, almost the same vector), like continuations.
+
+    python -m loadtest.api_server --patents 20000 --ollama-ports 11430,11431
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+_WORDS = (
+    "sensor actuator controller battery thermal valve optical wireless antenna "
+    "polymer membrane catalyst rotor bearing circuit inverter lidar camera "
+    "vehicle drone implant catheter pump compressor filter laser coating "
+    "substrate semiconductor display hinge latch spring gear motor robot"
+).split()
+
+
+def synthetic_payload(rng: random.Random, index: int) -> dict:
+    title_words = rng.sample(_WORDS, 4)
+    abstract_words = [rng.choice(_WORDS) for _ in range(rng.randint(60, 160))]
+    abstract = " ".join(abstract_words).capitalize() + "."
+    filing_date = f"20{rng.randint(0, 24):02d}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+    return {
+        "title": " ".join(title_words).title(),
+        "abstract": abstract,
+        "filingDate": filing_date,
+        "filingDateInt": int(filing_date),
+        "patentNumber": str(9_000_000 + index),
+        "googlePatentUrl": f"https://patents.google.com/patent/US{9_000_000 + index}/en",
+        "preview": abstract[:500],
+        "file_path": f"synthetic/{index}.xml",
+    }
+
+
+def unit_vector(rng: random.Random, dimension: int) -> list:
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimension)]
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+def seed_collection(
+    client,
+    collection: str,
+    dimension: int,
+    count: int,
+    seed: int,
+    doc_store=None,
+    claim_vectors: int = 0,
+    duplicate_rate: float = 0.0,
+) -> None:
+    from qdrant_client import models as qdrant_models
+
+    from vectorization.claims import CLAIM_VECTOR_NAME
+    from vectorization.doc_store import split_payload
+    from vectorization.lexical import SPARSE_VECTOR_NAME, document_vector
+
+    rng = random.Random(seed)
+    vectors_config = qdrant_models.VectorParams(size=dimension, distance=qdrant_models.Distance.COSINE)
+    if claim_vectors:
+        vectors_config = {
+            "": vectors_config,
+            CLAIM_VECTOR_NAME: qdrant_models.VectorParams(
+                size=dimension,
+                distance=qdrant_models.Distance.COSINE,
+                multivector_config=qdrant_models.MultiVectorConfig(
+                    comparator=qdrant_models.MultiVectorComparator.MAX_SIM
+                ),
+            ),
+        }
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    client.create_collection(
+        collection_name=collection,
+        vectors_config=vectors_config,
+        sparse_vectors_config={
+            SPARSE_VECTOR_NAME: qdrant_models.SparseVectorParams(modifier=qdrant_models.Modifier.IDF)
+        },
+    )
+    batch, documents = [], []
+    # Recent originals that near-copies are made from
+    originals = []
+    for index in range(count):
+        vector = unit_vector(rng, dimension)
+        payload = synthetic_payload(rng, index)
+        if originals and rng.random() < duplicate_rate:
+            source_vector, source_payload = rng.choice(originals)
+            # Cosine similarity of about 0.995 with the original
+            noise = 0.1 / dimension ** 0.5
+            vector = [v + rng.gauss(0.0, noise) for v in source_vector]
+            norm = sum(v * v for v in vector) ** 0.5 or 1.0
+            vector = [v / norm for v in vector]
+            payload.update({key: source_payload[key] for key in ("title", "abstract", "preview")})
+        else:
+            originals = (originals + [(vector, dict(payload))])[-256:]
+        indices, values = document_vector(payload)
+        if doc_store is not None:
+            payload, document = split_payload(payload)
+            documents.append((str(index), document))
+        vectors = {
+            "": vector,
+            SPARSE_VECTOR_NAME: qdrant_models.SparseVector(indices=indices, values=values),
+        }
+        if claim_vectors:
+            vectors[CLAIM_VECTOR_NAME] = [vector] + [unit_vector(rng, dimension) for _ in range(claim_vectors)]
+        batch.append(qdrant_models.PointStruct(id=index, vector=vectors, payload=payload))
+        if len(batch) >= 512:
+            client.upsert(collection_name=collection, points=batch)
+            batch = []
+    if batch:
+        client.upsert(collection_name=collection, points=batch)
+    if doc_store is not None:
+        doc_store.put_many(documents)
+
+
+def configure_environment(args) -> None:
+    os.environ["QDRANT_URL"] = ":memory:"
+    os.environ.pop("QDRANT_PATH", None)
+    os.environ["OLLAMA_HOST"] = f"http://{args.ollama_host}"
+    os.environ["OLLAMA_PORTS"] = args.ollama_ports
+    os.environ["ADMIN_TOKEN"] = args.admin_token
+    os.environ["TRACE_SINK_PATH"] = args.trace_path
+    # The driver matches traces (and their loop lag) by the id in `complete`
+    os.environ["SEARCH_TIMINGS_IN_COMPLETE"] = "1"
+    os.environ.setdefault("RATE_LIMIT_MAX_REQUESTS", "1000000")
+    os.environ.setdefault("BATCH_JOBS_DIR", tempfile.mkdtemp(prefix="loadtest-batch-"))
+    if args.full_payloads:
+        os.environ.pop("DOC_STORE_PATH", None)
+    else:
+        os.environ["DOC_STORE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="loadtest-docs-"), "docs.sqlite")
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--patents", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--ollama-host", default="127.0.0.1")
+    parser.add_argument("--ollama-ports", default="11430,11431,11432,11433,11434,11435,11436,11437")
+    parser.add_argument("--admin-token", default="loadtest")
+    parser.add_argument("--full-payloads", action="store_true",
+                        help="keep abstract and file path in Qdrant instead of a doc store")
+    parser.add_argument("--claim-vectors", type=int, default=0,
+                        help="claim vectors per patent in a `claims` multivector (0 = none)")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0,
+                        help="share of patents that are near-copies of an earlier one")
+    parser.add_argument("--trace-path", default=os.path.join(tempfile.gettempdir(), "loadtest_traces.jsonl"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search API on synthetic data")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_environment(args)
+
+    import uvicorn
+    from api import main as api_main
+
+    from vectorization.doc_store import open_store
+
+    dimension = api_main._model.get_sentence_embedding_dimension()
+    print(f"[LOADTEST] Seeding {args.patents} synthetic patents ({dimension}-dim)", file=sys.stderr)
+    seed_collection(
+        api_main._qdrant, api_main.QDRANT_COLLECTION, dimension, args.patents, args.seed, open_store(),
+        args.claim_vectors, args.duplicate_rate,
+    )
+    uvicorn.run(api_main.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
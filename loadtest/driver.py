@@ -0,0 +1,364 @@
+"""
+Concurrent search clients for load tests.
+
+Each client repeats the frontend's flow: poll `/api/search/enqueue` (with
+the same backoff on 429) until a slot is granted, then follow the SSE
+`/api/search` stream to `complete`. Per search it records queue wait,
+time to first result and total time; the run reports percentiles,
+throughput and, when the API's trace file is readable, event-loop lag.
+Time to first paint is when the first result the frontend would show
+(score at or above `--display-score`) has everything its card needs. For
+`--compact` streams, that includes the `/api/patents` details, which the
+driver fetches like the frontend does: batches of up to 20 IDs, or whatever
+is pending after 100 ms. Bytes per search count the stream plus those
+detail responses. With `--prefetch-seconds`, each client first posts its search to
+`/api/search/prefetch`, as the frontend does while the user is writing,
+and searches with the prefetch key that many seconds later; times still
+start at the search.
+
+    python -m loadtest.driver --base-url http://127.0.0.1:8765 --clients 16 --searches 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+_DESCRIPTIONS = [
+    "A battery thermal management system with a controller that adjusts coolant flow from cell sensor readings.",
+    "An optical lidar sensor for vehicles with a rotating mirror and a laser diode array.",
+    "A wearable implant that pumps medication through a catheter based on a glucose sensor.",
+    "A drone with foldable rotor arms latched by a spring hinge for compact storage.",
+    "A semiconductor substrate coating that reduces thermal stress in display panels.",
+]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[rank]
+
+
+def distribution(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": _round(percentile(values, 50)),
+        "p95": _round(percentile(values, 95)),
+        "max": _round(max(values) if values else None),
+        "mean": _round(statistics.fmean(values) if values else None),
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+def queue_delay(position: Optional[int], scale: float) -> float:
+    """Same backoff as the frontend's `waitForQueueDelay`, scaled."""
+    extra = max(position or 0, 0) * 1.0
+    return min(12.0, 2.0 + extra) * scale
+
+
+_DETAILS_BATCH = 20
+_DETAILS_DELAY_SECONDS = 0.1
+
+
+class DetailsFetcher:
+    """The frontend's batched `/api/patents` fetches for displayed compact results."""
+
+    def __init__(self, client: httpx.AsyncClient, granted: float, record: Dict[str, Any]):
+        self.client = client
+        self.granted = granted
+        self.record = record
+        self.pending: List[str] = []
+        self.tasks: List[asyncio.Task] = []
+        self.timer: Optional[asyncio.Task] = None
+
+    def queue(self, point_id: str) -> None:
+        self.pending.append(point_id)
+        if len(self.pending) >= _DETAILS_BATCH:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(_DETAILS_DELAY_SECONDS)
+        self.timer = None
+        self.flush()
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            self.tasks.append(asyncio.create_task(self._fetch(batch)))
+
+    async def _fetch(self, ids: List[str]) -> None:
+        response = await self.client.get("/api/patents", params={"ids": ",".join(ids)})
+        self.record["bytes"] += len(response.content)
+        if response.status_code == 200 and "firstPaintMs" not in self.record:
+            self.record["firstPaintMs"] = (time.monotonic() - self.granted) * 1000
+
+    async def finish(self) -> None:
+        self.flush()
+        await asyncio.gather(*self.tasks)
+
+
+async def run_search(client: httpx.AsyncClient, args, description: str) -> Dict[str, Any]:
+    record: Dict[str, Any] = {"ok": False}
+    prefetch_key = None
+    if args.prefetch_seconds:
+        response = await client.post("/api/search/prefetch", json={"userDescription": description})
+        response.raise_for_status()
+        prefetch_key = response.json().get("prefetchKey")
+        await asyncio.sleep(args.prefetch_seconds)
+    started = time.monotonic()
+    queue_token = None
+    while True:
+        response = await client.post(
+            "/api/search/enqueue",
+            json={"userDescription": description, "queueToken": queue_token},
+        )
+        data = response.json()
+        queue_token = data.get("queueToken", queue_token)
+        if response.status_code == 429:
+            await asyncio.sleep(queue_delay(data.get("queuePosition"), args.poll_scale))
+            continue
+        response.raise_for_status()
+        break
+    granted = time.monotonic()
+    record["queueWaitMs"] = (granted - started) * 1000
+
+    params = {
+        "userDescription": description,
+        "maxDisplayResults": args.max_results,
+        "queueToken": queue_token,
+    }
+    if args.compact:
+        params["compact"] = "true"
+    if prefetch_key:
+        params["prefetchKey"] = prefetch_key
+    results = 0
+    shown = 0
+    record["bytes"] = 0
+    details = DetailsFetcher(client, granted, record) if args.compact else None
+    event = None
+    async with client.stream("GET", "/api/search", params=params) as stream:
+        if stream.status_code != 200:
+            record["error"] = f"HTTP {stream.status_code}"
+            return record
+        async for line in stream.aiter_lines():
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:") and event:
+                if event == "result":
+                    results += 1
+                    if results == 1:
+                        record["firstResultMs"] = (time.monotonic() - granted) * 1000
+                    result = json.loads(line[5:]).get("result") or {}
+                    score = result.get("score")
+                    if (score is not None and score >= args.display_score
+                            and not result.get("duplicateOf") and shown < args.max_results):
+                        shown += 1
+                        if details is not None:
+                            details.queue(result["id"])
+                        elif "firstPaintMs" not in record:
+                            record["firstPaintMs"] = (time.monotonic() - granted) * 1000
+                elif event == "complete":
+                    payload = json.loads(line[5:])
+                    record["traceId"] = (payload.get("timings") or {}).get("traceId")
+                    record["scoringCalls"] = payload.get("scoring_calls")
+                    record["duplicatesCollapsed"] = payload.get("duplicates_collapsed")
+                    record["prefetch"] = payload.get("prefetch")
+                    record["prescored"] = payload.get("prescored")
+                    record["ok"] = True
+                    break
+                elif event == "error":
+                    record["error"] = json.loads(line[5:]).get("message")
+                    break
+        record["bytes"] += stream.num_bytes_downloaded
+    if details is not None:
+        await details.finish()
+    record["totalMs"] = (time.monotonic() - started) * 1000
+    record["results"] = results
+    return record
+
+
+async def client_loop(client: httpx.AsyncClient, args, rng: random.Random, records: List[Dict[str, Any]]):
+    for _ in range(args.searches):
+        try:
+            records.append(await run_search(client, args, rng.choice(_DESCRIPTIONS)))
+        except (httpx.HTTPError, ValueError) as exc:
+            records.append({"ok": False, "error": str(exc)})
+
+
+def loop_lag_for(trace_path: Optional[str], trace_ids: set) -> List[float]:
+    if not trace_path or not os.path.exists(trace_path):
+        return []
+    lags = []
+    with open(trace_path, "r", encoding="utf-8") as traces:
+        for line in traces:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            lag = record.get("attributes", {}).get("loopLagMaxMs")
+            if record.get("traceId") in trace_ids and lag is not None:
+                lags.append(float(lag))
+    return lags
+
+
+async def run(args) -> Dict[str, Any]:
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+    limits = httpx.Limits(max_connections=args.clients * 2 + 4)
+    headers = {"X-Admin-Token": args.admin_token} if args.admin_token else {}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+        if args.admin_token:
+            response = await client.put(
+                "/api/admin/profiling", json={"sampleRate": 0.0, "loopLag": True}, headers=headers
+            )
+            if response.status_code != 200:
+                print(f"[LOADTEST] Could not enable loop-lag monitoring: HTTP {response.status_code}",
+                      file=sys.stderr)
+
+        records: List[Dict[str, Any]] = []
+        started = time.monotonic()
+        await asyncio.gather(*(
+            client_loop(client, args, random.Random(args.seed + index), records)
+            for index in range(args.clients)
+        ))
+        elapsed = time.monotonic() - started
+
+        if args.admin_token:
+            await client.put("/api/admin/profiling", json={"sampleRate": 0.0, "loopLag": False},
+                             headers=headers)
+
+    completed = [record for record in records if record["ok"]]
+    trace_ids = {record["traceId"] for record in completed if record.get("traceId")}
+    scoring_calls = [r["scoringCalls"] for r in completed if r.get("scoringCalls") is not None]
+    collapsed = [r["duplicatesCollapsed"] for r in completed if r.get("duplicatesCollapsed") is not None]
+    prefetch_reuse: Dict[str, int] = {}
+    for record in completed:
+        if args.prefetch_seconds:
+            key = record.get("prefetch") or "miss"
+            prefetch_reuse[key] = prefetch_reuse.get(key, 0) + 1
+    prescored = [r["prescored"] for r in completed if r.get("prescored") is not None]
+    errors: Dict[str, int] = {}
+    for record in records:
+        if not record["ok"]:
+            key = record.get("error") or "incomplete"
+            errors[key] = errors.get(key, 0) + 1
+    return {
+        "config": {
+            "clients": args.clients,
+            "searchesPerClient": args.searches,
+            "maxResults": args.max_results,
+            "compact": args.compact,
+            "prefetchSeconds": args.prefetch_seconds,
+        },
+        "elapsedSeconds": round(elapsed, 2),
+        "searches": len(records),
+        "completed": len(completed),
+        "errors": errors,
+        "throughputPerMinute": round(len(completed) / elapsed * 60, 2) if elapsed else None,
+        "queueWaitMs": distribution([r["queueWaitMs"] for r in completed]),
+        "timeToFirstResultMs": distribution([r["firstResultMs"] for r in completed if "firstResultMs" in r]),
+        "timeToFirstPaintMs": distribution([r["firstPaintMs"] for r in completed if "firstPaintMs" in r]),
+        "bytesPerSearch": distribution([r["bytes"] for r in completed]),
+        "totalMs": distribution([r["totalMs"] for r in completed]),
+        "loopLagMaxMs": distribution(loop_lag_for(args.trace_path, trace_ids)),
+        "scoringCallsPerSearch": round(sum(scoring_calls) / len(scoring_calls), 1) if scoring_calls else None,
+        "duplicatesCollapsedPerSearch": round(sum(collapsed) / len(collapsed), 1) if collapsed else None,
+        "prefetchReuse": prefetch_reuse or None,
+        "prescoredPerSearch": round(sum(prescored) / len(prescored), 1) if prescored else None,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    lines = []
+    for metric in ("queueWaitMs", "timeToFirstResultMs", "timeToFirstPaintMs", "totalMs", "bytesPerSearch",
+                   "loopLagMaxMs"):
+        for stat in ("p50", "p95"):
+            now = report.get(metric, {}).get(stat)
+            before = baseline.get(metric, {}).get(stat)
+            if now is None or not before:
+                continue
+            lines.append(f"  {metric}.{stat}: {before} -> {now} ({(now - before) / before * 100:+.1f}%)")
+    for metric in ("throughputPerMinute", "backendSecondsPerSearch", "scoringCallsPerSearch"):
+        now, before = report.get(metric), baseline.get(metric)
+        if now is not None and before:
+            lines.append(f"  {metric}: {before} -> {now} ({(now - before) / before * 100:+.1f}%)")
+    return lines
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{report['completed']}/{report['searches']} searches completed in "
+          f"{report['elapsedSeconds']}s ({report['throughputPerMinute']}/min)")
+    for metric in ("queueWaitMs", "timeToFirstResultMs", "timeToFirstPaintMs", "totalMs", "bytesPerSearch",
+                   "loopLagMaxMs"):
+        stats = report[metric]
+        print(f"  {metric:<20} p50={stats['p50']} p95={stats['p95']} max={stats['max']}")
+    if report.get("scoringCallsPerSearch") is not None:
+        print(f"  scoring calls/search {report['scoringCallsPerSearch']} "
+              f"({report['duplicatesCollapsedPerSearch']} near-duplicates collapsed)")
+    if report.get("prefetchReuse"):
+        print(f"  prefetch reuse {report['prefetchReuse']} "
+              f"({report['prescoredPerSearch']} pre-scored candidates/search)")
+    if report.get("backendSecondsPerSearch") is not None:
+        print(f"  backend seconds/search {report['backendSecondsPerSearch']} "
+              f"({report['abortedGenerations']}/{report['generations']} generations stopped early)")
+    for error, count in report["errors"].items():
+        print(f"  error x{count}: {error}")
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--base-url", default="http://127.0.0.1:8765")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--searches", type=int, default=3, help="searches per client")
+    parser.add_argument("--max-results", type=int, default=15)
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--display-score", type=float, default=60,
+                        help="lowest score the frontend shows (its default score threshold)")
+    parser.add_argument("--poll-scale", type=float, default=0.25,
+                        help="multiplier on the frontend's queue polling delay")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--admin-token", default="loadtest",
+                        help="enables loop-lag monitoring through /api/admin/profiling")
+    parser.add_argument("--trace-path", default=None, help="API trace file, for loop lag")
+    parser.add_argument("--prefetch-seconds", type=float, default=0.0,
+                        help="prefetch each search this long before running it (0: no prefetch)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+
+
+def report_and_compare(report: Dict[str, Any], args) -> None:
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as source:
+            baseline = json.load(source)
+        print("Against baseline:")
+        for line in compare(report, baseline):
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search API load driver")
+    add_arguments(parser)
+    args = parser.parse_args()
+    report_and_compare(asyncio.run(run(args)), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Fake Ollama `/api/generate` backends for load tests.
+
+Serves one HTTP listener per port (like the 8 GPU-bound instances) from a
+single process. Each backend runs at most `--capacity` generations at once
+and queues the rest, like OLLAMA_NUM_PARALLEL. Latency is log-normal
+around `--latency-median`; a share of
+calls fail with HTTP 500 or return text without a JSON object. Both
+`"stream": false` and NDJSON streaming responses are supported, with the
+same timing fields Ollama reports. A streaming client that disconnects
+stops its generation and frees the slot, as with Ollama. `GET /fake/stats`
+reports the seconds generation slots were held ("GPU-seconds"). With
+`--keep-alive`, the model "unloads" after that many idle seconds: the next
+call pays `--cold-load-seconds` and reports it as `load_duration`, and
+`/api/ps` lists the model only while it is loaded. A call without a prompt
+only loads the model, as with Ollama.
+
+    python -m loadtest.fake_ollama --ports 11430,11431 --latency-median 1.5
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_REASONS = [
+    "Shares the core sensing and control features in the same field.",
+    "Different application domain with only generic overlap.",
+    "Teaches an analogous mechanism but lacks the claimed controller.",
+]
+
+
+def build_app(args) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+    rng = random.Random(args.seed)
+    slots = asyncio.Semaphore(max(args.capacity, 1))
+
+    def sample_latency() -> float:
+        latency = rng.lognormvariate(0, args.latency_sigma) * args.latency_median
+        return min(latency, args.latency_max)
+
+    def response_text() -> str:
+        if rng.random() < args.malformed_rate:
+            return "Sure! This patent looks fairly relevant to the invention."
+        return json.dumps({"score": rng.randint(0, 100), "reason": rng.choice(_REASONS)})
+
+    def timing_fields(prompt: str, text: str, elapsed: float, cold: bool) -> dict:
+        prompt_tokens = max(len(prompt) // 4, 1)
+        eval_tokens = max(len(text) // 4, 1)
+        prompt_share = min(prompt_tokens / (prompt_tokens + eval_tokens * 8), 0.9)
+        load_ns = int(args.cold_load_seconds * 1e9) if cold else 100_000
+        return {
+            "total_duration": int(elapsed * 1e9) + load_ns,
+            "load_duration": load_ns,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(elapsed * prompt_share * 1e9),
+            "eval_count": eval_tokens,
+            "eval_duration": int(elapsed * (1 - prompt_share) * 1e9),
+        }
+
+    loaded_at = {"last": 0.0}
+    stats = {"busySeconds": 0.0, "generations": 0, "aborted": 0}
+
+    def is_cold() -> bool:
+        now = time.monotonic()
+        cold = args.keep_alive > 0 and now - loaded_at["last"] > args.keep_alive
+        loaded_at["last"] = now
+        return cold
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        prompt = body.get("prompt", "")
+        model = body.get("model", "fake")
+        if not prompt:
+            cold = is_cold()
+            if cold:
+                await asyncio.sleep(args.cold_load_seconds)
+            load_ns = int(args.cold_load_seconds * 1e9) if cold else 100_000
+            return {"model": model, "response": "", "done": True, "done_reason": "load",
+                    "total_duration": load_ns, "load_duration": load_ns}
+        latency = sample_latency()
+        cold = is_cold()
+        if cold:
+            latency += args.cold_load_seconds
+
+        if rng.random() < args.failure_rate:
+            await asyncio.sleep(latency * rng.random())
+            return JSONResponse(status_code=500, content={"error": "fake backend failure"})
+
+        text = response_text()
+        if not body.get("stream", True):
+            async with slots:
+                await asyncio.sleep(latency)
+                stats["busySeconds"] += latency
+                stats["generations"] += 1
+            return {
+                "model": model,
+                "response": text,
+                "done": True,
+                **timing_fields(prompt, text, latency, cold),
+            }
+
+        async def stream():
+            chunks = [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+            # Time to first token ~ prompt eval; the rest is spread over tokens
+            first = latency * 0.3
+            per_chunk = (latency - first) / len(chunks)
+            async with slots:
+                started = time.monotonic()
+                finished = False
+                try:
+                    await asyncio.sleep(first)
+                    for chunk in chunks:
+                        yield json.dumps({"model": model, "response": chunk, "done": False}) + "\n"
+                        await asyncio.sleep(per_chunk)
+                    finished = True
+                finally:
+                    stats["busySeconds"] += time.monotonic() - started
+                    stats["generations"] += 1
+                    stats["aborted"] += not finished
+            yield json.dumps({
+                "model": model,
+                "response": "",
+                "done": True,
+                **timing_fields(prompt, text, latency, cold),
+            }) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.get("/fake/stats")
+    async def fake_stats():
+        return {key: round(value, 3) for key, value in stats.items()}
+
+    @app.get("/api/ps")
+    async def ps():
+        idle = time.monotonic() - loaded_at["last"]
+        loaded = args.keep_alive <= 0 or (loaded_at["last"] > 0 and idle <= args.keep_alive)
+        name = "llama3.1-gpu-optimized:latest"
+        return {"models": [{"name": name, "model": name}] if loaded else []}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "llama3.1-gpu-optimized:latest"}]}
+
+    return app
+
+
+async def serve(args) -> None:
+    ports = [int(p) for p in args.ports.split(",") if p.strip()]
+    servers = []
+    for offset, port in enumerate(ports):
+        backend_args = argparse.Namespace(**vars(args))
+        backend_args.seed = args.seed + offset
+        config = uvicorn.Config(
+            build_app(backend_args), host=args.host, port=port, log_level="warning"
+        )
+        servers.append(uvicorn.Server(config))
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ports", default="11430,11431,11432,11433,11434,11435,11436,11437")
+    parser.add_argument("--latency-median", type=float, default=1.0, help="seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal shape")
+    parser.add_argument("--latency-max", type=float, default=30.0)
+    parser.add_argument("--capacity", type=int, default=4,
+                        help="concurrent generations per backend; the rest queue")
+    parser.add_argument("--failure-rate", type=float, default=0.01)
+    parser.add_argument("--malformed-rate", type=float, default=0.02)
+    parser.add_argument("--keep-alive", type=float, default=0.0,
+                        help="seconds idle before the model 'unloads' (0 = always warm)")
+    parser.add_argument("--cold-load-seconds", type=float, default=4.0)
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama backends")
+    add_arguments(parser)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
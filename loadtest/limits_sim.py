@@ -0,0 +1,157 @@
+"""
+Simulation of the adaptive per-backend Ollama limits.
+
+Drives `BackendPool` from `api.services.ollama_service` with many concurrent
+callers against in-process fake backends, each with a fixed number of
+generation slots (like OLLAMA_NUM_PARALLEL) and a FIFO queue behind them.
+Prints each backend's limit over time and checks that it settles near the
+backend's capacity. Waiting in the backend's queue counts toward the time
+to the first token, and calls that wait longer than `--timeout` fail as
+timeouts. With `--compare`, the same load also runs with the adaptive
+limits off (plain round-robin) for reference.
+
+    python -m loadtest.limits_sim --capacities 2,4,8 --callers 64 --duration 60
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from api.services.ollama_service import BackendPool
+
+
+class FakeBackend:
+    """Fixed generation slots; calls beyond them queue in arrival order."""
+
+    def __init__(self, capacity: int, median: float, sigma: float, timeout: float, rng: random.Random):
+        self.capacity = capacity
+        self.slots = asyncio.Semaphore(capacity)
+        self.median = median
+        self.sigma = sigma
+        self.timeout = timeout
+        self.rng = rng
+        self.completed = 0
+        self.timeouts = 0
+
+    async def generate(self, lease) -> float:
+        started = time.monotonic()
+        service = self.rng.lognormvariate(0, self.sigma) * self.median
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise httpx.ReadTimeout("fake backend queue timeout")
+        try:
+            # Prompt evaluation, then the streamed tokens
+            await asyncio.sleep(service * 0.3)
+            lease.first_token()
+            await asyncio.sleep(service * 0.7)
+        finally:
+            self.slots.release()
+        self.completed += 1
+        return time.monotonic() - started
+
+
+async def caller(pool: BackendPool, backends: Dict[str, FakeBackend], deadline: float, latencies: List[float]):
+    while time.monotonic() < deadline:
+        try:
+            started = time.monotonic()
+            async with pool.lease() as lease:
+                await backends[lease.url].generate(lease)
+            latencies.append(time.monotonic() - started)
+        except httpx.TimeoutException:
+            pass
+
+
+async def simulate(args, adaptive: bool) -> Dict[str, object]:
+    capacities = [int(c) for c in args.capacities.split(",")]
+    urls = [f"http://sim:{11430 + index}/api/generate" for index in range(len(capacities))]
+    rng = random.Random(args.seed)
+    backends = {
+        url: FakeBackend(capacity, args.median, args.sigma, args.timeout, rng)
+        for url, capacity in zip(urls, capacities)
+    }
+    pool = BackendPool(urls, adaptive=adaptive, initial=args.initial, maximum=args.max_limit)
+
+    started = time.monotonic()
+    deadline = started + args.duration
+    latencies: List[float] = []
+    history: Dict[str, List[float]] = {url: [] for url in urls}
+    workers = [
+        asyncio.create_task(caller(pool, backends, deadline, latencies))
+        for _ in range(args.callers)
+    ]
+    while time.monotonic() < deadline:
+        await asyncio.sleep(args.sample_every)
+        for url in urls:
+            history[url].append(pool.limits[url].limit)
+        if adaptive and args.verbose:
+            elapsed = time.monotonic() - started
+            limits = " ".join(f"{pool.limits[url].limit:5.1f}" for url in urls)
+            print(f"  t={elapsed:5.1f}s limits {limits}")
+    await asyncio.gather(*workers)
+
+    elapsed = time.monotonic() - started
+    settled = {}
+    for url, capacity in zip(urls, capacities):
+        tail = history[url][len(history[url]) * 2 // 3:] or [pool.limits[url].limit]
+        settled[url] = (capacity, statistics.mean(tail))
+    ordered = sorted(latencies)
+    return {
+        "settled": settled,
+        "completed": sum(b.completed for b in backends.values()),
+        "timeouts": sum(b.timeouts for b in backends.values()),
+        "throughput": sum(b.completed for b in backends.values()) / elapsed,
+        "p50": ordered[len(ordered) // 2] if ordered else None,
+        "p95": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] if ordered else None,
+        "max": ordered[-1] if ordered else None,
+    }
+
+
+def print_result(label: str, result: Dict[str, object]) -> None:
+    p50 = f"{result['p50']:.2f}s" if result["p50"] is not None else "-"
+    p95 = f"{result['p95']:.2f}s" if result["p95"] is not None else "-"
+    worst = f"{result['max']:.2f}s" if result["max"] is not None else "-"
+    print(f"{label}: {result['completed']} calls, {result['throughput']:.1f}/s, "
+          f"{result['timeouts']} timeouts, latency p50={p50} p95={p95} max={worst} "
+          f"(including the wait for a slot)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive Ollama limit simulation")
+    parser.add_argument("--capacities", default="2,4,8", help="generation slots per fake backend")
+    parser.add_argument("--callers", type=int, default=64, help="concurrent scoring calls")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds per run")
+    parser.add_argument("--median", type=float, default=0.2, help="median generation seconds")
+    parser.add_argument("--sigma", type=float, default=0.3, help="log-normal shape of generation time")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds a call may wait in a backend queue")
+    parser.add_argument("--initial", type=float, default=2.0)
+    parser.add_argument("--max-limit", type=float, default=32.0)
+    parser.add_argument("--sample-every", type=float, default=1.0)
+    parser.add_argument("--band", default="0.75,2.0",
+                        help="settled limit must fall within these multiples of capacity")
+    parser.add_argument("--compare", action="store_true", help="also run with adaptive limits off")
+    parser.add_argument("--verbose", action="store_true", help="print the limits every sample")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    adaptive = asyncio.run(simulate(args, adaptive=True))
+    print_result("adaptive", adaptive)
+    low, high = (float(value) for value in args.band.split(","))
+    converged = True
+    for url, (capacity, limit) in adaptive["settled"].items():
+        ok = capacity * low <= limit <= capacity * high
+        converged &= ok
+        print(f"  {url}: capacity {capacity}, settled limit {limit:.1f} {'ok' if ok else 'OUT OF BAND'}")
+    if args.compare:
+        print_result("round-robin", asyncio.run(simulate(args, adaptive=False)))
+    sys.exit(0 if converged else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+One-command load test: start the fake Ollama backends and the API on
+synthetic data as subprocesses, run the driver against them, tear down.
+
+    python -m loadtest.run --clients 16 --searches 3 --output run.json
+    python -m loadtest.run --clients 16 --searches 3 --baseline run.json
+
+Runs on a laptop without GPU or network as long as `EMBED_MODEL_NAME`
+points to a local SentenceTransformer (the default bundled MiniLM path
+works inside the repo).
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from loadtest import driver
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def wait_for(url: str, timeout: float, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def stop(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def backend_usage(ports: str, searches: int) -> dict:
+    """Generation time the fake backends spent, summed over ports."""
+    busy = generations = aborted = 0
+    for port in ports.split(","):
+        stats = httpx.get(f"http://127.0.0.1:{port.strip()}/fake/stats", timeout=5.0).json()
+        busy += stats["busySeconds"]
+        generations += stats["generations"]
+        aborted += stats["aborted"]
+    return {
+        "backendSeconds": round(busy, 2),
+        "backendSecondsPerSearch": round(busy / searches, 2) if searches else None,
+        "generations": generations,
+        "abortedGenerations": aborted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-contained search API load test")
+    driver.add_arguments(parser)
+    parser.add_argument("--api-port", type=int, default=8765)
+    parser.add_argument("--patents", type=int, default=20000)
+    parser.add_argument("--ollama-ports", default="11430,11431,11432,11433,11434,11435,11436,11437")
+    parser.add_argument("--latency-median", type=float, default=1.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--failure-rate", type=float, default=0.01)
+    parser.add_argument("--malformed-rate", type=float, default=0.02)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--full-payloads", action="store_true",
+                        help="keep text fields in Qdrant payloads instead of a doc store")
+    parser.add_argument("--claim-vectors", type=int, default=0,
+                        help="seed a `claims` multivector with this many claim vectors per patent")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0,
+                        help="share of seeded patents that are near-copies of an earlier one")
+    args = parser.parse_args()
+
+    trace_path = args.trace_path or os.path.join(
+        tempfile.mkdtemp(prefix="loadtest-"), "search_traces.jsonl"
+    )
+    args.trace_path = trace_path
+    args.base_url = f"http://127.0.0.1:{args.api_port}"
+    first_port = args.ollama_ports.split(",")[0].strip()
+
+    fake_ollama = subprocess.Popen(
+        [
+            sys.executable, "-m", "loadtest.fake_ollama",
+            "--ports", args.ollama_ports,
+            "--latency-median", str(args.latency_median),
+            "--latency-sigma", str(args.latency_sigma),
+            "--capacity", str(args.capacity),
+            "--failure-rate", str(args.failure_rate),
+            "--malformed-rate", str(args.malformed_rate),
+            "--seed", str(args.seed),
+        ],
+        cwd=REPO_ROOT,
+    )
+    api = None
+    try:
+        wait_for(f"http://127.0.0.1:{first_port}/api/tags", 30.0, fake_ollama)
+        api = subprocess.Popen(
+            [
+                sys.executable, "-m", "loadtest.api_server",
+                "--port", str(args.api_port),
+                "--patents", str(args.patents),
+                "--ollama-ports", args.ollama_ports,
+                "--admin-token", args.admin_token,
+                "--trace-path", trace_path,
+                "--seed", str(args.seed),
+                *(["--full-payloads"] if args.full_payloads else []),
+                "--claim-vectors", str(args.claim_vectors),
+                "--duplicate-rate", str(args.duplicate_rate),
+            ],
+            cwd=REPO_ROOT,
+        )
+        wait_for(f"{args.base_url}/health", args.startup_timeout, api)
+        report = asyncio.run(driver.run(args))
+        report.update(backend_usage(args.ollama_ports, report["completed"]))
+    finally:
+        if api is not None:
+            stop(api)
+        stop(fake_ollama)
+    driver.report_and_compare(report, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Submit a JSONL file of invention descriptions as an offline prior-art job,
+wait for it and download the results.
+
+    python scripts/batch_prior_art.py submit inventions.jsonl --format csv -o results.csv
+    python scripts/batch_prior_art.py status <jobId>
+    python scripts/batch_prior_art.py download <jobId> --format jsonl -o results.jsonl
+
+Each input line is a JSON object with `description` (or `userDescription`,
+`text`, `body`; `title` is prepended when present) and an optional `id`.
+"""
+import argparse
+import sys
+import time
+
+import httpx
+
+DEFAULT_API = "http://localhost:8091"
+
+
+def print_status(state):
+    print(
+        f"[{state['jobId']}] {state['status']}: "
+        f"{state['completed']}/{state['total']} done, {state['failed']} failed"
+    )
+
+
+def download(client, api, job_id, fmt, output):
+    response = client.get(f"{api}/api/batch-jobs/{job_id}/results", params={"format": fmt})
+    response.raise_for_status()
+    if output:
+        with open(output, "wb") as out_file:
+            out_file.write(response.content)
+        print(f"Saved results to {output}")
+    else:
+        sys.stdout.write(response.text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline batch prior-art search")
+    parser.add_argument("--api", default=DEFAULT_API, help="API base URL")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    submit = sub.add_parser("submit")
+    submit.add_argument("input", help="JSONL file")
+    submit.add_argument("--top-k", type=int, default=100, help="candidates scored per description")
+    submit.add_argument("--max-results", type=int, default=15)
+    submit.add_argument("--min-score", type=float, default=0)
+    submit.add_argument("--no-wait", action="store_true")
+    submit.add_argument("--poll", type=float, default=10.0, help="seconds between status checks")
+
+    status = sub.add_parser("status")
+    status.add_argument("job_id")
+
+    cancel = sub.add_parser("cancel")
+    cancel.add_argument("job_id")
+
+    fetch = sub.add_parser("download")
+    fetch.add_argument("job_id")
+
+    for command in (submit, fetch):
+        command.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+        command.add_argument("-o", "--output", help="write results here instead of stdout")
+
+    args = parser.parse_args()
+    api = args.api.rstrip("/")
+
+    with httpx.Client(timeout=60) as client:
+        if args.command == "status":
+            response = client.get(f"{api}/api/batch-jobs/{args.job_id}")
+            response.raise_for_status()
+            print_status(response.json())
+            return
+        if args.command == "cancel":
+            response = client.delete(f"{api}/api/batch-jobs/{args.job_id}")
+            response.raise_for_status()
+            print(f"[{args.job_id}] {response.json()['status']}")
+            return
+        if args.command == "download":
+            download(client, api, args.job_id, args.format, args.output)
+            return
+
+        with open(args.input, "rb") as input_file:
+            body = input_file.read()
+        response = client.post(
+            f"{api}/api/batch-jobs",
+            params={"topK": args.top_k, "maxResults": args.max_results, "minScore": args.min_score},
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        if response.status_code >= 400:
+            sys.exit(f"Job rejected: {response.text}")
+        state = response.json()
+        print_status(state)
+        if args.no_wait:
+            return
+
+        while state["status"] in ("queued", "running"):
+            time.sleep(args.poll)
+            state = client.get(f"{api}/api/batch-jobs/{state['jobId']}").json()
+            print_status(state)
+        if state["status"] != "completed":
+            sys.exit(f"Job ended with status {state['status']}: {state.get('error', '')}")
+        download(client, api, state["jobId"], args.format, args.output)
+
+
+if __name__ == "__main__":
+    main()
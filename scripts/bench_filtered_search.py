@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Filtered search latency and recall at several selectivities.
+
+Builds a collection of random unit vectors with uniformly spread
+`filingDateInt` values and the same payload indexes the vectorizer creates
+(before upload, so HNSW segments get the payload-aware links). It then
+searches with date-range filters that keep a given share of the points,
+plus an exclusion list, through the API's own filter builder. Latency is
+compared with the unfiltered search and recall@k with an exact filtered
+search. The "post-filter" columns show what the old approach costs: how
+many unfiltered candidates had to be fetched to find k in range.
+
+    python scripts/bench_filtered_search.py --qdrant-url http://localhost:6333 --points 200000
+    python scripts/bench_filtered_search.py --qdrant-url http://localhost:6333 --reuse --output filtered.json
+
+Qdrant's query planner picks a payload-index scan for very selective
+filters and filtered HNSW traversal for the rest (`full_scan_threshold`), so
+the selectivity sweep crosses both paths. Embedded mode (`--qdrant-path`)
+has no HNSW and only checks that the filters are correct.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client import models as qdrant_models
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.services.qdrant_service import (  # noqa: E402
+    FILING_DATE_FIELD,
+    PATENT_NUMBER_FIELD,
+    SearchScope,
+)
+
+SELECTIVITIES = (0.001, 0.01, 0.05, 0.2, 0.5, 1.0)
+FIRST_DAY = datetime.date(2000, 1, 1)
+LAST_DAY = datetime.date(2024, 12, 31)
+
+
+def day_int(day: datetime.date) -> int:
+    return int(day.strftime("%Y%m%d"))
+
+
+def random_day(rng: random.Random) -> datetime.date:
+    return FIRST_DAY + datetime.timedelta(days=rng.randrange((LAST_DAY - FIRST_DAY).days + 1))
+
+
+def build_collection(client, args) -> None:
+    if client.collection_exists(args.collection):
+        client.delete_collection(args.collection)
+    client.create_collection(
+        collection_name=args.collection,
+        vectors_config=qdrant_models.VectorParams(size=args.dim, distance=qdrant_models.Distance.COSINE),
+        hnsw_config=qdrant_models.HnswConfigDiff(m=args.m, ef_construct=args.ef_construct),
+    )
+    client.create_payload_index(
+        args.collection,
+        FILING_DATE_FIELD,
+        qdrant_models.IntegerIndexParams(type=qdrant_models.IntegerIndexType.INTEGER, lookup=False, range=True),
+    )
+    client.create_payload_index(args.collection, PATENT_NUMBER_FIELD, qdrant_models.PayloadSchemaType.KEYWORD)
+
+    rng = random.Random(args.seed)
+    vectors = np.random.default_rng(args.seed).standard_normal((args.points, args.dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for start in range(0, args.points, args.upsert_chunk):
+        end = min(start + args.upsert_chunk, args.points)
+        payloads = []
+        for index in range(start, end):
+            day = random_day(rng)
+            payloads.append({
+                "filingDate": day.strftime("%Y%m%d"),
+                FILING_DATE_FIELD: day_int(day),
+                PATENT_NUMBER_FIELD: str(10_000_000 + index),
+            })
+        client.upsert(
+            collection_name=args.collection,
+            points=qdrant_models.Batch(ids=list(range(start, end)), vectors=vectors[start:end].tolist(), payloads=payloads),
+            wait=False,
+        )
+    wait_for_green(client, args.collection)
+
+
+def wait_for_green(client, collection: str, timeout: float = 3600) -> None:
+    """Block until the optimizers have built the HNSW index."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = client.get_collection(collection)
+        if str(getattr(info.status, "value", info.status)).lower() == "green":
+            return
+        time.sleep(1)
+    print(f"[WARN] {collection} is not green after {timeout:.0f}s; numbers include indexing load")
+
+
+def scope_for(selectivity: float, rng: random.Random) -> SearchScope:
+    """A date window holding about `selectivity` of the uniformly dated points."""
+    if selectivity >= 1.0:
+        return SearchScope()
+    total_days = (LAST_DAY - FIRST_DAY).days + 1
+    width = max(int(total_days * selectivity), 1)
+    start = FIRST_DAY + datetime.timedelta(days=rng.randrange(total_days - width + 1))
+    end = start + datetime.timedelta(days=width - 1)
+    return SearchScope(date_from=start.strftime("%Y%m%d"), date_to=end.strftime("%Y%m%d"))
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def timed_search(client, args, vector, query_filter, limit, exact=False):
+    started = time.perf_counter()
+    points = client.query_points(
+        collection_name=args.collection,
+        query=vector,
+        query_filter=query_filter,
+        limit=limit,
+        with_payload=[FILING_DATE_FIELD, PATENT_NUMBER_FIELD],
+        search_params=qdrant_models.SearchParams(hnsw_ef=args.ef, exact=exact),
+    ).points
+    return points, (time.perf_counter() - started) * 1000
+
+
+def as_payload(point):
+    return {
+        "filingDate": str(point.payload[FILING_DATE_FIELD]),
+        PATENT_NUMBER_FIELD: point.payload[PATENT_NUMBER_FIELD],
+    }
+
+
+def run_selectivity(client, args, selectivity, queries, rng):
+    excluded = tuple(str(10_000_000 + rng.randrange(args.points)) for _ in range(args.exclude))
+    latencies, baseline, recalls, post_fetch = [], [], [], []
+    violations = 0
+    for vector in queries:
+        scope = scope_for(selectivity, rng)
+        scope = SearchScope(date_from=scope.date_from, date_to=scope.date_to, excluded_numbers=excluded)
+        query_filter = scope.query_filter()
+
+        points, elapsed = timed_search(client, args, vector, query_filter, args.top_k)
+        latencies.append(elapsed)
+        _, elapsed = timed_search(client, args, vector, None, args.top_k)
+        baseline.append(elapsed)
+
+        exact, _ = timed_search(client, args, vector, query_filter, args.top_k, exact=True)
+        truth = {p.id for p in exact}
+        if truth:
+            recalls.append(len(truth & {p.id for p in points}) / len(truth))
+        violations += sum(not scope.matches(as_payload(p)) for p in points)
+
+        # Old approach: unfiltered candidates until k of them pass the filter
+        fetch = args.top_k
+        while fetch <= args.post_filter_cap:
+            candidates, _ = timed_search(client, args, vector, None, fetch)
+            kept = [p for p in candidates if scope.matches(as_payload(p))]
+            if len(kept) >= args.top_k or len(candidates) < fetch:
+                break
+            fetch *= 4
+        post_fetch.append(fetch if fetch <= args.post_filter_cap else None)
+
+    found = [f for f in post_fetch if f is not None]
+    return {
+        "selectivity": selectivity,
+        "filteredP50Ms": round(statistics.median(latencies), 2),
+        "filteredP95Ms": round(percentile(latencies, 0.95), 2),
+        "unfilteredP50Ms": round(statistics.median(baseline), 2),
+        "recallAtK": round(statistics.mean(recalls), 4) if recalls else None,
+        "postFilterMedianFetch": int(statistics.median(found)) if found else None,
+        "postFilterGaveUp": len(post_fetch) - len(found),
+        # Hits the server-side filter should have removed; must stay 0
+        "filterViolations": violations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filtered search benchmark")
+    parser.add_argument("--qdrant-url", default=os.getenv("QDRANT_URL"))
+    parser.add_argument("--qdrant-path", help="embedded Qdrant directory (no HNSW; correctness only)")
+    parser.add_argument("--collection", default="bench_filtered")
+    parser.add_argument("--reuse", action="store_true", help="search an existing benchmark collection")
+    parser.add_argument("--points", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construct", type=int, default=100)
+    parser.add_argument("--ef", type=int, default=128, help="hnsw_ef at search time")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=100)
+    parser.add_argument("--exclude", type=int, default=50, help="patent numbers excluded per query")
+    parser.add_argument("--selectivities", default=",".join(str(s) for s in SELECTIVITIES))
+    parser.add_argument("--post-filter-cap", type=int, default=10_000)
+    parser.add_argument("--upsert-chunk", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    if args.qdrant_path:
+        client = QdrantClient(path=args.qdrant_path)
+    elif args.qdrant_url:
+        client = QdrantClient(url=args.qdrant_url, timeout=300)
+    else:
+        parser.error("--qdrant-url (or QDRANT_URL) or --qdrant-path is required")
+
+    if not args.reuse:
+        started = time.perf_counter()
+        build_collection(client, args)
+        print(f"Built {args.points:,} points in {time.perf_counter() - started:.1f}s")
+    else:
+        args.points = client.count(args.collection, exact=True).count
+
+    rng = random.Random(args.seed + 1)
+    queries = np.random.default_rng(args.seed + 1).standard_normal((args.queries, args.dim), dtype=np.float32)
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).tolist()
+    timed_search(client, args, queries[0], None, args.top_k)  # warm up
+
+    rows = [
+        run_selectivity(client, args, float(selectivity), queries, rng)
+        for selectivity in args.selectivities.split(",")
+    ]
+    print(f"{'share':>7} {'p50 ms':>8} {'p95 ms':>8} {'unfilt':>8} {'recall':>7} {'post-fetch':>11}")
+    for row in rows:
+        post = row["postFilterMedianFetch"]
+        print(
+            f"{row['selectivity']:>7} {row['filteredP50Ms']:>8} {row['filteredP95Ms']:>8} "
+            f"{row['unfilteredP50Ms']:>8} {row['recallAtK'] if row['recallAtK'] is not None else '-':>7} "
+            f"{post if post is not None else f'>{args.post_filter_cap}':>11}"
+        )
+
+    if args.output:
+        report = {
+            "config": {key: value for key, value in vars(args).items() if key != "output"},
+            "results": rows,
+        }
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of the Prometheus instrumentation a search adds: the
+embed/Qdrant timers, and per scored candidate the outstanding-gauge and
+latency-histogram updates the Ollama call is wrapped in.
+
+    python scripts/bench_metrics_overhead.py [--candidates 100] [--searches 2000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.services import metrics  # noqa: E402
+
+
+def instrumented_search(candidates, backends):
+    with metrics.EMBED_SECONDS.time():
+        pass
+    with metrics.QDRANT_SECONDS.time():
+        pass
+    for i in range(candidates):
+        backend = backends[i % len(backends)]
+        with metrics.OLLAMA_OUTSTANDING.labels(backend).track_inprogress(), \
+                metrics.OLLAMA_SECONDS.labels(backend).time():
+            pass
+    metrics.SEARCHES.labels("completed").inc()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, default=100)
+    parser.add_argument("--searches", type=int, default=2000)
+    args = parser.parse_args()
+
+    backends = [str(port) for port in range(11430, 11438)]
+    instrumented_search(args.candidates, backends)  # warm label children
+
+    start = time.perf_counter()
+    for _ in range(args.searches):
+        instrumented_search(args.candidates, backends)
+    elapsed = time.perf_counter() - start
+
+    per_search = elapsed / args.searches
+    per_call = per_search / max(args.candidates, 1)
+    print(f"{args.searches} searches x {args.candidates} candidates")
+    print(f"  per search: {per_search * 1e6:8.1f} µs")
+    print(f"  per Ollama call: {per_call * 1e6:8.2f} µs")
+    print(f"  /metrics payload: {len(metrics.generate_latest())} bytes")
+
+
+if __name__ == "__main__":
+    main()
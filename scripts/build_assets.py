@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Build fingerprinted, precompressed frontend assets.
+
+Raster images get resized WebP and AVIF variants. Text files (SVG, JS,
+CSS, ...) get `.br` and `.gz` siblings. Every output file name carries a
+content hash, and `manifest.json` maps logical paths to the built files
+for the API's template helpers (`api/services/static_assets.py`).
+`index.html` is the template itself, so it is rendered and compressed by
+the API instead.
+
+    python scripts/build_assets.py [--source frontend] [--out frontend/dist] [--clean]
+
+Files from earlier builds are kept unless `--clean` is given, so pages that
+are already open keep loading their assets while a deploy swaps the manifest.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+import brotli
+from PIL import Image, features
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from api.services.static_assets import ENCODING_SUFFIXES  # noqa: E402
+
+IMAGE_WIDTHS = (320, 640)
+WEBP_QUALITY = 78
+AVIF_QUALITY = 55
+RASTER_SUFFIXES = {".png", ".jpg", ".jpeg"}
+TEXT_SUFFIXES = {".svg", ".js", ".css", ".json", ".txt", ".map", ".xml"}
+TEMPLATE_FILES = {"index.html"}
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_name(relative: Path, data: bytes, suffix=None, label=None) -> str:
+    parts = [relative.stem]
+    if label:
+        parts.append(label)
+    parts.append(content_hash(data))
+    return (relative.parent / ".".join(parts)).as_posix() + (suffix or relative.suffix)
+
+
+class Builder:
+    def __init__(self, source: Path, out: Path):
+        self.source = source
+        self.out = out
+        self.manifest = {"assets": {}, "images": {}, "files": {}}
+        self.avif = features.check("avif")
+        if not self.avif:
+            print("[WARN][ASSETS] Pillow has no AVIF support; building WebP variants only")
+
+    def write(self, served_path: str, data: bytes, compress: bool = False) -> None:
+        target = self.out / served_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        encodings = []
+        if compress:
+            for encoding, compressed in (
+                ("br", brotli.compress(data, quality=11)),
+                ("gzip", gzip.compress(data, compresslevel=9, mtime=0)),
+            ):
+                # Tiny files can grow when compressed
+                if len(compressed) < len(data):
+                    target.with_name(target.name + ENCODING_SUFFIXES[encoding]).write_bytes(compressed)
+                    encodings.append(encoding)
+        self.manifest["files"][served_path] = {"hash": content_hash(data), "encodings": encodings}
+
+    def build_image(self, relative: Path) -> None:
+        with Image.open(self.source / relative) as original:
+            original.load()
+            image = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+        formats = [("webp", {"quality": WEBP_QUALITY, "method": 6})]
+        if self.avif:
+            formats.append(("avif", {"quality": AVIF_QUALITY}))
+
+        variants = {fmt: [] for fmt, _ in formats}
+        widths = sorted({min(width, image.width) for width in IMAGE_WIDTHS})
+        for width in widths:
+            height = round(image.height * width / image.width)
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for fmt, options in formats:
+                buffer = io.BytesIO()
+                resized.save(buffer, format=fmt.upper(), **options)
+                data = buffer.getvalue()
+                served_path = hashed_name(relative, data, f".{fmt}", f"{width}w")
+                self.write(served_path, data)
+                variants[fmt].append({"path": served_path, "width": width})
+
+        src = variants["webp"][-1]["path"]
+        self.manifest["images"][relative.as_posix()] = {
+            "width": image.width,
+            "height": image.height,
+            "src": src,
+            "variants": variants,
+        }
+        self.manifest["assets"][relative.as_posix()] = src
+
+    def build_file(self, relative: Path) -> None:
+        data = (self.source / relative).read_bytes()
+        served_path = hashed_name(relative, data)
+        self.write(served_path, data, compress=relative.suffix.lower() in TEXT_SUFFIXES)
+        self.manifest["assets"][relative.as_posix()] = served_path
+
+    def sources(self):
+        for dirpath, dirnames, filenames in os.walk(self.source):
+            dirnames[:] = [
+                d for d in dirnames
+                if not d.startswith(".") and (Path(dirpath) / d).resolve() != self.out.resolve()
+            ]
+            for filename in sorted(filenames):
+                relative = (Path(dirpath) / filename).relative_to(self.source)
+                if filename.startswith(".") or relative.as_posix() in TEMPLATE_FILES:
+                    continue
+                yield relative
+
+    def build(self, clean: bool = False) -> dict:
+        for relative in self.sources():
+            if relative.suffix.lower() in RASTER_SUFFIXES:
+                self.build_image(relative)
+            else:
+                self.build_file(relative)
+
+        self.manifest["version"] = content_hash(
+            json.dumps(self.manifest, sort_keys=True).encode("utf-8")
+        )
+        if clean:
+            self.remove_stale()
+        self.out.mkdir(parents=True, exist_ok=True)
+        # Swap the manifest atomically; the API reloads it on the next request
+        temp = self.out / "manifest.json.tmp"
+        temp.write_text(json.dumps(self.manifest, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(temp, self.out / "manifest.json")
+        return self.manifest
+
+    def remove_stale(self) -> None:
+        keep = set()
+        for served_path, entry in self.manifest["files"].items():
+            keep.add(served_path)
+            keep.update(served_path + ENCODING_SUFFIXES[e] for e in entry["encodings"])
+        for path in list(self.out.rglob("*")):
+            if path.is_file() and path.name != "manifest.json":
+                if path.relative_to(self.out).as_posix() not in keep:
+                    path.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build fingerprinted frontend assets")
+    parser.add_argument("--source", default=str(REPO_ROOT / "frontend"))
+    parser.add_argument("--out", default=os.getenv("ASSET_BUILD_DIR", str(REPO_ROOT / "frontend" / "dist")))
+    parser.add_argument("--clean", action="store_true", help="delete files from earlier builds")
+    args = parser.parse_args()
+
+    source, out = Path(args.source), Path(args.out)
+    manifest = Builder(source, out).build(clean=args.clean)
+
+    source_bytes = sum(
+        (source / path).stat().st_size for path in manifest["assets"]
+    )
+    first_load = sum(
+        (out / manifest["assets"][path]).stat().st_size for path in manifest["assets"]
+    )
+    print(f"Built {len(manifest['files'])} files into {out} (manifest {manifest['version']})")
+    print(f"  sources: {source_bytes / 1e6:.2f} MB; default variants: {first_load / 1e6:.2f} MB before compression")
+
+
+if __name__ == "__main__":
+    main()
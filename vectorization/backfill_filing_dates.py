@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Offline pass that prepares an existing collection for filtered search: adds
+the integer `filingDateInt` payload field (derived from `filingDate`) to
+points indexed before the vectorizer wrote it, and creates the payload
+indexes on `filingDateInt` and `patentNumber`. Only payloads change; no XML
+is read and nothing is re-embedded.
+
+    docker run --rm -e QDRANT_HOST=host.docker.internal -e COLLECTION_NAME=uspto_patents \
+        patent-vectorizer python backfill_filing_dates.py
+"""
+import logging
+
+from qdrant_client import QdrantClient
+from qdrant_client import models as qdrant_models
+
+from vectorize_gpu import (
+    COLLECTION_NAME,
+    QDRANT_HOST,
+    QDRANT_PORT,
+    QDRANT_UPSERT_CHUNK,
+    ensure_payload_indexes,
+    filing_date_int,
+)
+
+
+def main():
+    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT, timeout=180)
+    # Indexes first, so the payload updates below are indexed as they land
+    ensure_payload_indexes(client)
+
+    missing = qdrant_models.Filter(must=[
+        qdrant_models.IsEmptyCondition(is_empty=qdrant_models.PayloadField(key="filingDateInt"))
+    ])
+    total_updated = skipped = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=COLLECTION_NAME,
+            scroll_filter=missing,
+            limit=QDRANT_UPSERT_CHUNK,
+            offset=offset,
+            with_payload=["filingDate"],
+            with_vectors=False,
+        )
+        operations = []
+        for point in points:
+            value = filing_date_int((point.payload or {}).get("filingDate"))
+            if value is None:
+                skipped += 1
+                continue
+            operations.append(
+                qdrant_models.SetPayloadOperation(
+                    set_payload=qdrant_models.SetPayload(payload={"filingDateInt": value}, points=[point.id])
+                )
+            )
+        if operations:
+            client.batch_update_points(collection_name=COLLECTION_NAME, update_operations=operations, wait=False)
+            total_updated += len(operations)
+            logging.info(f"✅ filingDateInt set on {total_updated:,} points so far…")
+        if offset is None:
+            break
+
+    logging.info(
+        f"🎉 Done! filingDateInt backfilled for {total_updated:,} points in '{COLLECTION_NAME}' "
+        f"({skipped:,} without a usable filingDate)."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Claim-level index benchmark: the single-vector index against the same
+collection with a `claims` multivector (title+abstract and up to `--claims`
+independent claims per patent, MaxSim).
+
+    python synthetic_corpus.py --out /tmp/uspto_synth --docs 5000 --layout weekly
+    python bench_claims.py --data /tmp/uspto_synth --claims 4 --output claims.json
+    python bench_claims.py --data /tmp/uspto_synth --qdrant-url http://localhost:6333  # HNSW + int8
+
+Reported per index:
+- ingest: encode seconds and vectors per patent, and upsert seconds;
+- size: float32 vector bytes on disk, plus the int8 copy kept in RAM;
+- queries: p50/p95 latency and hit@k, first for queries made of one
+  independent claim (the case the claim vectors are for), then for queries
+  made of the abstract (which the main vector already covers).
+
+Embedded Qdrant searches by brute force and ignores quantization, so its
+latency grows with the vector count. For HNSW latency, run it against a
+server.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from qdrant_client import QdrantClient
+from qdrant_client import models as qdrant_models
+from sentence_transformers import SentenceTransformer
+
+from bench_ingest import git_commit
+from claims import CLAIM_VECTOR_NAME, claim_texts, independent_claims
+from vectorize_gpu import (
+    CONCURRENT_FILE_READERS,
+    MODEL_NAME,
+    QDRANT_UPSERT_CHUNK,
+    claim_vector_params,
+    extract_patent_record,
+    parse_patent_file,
+    record_to_point,
+    upsert_with_retry,
+    walk_xml_files,
+)
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def load_records(args):
+    files = list(walk_xml_files(args.data))
+    with ThreadPoolExecutor(max_workers=CONCURRENT_FILE_READERS) as executor:
+        records = [
+            record
+            for file_records in executor.map(
+                lambda path: parse_patent_file(path, parse_root=extract_patent_record), files
+            )
+            for record in file_records
+        ]
+    return records[: args.docs] if args.docs else records
+
+
+def encode(model, texts, batch_size):
+    return model.encode(
+        texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True
+    )
+
+
+def timed_upsert(client, collection, ids, vectors, chunk):
+    started = time.perf_counter()
+    for start in range(0, len(ids), chunk):
+        upsert_with_retry(
+            client=client,
+            collection_name=collection,
+            points=qdrant_models.Batch(
+                ids=ids[start:start + chunk],
+                vectors=(
+                    {name: values[start:start + chunk] for name, values in vectors.items()}
+                    if isinstance(vectors, dict) else vectors[start:start + chunk]
+                ),
+            ),
+        )
+    return time.perf_counter() - started
+
+
+def run_queries(client, collection, queries, top_k, claims):
+    """(latencies in ms, hit@k) for `(vector, expected id)` queries."""
+    latencies, hits = [], 0
+    for vector, expected in queries:
+        started = time.perf_counter()
+        if claims:
+            points = client.query_points(
+                collection_name=collection, query=[vector], using=CLAIM_VECTOR_NAME, limit=top_k
+            ).points
+        else:
+            points = client.query_points(collection_name=collection, query=vector, limit=top_k).points
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += expected in {str(point.id) for point in points}
+    return latencies, hits / max(len(queries), 1)
+
+
+def query_report(latencies, hit_rate):
+    return {
+        "p50Ms": round(statistics.median(latencies), 2),
+        "p95Ms": round(percentile(latencies, 0.95), 2),
+        "hitAtK": round(hit_rate, 4),
+    }
+
+
+def run(args):
+    torch.set_num_threads(args.torch_threads or torch.get_num_threads())
+    records = load_records(args)
+    ids = [record["id"] for record in records]
+    model = SentenceTransformer(args.model, device="cpu")
+    model.eval()
+    dimension = model.get_sentence_embedding_dimension()
+
+    started = time.perf_counter()
+    main_vectors = encode(model, [record_to_point(r)["text_for_embedding"] for r in records], args.batch_size)
+    main_seconds = time.perf_counter() - started
+
+    groups = [claim_texts(r["title"], r["abstract"], r["claims"], args.claims) for r in records]
+    started = time.perf_counter()
+    flat = encode(model, [text for group in groups for text in group], args.batch_size).tolist()
+    claim_seconds = time.perf_counter() - started
+    multivectors, start = [], 0
+    for group in groups:
+        multivectors.append(flat[start:start + len(group)])
+        start += len(group)
+    claim_count = len(flat)
+
+    rng = random.Random(args.seed)
+    sample = rng.sample(range(len(records)), min(args.queries, len(records)))
+    claim_queries, abstract_queries = [], []
+    for index in sample:
+        claims = independent_claims(records[index]["claims"])
+        if claims:
+            claim_queries.append((rng.choice(claims), ids[index]))
+        if records[index]["abstract"]:
+            abstract_queries.append((records[index]["abstract"], ids[index]))
+    claim_queries = list(zip(encode(model, [q for q, _ in claim_queries], args.batch_size).tolist(),
+                             [expected for _, expected in claim_queries]))
+    abstract_queries = list(zip(encode(model, [q for q, _ in abstract_queries], args.batch_size).tolist(),
+                                [expected for _, expected in abstract_queries]))
+
+    if args.qdrant_url:
+        client = QdrantClient(url=args.qdrant_url, timeout=180)
+    else:
+        client = QdrantClient(path=args.qdrant_path or tempfile.mkdtemp(prefix="bench-claims-"))
+    main_params = qdrant_models.VectorParams(size=dimension, distance=qdrant_models.Distance.COSINE, on_disk=True)
+    configs = {
+        "single": main_params,
+        "claims": {"": main_params, CLAIM_VECTOR_NAME: claim_vector_params(dimension, args.quantization)},
+    }
+    vectors = {
+        "single": main_vectors.tolist(),
+        "claims": {"": main_vectors.tolist(), CLAIM_VECTOR_NAME: multivectors},
+    }
+
+    results = {}
+    for name, config in configs.items():
+        collection = f"{args.collection}_{name}"
+        if client.collection_exists(collection):
+            client.delete_collection(collection)
+        client.create_collection(collection_name=collection, vectors_config=config)
+        upsert_seconds = timed_upsert(client, collection, ids, vectors[name], args.upsert_chunk)
+        if args.qdrant_url:
+            # Let the server finish building HNSW before timing searches
+            while str(client.get_collection(collection).status.value).lower() != "green":
+                time.sleep(2)
+        claims = name == "claims"
+        stored = len(records) + (claim_count if claims else 0)
+        quantized = claim_count if claims and args.quantization == "int8" else 0
+        client.query_points(collection_name=collection, query=claim_queries[0][0], limit=args.top_k)  # warm up
+        results[name] = {
+            "vectorsPerPatent": round(stored / len(records), 2),
+            "encodeSeconds": round(main_seconds + (claim_seconds if claims else 0), 2),
+            "upsertSeconds": round(upsert_seconds, 2),
+            "vectorMb": round(stored * dimension * 4 / 1e6, 1),
+            "quantizedRamMb": round(quantized * dimension / 1e6, 1),
+            "claimQueries": query_report(*run_queries(client, collection, claim_queries, args.top_k, claims)),
+            "abstractQueries": query_report(*run_queries(client, collection, abstract_queries, args.top_k, claims)),
+        }
+        print(f"  {name}: {results[name]}")
+    client.close()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "data": os.path.abspath(args.data),
+            "docs": len(records),
+            "model": args.model,
+            "claims": args.claims,
+            "quantization": args.quantization,
+            "topK": args.top_k,
+            "qdrant": args.qdrant_url or "embedded",
+            "torchThreads": torch.get_num_threads(),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-vector vs claim multivector index benchmark")
+    parser.add_argument("--data", required=True, help="directory of XML files (either layout)")
+    parser.add_argument("--docs", type=int, default=0, help="use only the first N documents")
+    parser.add_argument("--claims", type=int, default=4, help="independent claims per patent")
+    parser.add_argument("--quantization", choices=("int8", "none"), default="int8")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--torch-threads", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--upsert-chunk", type=int, default=QDRANT_UPSERT_CHUNK)
+    parser.add_argument("--qdrant-url", help="Qdrant server; embedded local mode when omitted")
+    parser.add_argument("--qdrant-path", help="directory for embedded Qdrant (default: temp dir)")
+    parser.add_argument("--collection", default="bench_claims")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(f"{'index':<8} {'vec/pat':>8} {'encode s':>9} {'upsert s':>9} {'vec MB':>7} {'int8 MB':>8} "
+          f"{'claim p50':>10} {'claim hit':>10} {'abs p50':>8} {'abs hit':>8}")
+    for name, row in report["results"].items():
+        print(
+            f"{name:<8} {row['vectorsPerPatent']:>8} {row['encodeSeconds']:>9} {row['upsertSeconds']:>9} "
+            f"{row['vectorMb']:>7} {row['quantizedRamMb']:>8} {row['claimQueries']['p50Ms']:>10} "
+            f"{row['claimQueries']['hitAtK']:>10} {row['abstractQueries']['p50Ms']:>8} "
+            f"{row['abstractQueries']['hitAtK']:>8}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Encoder scaling benchmark: docs/sec of `EncoderPool` from 1 to N workers,
+against a single in-process model using every core.
+
+    python synthetic_corpus.py --out /tmp/uspto_synth --docs 5000 --layout weekly
+    python bench_encoder.py --data /tmp/uspto_synth/weekly --workers 1,2,4,8,12 --threads 4
+    python bench_encoder.py --data /tmp/uspto_synth/weekly --devices cuda  # one worker per GPU, then 2 per GPU
+
+Texts are the vectorizer's own `text_for_embedding`. Each configuration is
+warmed up, then timed over the whole corpus `--repeat` times (best run
+kept). Embeddings of every pool run are checked against the in-process
+ones, since micro-batching changes padding and so the float rounding, but
+should not change the vectors beyond that.
+"""
+import argparse
+import datetime
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from bench_ingest import git_commit
+from encoder_pool import EncoderPool, estimate_tokens, plan_batches
+from vectorize_gpu import CONCURRENT_FILE_READERS, MODEL_NAME, parse_patent_file, walk_xml_files
+
+
+def load_texts(args):
+    files = list(walk_xml_files(args.data))
+    with ThreadPoolExecutor(max_workers=CONCURRENT_FILE_READERS) as executor:
+        docs = [doc for file_docs in executor.map(parse_patent_file, files) for doc in file_docs]
+    texts = [doc["text_for_embedding"] for doc in docs]
+    return texts[: args.docs] if args.docs else texts
+
+
+def best_of(repeat, encode, texts):
+    encode(texts[: min(len(texts), 64)])  # warm up
+    best, embeddings = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        embeddings = encode(texts)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, embeddings
+
+
+def padding_share(texts, max_tokens, batches):
+    """Share of the encoded tokens that are padding, for the given batches."""
+    lengths = [estimate_tokens(text, max_tokens) for text in texts]
+    real = sum(lengths)
+    padded = sum(max(lengths[i] for i in batch) * len(batch) for batch in batches)
+    return round(1 - real / padded, 3) if padded else 0.0
+
+
+def run(args):
+    texts = load_texts(args)
+    cores = os.cpu_count() or 1
+    rows = []
+
+    torch.set_num_threads(cores)
+    device = "cuda" if args.devices == "cuda" else "cpu"
+    model = SentenceTransformer(args.model, device=device)
+    model.eval()
+    seconds, reference = best_of(args.repeat, lambda batch: model.encode(
+        batch, batch_size=args.max_batch, show_progress_bar=False,
+        convert_to_numpy=True, normalize_embeddings=True,
+    ), texts)
+    in_order = [list(range(start, min(start + args.max_batch, len(texts))))
+                for start in range(0, len(texts), args.max_batch)]
+    rows.append({
+        "config": f"in-process ({device}, {torch.get_num_threads()} threads)",
+        "workers": 0,
+        "seconds": round(seconds, 3),
+        "docsPerSecond": round(len(texts) / seconds, 1),
+        "paddingShare": padding_share(texts, model.max_seq_length, in_order),
+    })
+    max_seq_length = model.max_seq_length
+    del model
+
+    if args.devices == "cuda":
+        gpus = torch.cuda.device_count()
+        counts = [int(c) * gpus for c in (args.workers or "1,2").split(",")]
+    else:
+        counts = [int(c) for c in (args.workers or ",".join(
+            str(c) for c in (1, 2, 4, 8, 16, 32) if c * args.threads <= cores
+        ) or "1").split(",")]
+
+    lengths = [estimate_tokens(text, max_seq_length) for text in texts]
+    sorted_batches = plan_batches(lengths, args.token_budget, args.max_batch)
+    single = None
+    for count in counts:
+        devices = [f"cuda:{i % torch.cuda.device_count()}" for i in range(count)] if args.devices == "cuda" else ["cpu"] * count
+        with EncoderPool(args.model, devices, threads=1 if args.devices == "cuda" else args.threads,
+                         token_budget=args.token_budget, max_batch=args.max_batch) as pool:
+            seconds, embeddings = best_of(args.repeat, pool.encode, texts)
+        rate = len(texts) / seconds
+        single = single or rate
+        cosine = np.sum(embeddings * reference, axis=1)
+        rows.append({
+            "config": f"pool {count} × {'GPU' if args.devices == 'cuda' else f'{args.threads} threads'}",
+            "workers": count,
+            "seconds": round(seconds, 3),
+            "docsPerSecond": round(rate, 1),
+            "speedup": round(rate / single, 2),
+            "efficiency": round(rate / single / count, 2),
+            "paddingShare": padding_share(texts, max_seq_length, sorted_batches),
+            "minCosineToInProcess": round(float(cosine.min()), 5),
+        })
+        print(f"  {rows[-1]['config']}: {rate:.1f} docs/s")
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "data": os.path.abspath(args.data),
+            "docs": len(texts),
+            "model": args.model,
+            "cores": cores,
+            "tokenBudget": args.token_budget,
+            "maxBatch": args.max_batch,
+        },
+        "results": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EncoderPool scaling benchmark")
+    parser.add_argument("--data", required=True, help="directory of XML files (either layout)")
+    parser.add_argument("--docs", type=int, default=0, help="use only the first N documents")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--devices", choices=("cpu", "cuda"), default="cpu")
+    parser.add_argument("--workers", help="comma-separated worker counts (per GPU with --devices cuda)")
+    parser.add_argument("--threads", type=int, default=4, help="torch threads per CPU worker")
+    parser.add_argument("--token-budget", type=int, default=8192)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(f"{'config':<34} {'docs/s':>9} {'speedup':>8} {'eff.':>6} {'padding':>8} {'cosine':>8}")
+    for row in report["results"]:
+        print(
+            f"{row['config']:<34} {row['docsPerSecond']:>9} {row.get('speedup', '-'):>8} "
+            f"{row.get('efficiency', '-'):>6} {row['paddingShare']:>8} {row.get('minCosineToInProcess', '-'):>8}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
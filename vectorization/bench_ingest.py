@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+CPU-only ingest benchmark: parse, encode and upsert throughput plus peak RSS
+per stage, using the vectorizer's own functions against a local Qdrant.
+
+    python synthetic_corpus.py --out /tmp/uspto_synth --docs 5000 --layout both
+    python bench_ingest.py --data /tmp/uspto_synth/weekly --output bench.json
+    python bench_ingest.py --data /tmp/uspto_synth/weekly --baseline bench.json
+
+Stages run one after another over the whole corpus so each is measured on
+its own. With `--corpus DIR` the XML is also converted into the parse-once
+Parquet corpus (`corpus_build`), and reading points back from it
+(`corpus_read`) is timed against the XML `parse` stage. Qdrant runs embedded (`--qdrant-path`, default a temp directory) or
+against a server with `--qdrant-url`.
+"""
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from qdrant_client import QdrantClient
+from qdrant_client import models as qdrant_models
+from sentence_transformers import SentenceTransformer
+
+from vectorize_gpu import (
+    CONCURRENT_FILE_READERS,
+    GPU_BATCH_SIZE,
+    MODEL_NAME,
+    QDRANT_UPSERT_CHUNK,
+    parse_patent_file,
+    upsert_with_retry,
+    walk_xml_files,
+)
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/status", "r") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Not Linux: fall back to the process high-water mark (KB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StageMeter:
+    """Wall time and sampled peak RSS of one stage."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.start_rss = self.peak_rss = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss_mb())
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, current_rss_mb())
+
+    def report(self, docs, extra=None):
+        result = {
+            "seconds": round(self.seconds, 3),
+            "docs": docs,
+            "docsPerSecond": round(docs / self.seconds, 1) if self.seconds else None,
+            "peakRssMb": round(self.peak_rss, 1),
+            "rssGrowthMb": round(self.peak_rss - self.start_rss, 1),
+        }
+        result.update(extra or {})
+        return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    torch.set_num_threads(args.torch_threads or torch.get_num_threads())
+    files = list(walk_xml_files(args.data))
+    if args.limit_files:
+        files = files[: args.limit_files]
+    input_bytes = sum(os.path.getsize(path) for path in files)
+    stages = {}
+
+    with StageMeter() as meter:
+        with ThreadPoolExecutor(max_workers=args.readers) as executor:
+            docs = [doc for file_docs in executor.map(parse_patent_file, files) for doc in file_docs]
+    stages["parse"] = meter.report(len(docs), {
+        "files": len(files),
+        "mbPerSecond": round(input_bytes / 1e6 / meter.seconds, 2) if meter.seconds else None,
+    })
+
+    if args.corpus:
+        import parquet_corpus
+        if os.path.isdir(args.corpus) and os.listdir(args.corpus):
+            sys.exit(f"--corpus {args.corpus} must be empty or missing")
+        with StageMeter() as meter:
+            _, rows = parquet_corpus.build(args.data, args.corpus, limit_files=args.limit_files)
+        corpus_bytes = sum(os.path.getsize(path) for path in parquet_corpus.open_corpus(args.corpus).files)
+        stages["corpus_build"] = meter.report(rows, {"mb": round(corpus_bytes / 1e6, 2)})
+        with StageMeter() as meter:
+            read = sum(len(batch) for batch in parquet_corpus.iter_point_batches(args.corpus))
+        stages["corpus_read"] = meter.report(read)
+
+    model = SentenceTransformer(args.model, device="cpu")
+    model.eval()
+    texts = [doc["text_for_embedding"] for doc in docs]
+    with StageMeter() as meter:
+        embeddings = model.encode(
+            texts,
+            batch_size=args.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+    stages["encode"] = meter.report(len(texts), {"batchSize": args.batch_size})
+
+    qdrant_dir = None
+    if args.qdrant_url:
+        client = QdrantClient(url=args.qdrant_url, timeout=180)
+    else:
+        qdrant_dir = args.qdrant_path or tempfile.mkdtemp(prefix="bench-qdrant-")
+        client = QdrantClient(path=qdrant_dir)
+    if client.collection_exists(args.collection):
+        client.delete_collection(args.collection)
+    client.create_collection(
+        collection_name=args.collection,
+        vectors_config=qdrant_models.VectorParams(
+            size=embeddings.shape[1], distance=qdrant_models.Distance.COSINE, on_disk=True
+        ),
+    )
+    with StageMeter() as meter:
+        for start in range(0, len(docs), args.upsert_chunk):
+            chunk = docs[start:start + args.upsert_chunk]
+            upsert_with_retry(
+                client=client,
+                collection_name=args.collection,
+                points=qdrant_models.Batch(
+                    ids=[doc["id"] for doc in chunk],
+                    vectors=embeddings[start:start + args.upsert_chunk].tolist(),
+                    payloads=[doc["payload"] for doc in chunk],
+                ),
+            )
+    stages["upsert"] = meter.report(len(docs), {"chunk": args.upsert_chunk})
+    client.close()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "data": os.path.abspath(args.data),
+            "model": args.model,
+            "readers": args.readers,
+            "torchThreads": torch.get_num_threads(),
+            "qdrant": args.qdrant_url or "embedded",
+        },
+        "corpus": {"files": len(files), "docs": len(docs), "mb": round(input_bytes / 1e6, 2)},
+        "stages": stages,
+    }
+
+
+def compare(report, baseline):
+    lines = []
+    for stage, stats in report["stages"].items():
+        before = baseline.get("stages", {}).get(stage, {})
+        for key in ("docsPerSecond", "peakRssMb"):
+            now, then = stats.get(key), before.get(key)
+            if now is None or not then:
+                continue
+            lines.append(f"  {stage}.{key}: {then} -> {now} ({(now - then) / then * 100:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorizer ingest benchmark (CPU)")
+    parser.add_argument("--data", required=True, help="directory of XML files (either layout)")
+    parser.add_argument("--limit-files", type=int, default=0)
+    parser.add_argument("--corpus", help="also build and time reading a Parquet corpus in this (new) directory")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--batch-size", type=int, default=min(GPU_BATCH_SIZE, 64))
+    parser.add_argument("--readers", type=int, default=CONCURRENT_FILE_READERS)
+    parser.add_argument("--torch-threads", type=int, default=0)
+    parser.add_argument("--upsert-chunk", type=int, default=QDRANT_UPSERT_CHUNK)
+    parser.add_argument("--qdrant-url", help="Qdrant server; embedded local mode when omitted")
+    parser.add_argument("--qdrant-path", help="directory for embedded Qdrant (default: temp dir)")
+    parser.add_argument("--collection", default="bench_ingest")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as source:
+            baseline = json.load(source)
+        print(f"Against baseline {baseline.get('commit')}:")
+        for line in compare(report, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Texts for the claim-level `claims` multivector.
+
+The main embedding is built from title, abstract, description and claims
+joined together, and MiniLM reads only its first 256 tokens, so the claims
+rarely make it in. With `CLAIM_VECTORS` set, the vectorizer also stores a
+named multivector per patent: one vector for the title and abstract, and one
+for each of the first independent claims. Qdrant scores it with MaxSim (the
+best-matching vector), so a hit is still one point per patent and results
+need no grouping.
+
+Claims are split out of the flattened claims text ("1. A device comprising
+... 2. The device of claim 1, wherein ..."), which both the XML parser and
+the Parquet corpus provide.
+"""
+import re
+from typing import List, Optional, Tuple
+
+CLAIM_VECTOR_NAME = "claims"
+
+# A claim number at the start of the text or after whitespace, before the
+# capitalized first word of the claim: "12. The"
+_CLAIM_NUMBER = re.compile(r"(?:^|(?<=\s))(\d{1,3})\s*\.\s+(?=[A-Z])")
+# "of claim 1", "according to claims 1-3", "as recited in claim 7"
+_CLAIM_REFERENCE = re.compile(r"\bclaims?\s+\d+", re.IGNORECASE)
+
+
+def split_claims(claims_text: Optional[str]) -> List[Tuple[int, str]]:
+    """
+    `(number, text)` of each claim, in order. Only numbers that continue
+    the sequence (1, 2, 3, ...) and are followed by a capital start a claim,
+    so "FIG. 2." or a "5." inside a claim rarely splits it.
+    """
+    text = claims_text or ""
+    starts = []
+    for match in _CLAIM_NUMBER.finditer(text):
+        if int(match.group(1)) == len(starts) + 1:
+            starts.append((len(starts) + 1, match.start(), match.end()))
+    claims = []
+    for position, (number, _, body_start) in enumerate(starts):
+        end = starts[position + 1][1] if position + 1 < len(starts) else len(text)
+        body = text[body_start:end].strip()
+        if body:
+            claims.append((number, body))
+    return claims
+
+
+def independent_claims(claims_text: Optional[str]) -> List[str]:
+    """Texts of the claims that do not refer to another claim."""
+    return [text for _, text in split_claims(claims_text) if not _CLAIM_REFERENCE.search(text)]
+
+
+def claim_texts(
+    title: Optional[str], abstract: Optional[str], claims_text: Optional[str], limit: int
+) -> List[str]:
+    """
+    Texts of one patent's `claims` multivector: title and abstract, then up
+    to `limit` independent claims. Never empty, since Qdrant does not store
+    empty multivectors.
+    """
+    texts = [" ".join(filter(None, [title, abstract]))]
+    texts += independent_claims(claims_text)[:limit]
+    return [text for text in texts if text] or [claims_text or ""]
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Versioned collections behind an alias, for re-indexing without downtime.
+
+The API searches `uspto_patents`, which is an alias. A rebuild (new model,
+quantization, payload layout) goes into `uspto_patents_v<N>` next to the
+live version. It is uploaded with HNSW indexing off, so the upload does not
+compete with live searches for optimizer CPU, and the graph is then built
+once with `REINDEX_OPTIMIZER_THREADS` threads. The new version is checked
+(point count against the live version, payload indexes, and HNSW recall on a
+sample of its own vectors), and then the alias is switched in one atomic
+`update_collection_aliases` call. The previous version stays for `rollback`
+until `gc` removes it.
+
+    python collection_versions.py status
+    python collection_versions.py build [--version N] [--promote]
+    python collection_versions.py validate [--version N]
+    python collection_versions.py promote --version N [--force] [--replace-collection]
+    python collection_versions.py rollback
+    python collection_versions.py gc [--keep 1] [--dry-run]
+
+`build` reads the same `DATA_DIR`/`CORPUS_DIR` as `vectorize_gpu.py` and
+resumes an interrupted build of the same version.
+"""
+import argparse
+import logging
+import os
+import re
+import time
+import uuid
+
+from qdrant_client import QdrantClient
+from qdrant_client import models as qdrant_models
+
+import vectorize_gpu
+from vectorize_gpu import (
+    COLLECTION_NAME,
+    PAYLOAD_INDEXES,
+    QDRANT_HOST,
+    QDRANT_PORT,
+    ensure_collection,
+    index_corpus,
+    load_models,
+    optimizer_settings,
+)
+
+COLLECTION_ALIAS = os.environ.get("COLLECTION_ALIAS", COLLECTION_NAME)
+REINDEX_OPTIMIZER_THREADS = int(os.environ.get("REINDEX_OPTIMIZER_THREADS", "2"))
+# Used unless COLLECTION_OPTIMIZERS sets `indexing_threshold`
+REINDEX_INDEXING_THRESHOLD = int(os.environ.get("REINDEX_INDEXING_THRESHOLD", "20000"))
+REINDEX_WAIT_SECONDS = int(os.environ.get("REINDEX_WAIT_SECONDS", str(48 * 3600)))
+VALIDATE_MIN_COUNT_RATIO = float(os.environ.get("VALIDATE_MIN_COUNT_RATIO", "0.99"))
+VALIDATE_SAMPLE = int(os.environ.get("VALIDATE_SAMPLE", "200"))
+VALIDATE_TOP_K = int(os.environ.get("VALIDATE_TOP_K", "10"))
+VALIDATE_MIN_RECALL = float(os.environ.get("VALIDATE_MIN_RECALL", "0.95"))
+
+_VERSION_PATTERN = re.compile(rf"^{re.escape(COLLECTION_ALIAS)}_v(\d+)$")
+
+
+def version_name(version):
+    return f"{COLLECTION_ALIAS}_v{version}"
+
+
+def list_versions(client):
+    """{version number: collection name} of the alias's versioned collections."""
+    versions = {}
+    for collection in client.get_collections().collections:
+        match = _VERSION_PATTERN.match(collection.name)
+        if match:
+            versions[int(match.group(1))] = collection.name
+    return dict(sorted(versions.items()))
+
+
+def live_collection(client):
+    """Collection the API currently reads, or None."""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == COLLECTION_ALIAS:
+            return alias.collection_name
+    # Before the first promote the alias name is still a plain collection
+    if client.collection_exists(COLLECTION_ALIAS):
+        return COLLECTION_ALIAS
+    return None
+
+
+def version_of(name):
+    match = _VERSION_PATTERN.match(name or "")
+    return int(match.group(1)) if match else None
+
+
+def point_count(client, name):
+    return client.count(collection_name=name, exact=True).count
+
+
+def finish_indexing(client, name):
+    """Turn HNSW indexing on after a deferred upload and wait until the collection is green."""
+    threshold = optimizer_settings().get("indexing_threshold", REINDEX_INDEXING_THRESHOLD)
+    logging.info(
+        f"🧱 Building HNSW index for '{name}' (indexing threshold {threshold}, "
+        f"{REINDEX_OPTIMIZER_THREADS} optimizer threads)"
+    )
+    client.update_collection(
+        collection_name=name,
+        optimizers_config=qdrant_models.OptimizersConfigDiff(
+            indexing_threshold=threshold,
+            max_optimization_threads=REINDEX_OPTIMIZER_THREADS,
+        ),
+    )
+    deadline = time.monotonic() + REINDEX_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        info = client.get_collection(name)
+        if str(getattr(info.status, "value", info.status)).lower() == "green":
+            logging.info(f"✅ '{name}' is indexed ({info.indexed_vectors_count or 0:,} vectors in HNSW)")
+            return True
+        time.sleep(10)
+    logging.error(f"'{name}' is still optimizing after {REINDEX_WAIT_SECONDS}s")
+    return False
+
+
+def sample_points(client, name, size):
+    """Up to `size` points with vectors, starting at a random ID."""
+    try:
+        points, _ = client.scroll(
+            collection_name=name, limit=size, offset=str(uuid.uuid4()), with_vectors=True, with_payload=False
+        )
+    except Exception:
+        # Integer IDs do not accept a UUID offset
+        points = []
+    if len(points) < size:
+        more, _ = client.scroll(collection_name=name, limit=size, with_vectors=True, with_payload=False)
+        seen = {p.id for p in points}
+        points += [p for p in more if p.id not in seen][: size - len(points)]
+    return points
+
+
+def recall_sample(client, name, size=VALIDATE_SAMPLE, top_k=VALIDATE_TOP_K):
+    """HNSW recall@k against exact search, and how often a point finds itself, over a sample."""
+    points = sample_points(client, name, size)
+    if not points:
+        return None, None
+    recalls, self_hits = [], 0
+    for point in points:
+        vector = point.vector
+        if isinstance(vector, dict):
+            # Collections with sparse or claim vectors return them all by name
+            vector = vector[""]
+        approx = client.query_points(collection_name=name, query=vector, limit=top_k, with_payload=False).points
+        exact = client.query_points(
+            collection_name=name,
+            query=vector,
+            limit=top_k,
+            with_payload=False,
+            search_params=qdrant_models.SearchParams(exact=True),
+        ).points
+        truth = {p.id for p in exact}
+        recalls.append(len(truth & {p.id for p in approx}) / max(len(truth), 1))
+        self_hits += point.id in {p.id for p in approx}
+    return sum(recalls) / len(recalls), self_hits / len(points)
+
+
+def validate(client, name):
+    """(passed, report) for a candidate version before it goes live."""
+    live = live_collection(client)
+    info = client.get_collection(name)
+    count = point_count(client, name)
+    live_count = point_count(client, live) if live and live != name else None
+    recall, self_hit = recall_sample(client, name)
+    missing_indexes = sorted(set(PAYLOAD_INDEXES) - set(info.payload_schema or {}))
+
+    checks = {
+        "green": str(getattr(info.status, "value", info.status)).lower() == "green",
+        "nonEmpty": count > 0,
+        "count": live_count is None or count >= live_count * VALIDATE_MIN_COUNT_RATIO,
+        "payloadIndexes": not missing_indexes,
+        "recall": recall is not None and recall >= VALIDATE_MIN_RECALL,
+    }
+    report = {
+        "collection": name,
+        "live": live,
+        "points": count,
+        "livePoints": live_count,
+        "recallAtK": round(recall, 4) if recall is not None else None,
+        "selfHitRate": round(self_hit, 4) if self_hit is not None else None,
+        "missingPayloadIndexes": missing_indexes,
+        "checks": checks,
+    }
+    return all(checks.values()), report
+
+
+def log_report(report):
+    for check, ok in report["checks"].items():
+        logging.info(f"{'✅' if ok else '❌'} {check}")
+    logging.info(
+        f"   points {report['points']:,} (live {report['livePoints'] if report['livePoints'] is not None else '-'}), "
+        f"recall@{VALIDATE_TOP_K} {report['recallAtK']}, self-hit {report['selfHitRate']}"
+    )
+
+
+def promote(client, name, force=False, replace_collection=False):
+    """Point the alias at `name` in one atomic alias update."""
+    if not force:
+        passed, report = validate(client, name)
+        log_report(report)
+        if not passed:
+            logging.error(f"Not promoting '{name}': validation failed (use --force to override)")
+            return False
+
+    operations = []
+    if any(a.alias_name == COLLECTION_ALIAS for a in client.get_aliases().aliases):
+        operations.append(qdrant_models.DeleteAliasOperation(
+            delete_alias=qdrant_models.DeleteAlias(alias_name=COLLECTION_ALIAS)
+        ))
+    elif client.collection_exists(COLLECTION_ALIAS):
+        # An alias cannot shadow a collection: the unversioned original has to go first
+        if not replace_collection:
+            logging.error(
+                f"'{COLLECTION_ALIAS}' is a plain collection; pass --replace-collection to delete it "
+                "and put the alias in its place (searches fail for the moment in between)"
+            )
+            return False
+        logging.warning(f"🗑️  Deleting unversioned collection '{COLLECTION_ALIAS}'")
+        client.delete_collection(COLLECTION_ALIAS)
+    operations.append(qdrant_models.CreateAliasOperation(
+        create_alias=qdrant_models.CreateAlias(collection_name=name, alias_name=COLLECTION_ALIAS)
+    ))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    logging.info(f"🔀 '{COLLECTION_ALIAS}' now points to '{name}'")
+    return True
+
+
+def rollback(client):
+    """Point the alias back at the newest version older than the live one."""
+    live_version = version_of(live_collection(client))
+    older = [v for v in list_versions(client) if live_version is not None and v < live_version]
+    if not older:
+        logging.error("No older version to roll back to")
+        return False
+    return promote(client, version_name(older[-1]), force=True)
+
+
+def gc(client, keep=1, include_unpromoted=False, dry_run=False):
+    """Delete versions older than the live one except the newest `keep` of them."""
+    live = live_collection(client)
+    live_version = version_of(live)
+    if live_version is None:
+        logging.error("The alias does not point to a versioned collection; nothing to collect")
+        return None
+    versions = list_versions(client)
+    older = [v for v in versions if v < live_version]
+    doomed = older[: max(len(older) - keep, 0)]
+    if include_unpromoted:
+        doomed += [v for v in versions if v > live_version]
+    for version in doomed:
+        logging.info(f"{'Would delete' if dry_run else '🗑️  Deleting'} '{versions[version]}'")
+        if not dry_run:
+            client.delete_collection(versions[version])
+    return [versions[v] for v in doomed]
+
+
+def status(client):
+    live = live_collection(client)
+    print(f"alias '{COLLECTION_ALIAS}' -> {live or '(none)'}")
+    for version, name in list_versions(client).items():
+        info = client.get_collection(name)
+        state = str(getattr(info.status, "value", info.status))
+        marker = "*" if name == live else " "
+        print(f" {marker} v{version:<4} {name:<32} {point_count(client, name):>12,} points  {state}")
+
+
+def build(client, version=None, promote_after=False):
+    versions = list_versions(client)
+    live = live_collection(client)
+    version = version or (max(versions) + 1 if versions else 1)
+    name = version_name(version)
+    if name == live:
+        logging.error(f"'{name}' is live; build a new version instead")
+        return False
+
+    models = load_models()
+    # Everything vectorize_gpu writes goes to the new version
+    vectorize_gpu.COLLECTION_NAME = name
+    ensure_collection(client, models[0].get_sentence_embedding_dimension(), defer_indexing=True)
+    index_corpus(client, models)
+    if not finish_indexing(client, name):
+        return False
+
+    passed, report = validate(client, name)
+    log_report(report)
+    if promote_after and passed:
+        return promote(client, name, force=True)
+    logging.info(f"Built '{name}'; run `promote --version {version}` to switch the alias")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Versioned collections behind the '{COLLECTION_ALIAS}' alias")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="alias target and versions")
+    build_parser = commands.add_parser("build", help="index into a new (or unfinished) version")
+    build_parser.add_argument("--version", type=int)
+    build_parser.add_argument("--promote", action="store_true", help="switch the alias if validation passes")
+    validate_parser = commands.add_parser("validate", help="run the pre-promotion checks")
+    validate_parser.add_argument("--version", type=int)
+    promote_parser = commands.add_parser("promote", help="switch the alias to a version")
+    promote_parser.add_argument("--version", type=int, required=True)
+    promote_parser.add_argument("--force", action="store_true", help="skip validation")
+    promote_parser.add_argument("--replace-collection", action="store_true",
+                                help="first promote only: delete the unversioned collection of the same name")
+    commands.add_parser("rollback", help="switch the alias back to the previous version")
+    gc_parser = commands.add_parser("gc", help="delete old versions")
+    gc_parser.add_argument("--keep", type=int, default=1, help="older versions kept for rollback")
+    gc_parser.add_argument("--include-unpromoted", action="store_true",
+                           help="also delete versions newer than the live one")
+    gc_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT, timeout=180)
+    if args.command == "status":
+        status(client)
+        return
+    if args.command == "build":
+        ok = build(client, args.version, args.promote)
+    elif args.command == "validate":
+        versions = list_versions(client)
+        if not versions:
+            parser.error("no versions to validate")
+        ok, report = validate(client, version_name(args.version) if args.version else versions[max(versions)])
+        log_report(report)
+    elif args.command == "promote":
+        ok = promote(client, version_name(args.version), args.force, args.replace_collection)
+    elif args.command == "rollback":
+        ok = rollback(client)
+    else:
+        ok = gc(client, args.keep, args.include_unpromoted, args.dry_run) is not None
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
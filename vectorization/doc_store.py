@@ -0,0 +1,114 @@
+"""
+Sidecar store for the patent text fields that searches do not need.
+
+Qdrant points keep only what search and filtering read (`patentNumber`,
+`filingDate`, `filingDateInt`, `title`). The abstract and the source file
+live here, keyed by point ID. Each document is one row of
+zlib-compressed JSON in a SQLite file (WAL mode, so the API reads while the
+vectorizer writes). Point IDs are derived from the patent number, so one store
+serves every collection version and partition built from the same data.
+
+The API opens the store read-only and fetches documents in batches, only for
+the candidates it scores or shows.
+"""
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+DOC_STORE_PATH = os.environ.get("DOC_STORE_PATH", "")
+
+# Payload fields moved to the store; everything else stays on the point
+STORED_FIELDS = ("abstract", "file_path")
+# Payload fields the API rebuilds from others (URL from the number, preview from the abstract)
+DERIVED_FIELDS = ("googlePatentUrl", "preview")
+
+# Below SQLite's default bound-variable limit on old builds (999)
+_LOOKUP_CHUNK = 900
+
+
+def split_payload(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """`(slim payload, stored document)` of a full point payload."""
+    slim = {
+        key: value for key, value in payload.items()
+        if key not in STORED_FIELDS and key not in DERIVED_FIELDS
+    }
+    document = {key: payload[key] for key in STORED_FIELDS if payload.get(key) is not None}
+    return slim, document
+
+
+class DocStore:
+    """Point ID → document dict, in one SQLite file; safe to share across threads."""
+
+    def __init__(self, path: str, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        self._local = threading.local()
+        if not readonly:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            connection = self._connection()
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, body BLOB NOT NULL) WITHOUT ROWID"
+            )
+            connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; the API reads from its worker threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self.readonly:
+                connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            else:
+                connection = sqlite3.connect(self.path)
+            self._local.connection = connection
+        return connection
+
+    def put_many(self, documents: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Insert or replace documents; returns how many were written."""
+        rows = [
+            (str(point_id), zlib.compress(json.dumps(document, separators=(",", ":")).encode("utf-8")))
+            for point_id, document in documents
+        ]
+        if rows:
+            connection = self._connection()
+            connection.executemany("INSERT OR REPLACE INTO docs (id, body) VALUES (?, ?)", rows)
+            connection.commit()
+        return len(rows)
+
+    def get_many(self, point_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Documents of the IDs that are in the store."""
+        ids = list(dict.fromkeys(str(point_id) for point_id in point_ids))
+        found: Dict[str, Dict[str, Any]] = {}
+        connection = self._connection()
+        for start in range(0, len(ids), _LOOKUP_CHUNK):
+            chunk = ids[start:start + _LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for point_id, body in connection.execute(
+                f"SELECT id, body FROM docs WHERE id IN ({placeholders})", chunk
+            ):
+                found[point_id] = json.loads(zlib.decompress(body))
+        return found
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def size_bytes(self) -> int:
+        """Store size on disk, including the write-ahead log."""
+        return sum(
+            os.path.getsize(path) for path in (self.path, self.path + "-wal") if os.path.exists(path)
+        )
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+def open_store(path: Optional[str] = None, readonly: bool = False) -> Optional[DocStore]:
+    """The store at `path` (default `DOC_STORE_PATH`), or None when no path is configured."""
+    path = path if path is not None else DOC_STORE_PATH
+    return DocStore(path, readonly=readonly) if path else None
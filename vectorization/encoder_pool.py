@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Multi-process sentence-transformer encoding.
+
+`EncoderPool` starts one worker process per device: one per GPU, or on a CPU
+host `workers` processes with `threads` torch threads each (e.g. 12 × 4 on
+48 cores). Each worker loads its own copy of the model. Workers are spawned,
+not forked, so CUDA and the torch thread pools start clean in each of them.
+
+`encode` sorts the texts by estimated token count and cuts them into
+micro-batches of at most `token_budget` padded tokens, longest first. The
+micro-batches go on one shared queue, and whichever worker is free takes the
+next one, so a slow device or a batch of long claims never holds the others
+up. Sorting also keeps padding low, since texts in a micro-batch have similar
+lengths. Workers write their rows straight into a shared-memory float32
+buffer in the caller's order and send back only an acknowledgement. The
+embeddings themselves are never pickled.
+
+    pool = EncoderPool("all-MiniLM-L6-v2", devices=["cpu"] * 12, threads=4)
+    embeddings = pool.encode(texts)  # (len(texts), dim), L2-normalized
+    pool.close()
+"""
+import atexit
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import traceback
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Average characters per WordPiece token of English patent text
+_CHARS_PER_TOKEN = 4
+_START_TIMEOUT = 600
+_POLL_SECONDS = 1.0
+
+
+def estimate_tokens(text: str, max_tokens: int) -> int:
+    """Token count estimate of `text`, truncated like the model truncates it."""
+    return min(len(text) // _CHARS_PER_TOKEN + 2, max_tokens)
+
+
+def plan_batches(lengths: Sequence[int], token_budget: int, max_batch: int) -> List[List[int]]:
+    """
+    Indices grouped into micro-batches, longest texts first. A batch's
+    padded size (longest text × batch size) stays within `token_budget`,
+    except that a single text over the budget still gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda index: lengths[index], reverse=True)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for index in order:
+        # Descending order: the first text of a batch is its longest
+        longest = lengths[current[0]] if current else lengths[index]
+        if current and (longest * (len(current) + 1) > token_budget or len(current) >= max_batch):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _worker_main(worker_id, model_name, device, threads, tasks, results):
+    # For native libraries that read these on first use; torch itself is
+    # capped by set_num_threads below
+    if threads:
+        for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ[var] = str(threads)
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    try:
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        model = SentenceTransformer(model_name, device=device)
+        model.eval()
+        results.put(("ready", worker_id, model.get_sentence_embedding_dimension(), model.max_seq_length))
+    except Exception:
+        results.put(("failed", worker_id, traceback.format_exc()))
+        return
+
+    attached = None
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        call_id, buffer_name, rows, dim, indices, texts = task
+        out = None
+        try:
+            if attached is None or attached.name != buffer_name:
+                if attached is not None:
+                    attached.close()
+                attached = shared_memory.SharedMemory(name=buffer_name)
+            embeddings = model.encode(
+                texts,
+                batch_size=len(texts),
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+            out = np.ndarray((rows, dim), dtype=np.float32, buffer=attached.buf)
+            out[indices] = embeddings
+            results.put(("done", call_id, None))
+        except Exception:
+            results.put(("error", call_id, traceback.format_exc()))
+        finally:
+            # The buffer cannot be closed while a view of it exists
+            del out
+    if attached is not None:
+        attached.close()
+
+
+class EncoderPool:
+    """Worker processes encoding dynamically dispatched micro-batches; see the module docstring."""
+
+    def __init__(
+        self,
+        model_name: str,
+        devices: Sequence[str],
+        threads: int = 0,
+        token_budget: int = 16384,
+        max_batch: int = 256,
+    ):
+        if not devices:
+            raise ValueError("EncoderPool needs at least one device")
+        self.model_name = model_name
+        self.devices = list(devices)
+        self.token_budget = token_budget
+        self.max_batch = max_batch
+        context = mp.get_context("spawn")
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(
+                target=_worker_main,
+                args=(worker_id, model_name, device, threads, self._tasks, self._results),
+                name=f"encoder-{worker_id}",
+                daemon=True,
+            )
+            for worker_id, device in enumerate(self.devices)
+        ]
+        for process in self._processes:
+            process.start()
+        self._buffer: Optional[shared_memory.SharedMemory] = None
+        self._call_id = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+
+        self.dimension = self.max_seq_length = 0
+        for _ in self._processes:
+            message = self._next_result(_START_TIMEOUT)
+            if message[0] == "failed":
+                self.close()
+                raise RuntimeError(f"encoder worker {message[1]} failed to load the model:\n{message[2]}")
+            self.dimension, self.max_seq_length = message[2], message[3]
+        logging.info(f"✅ Encoder pool ready: {len(self.devices)} workers on {', '.join(sorted(set(self.devices)))}")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _next_result(self, timeout: float):
+        """Next worker message; raises if a worker died or nothing arrives in time."""
+        waited = 0.0
+        while True:
+            try:
+                return self._results.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                waited += _POLL_SECONDS
+                dead = [p.name for p in self._processes if not p.is_alive()]
+                if dead:
+                    raise RuntimeError(f"encoder workers exited: {', '.join(dead)}")
+                if waited >= timeout:
+                    raise TimeoutError(f"no encoder result in {timeout:.0f}s")
+
+    def _output(self, rows: int) -> np.ndarray:
+        """Shared (rows, dim) float32 view, reusing the buffer while it is big enough."""
+        size = max(rows * self.dimension * 4, 1)
+        if self._buffer is None or self._buffer.size < size:
+            if self._buffer is not None:
+                self._buffer.close()
+                self._buffer.unlink()
+            # Headroom so slightly larger batches do not reallocate
+            self._buffer = shared_memory.SharedMemory(create=True, size=size + size // 4)
+        return np.ndarray((rows, self.dimension), dtype=np.float32, buffer=self._buffer.buf)
+
+    def encode(self, texts: Sequence[str], timeout: float = 3600) -> np.ndarray:
+        """L2-normalized embeddings of `texts`, in order, as a (len(texts), dim) array."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("encoder pool is closed")
+            self._call_id += 1
+            call_id = self._call_id
+            out = self._output(len(texts))
+            lengths = [estimate_tokens(text, self.max_seq_length) for text in texts]
+            batches = plan_batches(lengths, self.token_budget, self.max_batch)
+            for batch in batches:
+                self._tasks.put((
+                    call_id, self._buffer.name, len(texts), self.dimension,
+                    batch, [texts[index] for index in batch],
+                ))
+            # Wait for every batch, even after an error, so none of them
+            # writes into the buffer once the next call reuses it
+            errors = []
+            try:
+                for _ in batches:
+                    message = self._next_result(timeout)
+                    if message[0] == "error":
+                        errors.append(message[2])
+            except Exception:
+                # A dead or stuck worker leaves batches in flight for good
+                del out
+                self.close()
+                raise
+            if errors:
+                del out
+                raise RuntimeError(f"encoder worker failed on {len(errors)} batches:\n{errors[0]}")
+            embeddings = out.copy()
+            del out
+            return embeddings
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer.unlink()
+            self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
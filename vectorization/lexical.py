@@ -0,0 +1,107 @@
+"""
+BM25-style sparse lexical vectors for hybrid retrieval.
+
+The vectorizer stores one sparse vector per patent, built from the title,
+abstract and claims, in the collection's `lexical` sparse vector. Each term
+weight is the BM25 term-frequency part, tf·(k1+1) / (tf + k1·(1 - b + b·len/avglen)).
+The collection is created with Qdrant's IDF modifier, so Qdrant applies the
+inverse document frequency at query time from its own corpus statistics.
+Query vectors therefore just give each distinct query term a weight of 1.
+
+The API builds query vectors with this same module, so both sides must
+tokenize the same way. Changing the tokenizer, stop words or term IDs needs a
+re-index.
+"""
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SPARSE_VECTOR_NAME = "lexical"
+
+LEXICAL_K1 = float(os.environ.get("LEXICAL_K1", "1.2"))
+LEXICAL_B = float(os.environ.get("LEXICAL_B", "0.75"))
+# Typical weighted token count of title + abstract + claims after stop words
+LEXICAL_AVG_LENGTH = float(os.environ.get("LEXICAL_AVG_LENGTH", "600"))
+
+# Title terms count three times, as if the title were repeated
+FIELD_WEIGHTS = {"title": 3, "abstract": 1, "claims": 1}
+
+# Part numbers and formulas ("m6x1", "co2") stay whole; hyphenated words
+# split into their parts
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset("""
+a about above according after all also an and any are as at be been being
+between both but by can claim claimed claims comprise comprises comprising
+configured consisting each either first for from further has have having
+herein however if in into is it its least may means more most no not of on
+one or other over plurality said second such than that the their then there
+thereby therein thereof these third this those thereto through to under
+upon via was wherein whereby which while with within without
+""".split())
+
+
+def _stem(token: str) -> str:
+    """Folds regular plurals, so "fasteners" matches "fastener"."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(("sses", "xes", "ches", "shes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercased, stemmed terms of `text` without stop words or single characters."""
+    terms = []
+    for token in _TOKEN_PATTERN.findall((text or "").lower()):
+        if len(token) < 2 or token in _STOP_WORDS:
+            continue
+        terms.append(_stem(token))
+    return terms
+
+
+def term_id(term: str) -> int:
+    """Stable 32-bit sparse index of a term (CRC-32; unlike `hash`, not salted per process)."""
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def _as_sparse(weights: Dict[int, float]) -> Tuple[List[int], List[float]]:
+    indices = sorted(weights)
+    return indices, [weights[index] for index in indices]
+
+
+def document_vector(
+    fields: Dict[str, Optional[str]],
+    k1: float = LEXICAL_K1,
+    b: float = LEXICAL_B,
+    avg_length: float = LEXICAL_AVG_LENGTH,
+) -> Tuple[List[int], List[float]]:
+    """
+    Sparse `(indices, values)` of one document from its `FIELD_WEIGHTS`
+    fields; empty lists when it has no terms.
+    """
+    counts: Counter = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in tokenize(fields.get(field)):
+            counts[term] += weight
+    length = sum(counts.values())
+    if not length:
+        return [], []
+    norm = k1 * (1 - b + b * length / max(avg_length, 1.0))
+    weights: Dict[int, float] = {}
+    for term, tf in counts.items():
+        # Colliding terms share an index; their weights add up
+        index = term_id(term)
+        weights[index] = weights.get(index, 0.0) + tf * (k1 + 1) / (tf + norm)
+    return _as_sparse(weights)
+
+
+def query_vector(texts: Iterable[Optional[str]]) -> Tuple[List[int], List[float]]:
+    """Sparse `(indices, values)` of a query: weight 1 per distinct term."""
+    weights = {term_id(term): 1.0 for text in texts for term in tokenize(text)}
+    return _as_sparse(weights)
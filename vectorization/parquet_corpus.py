@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Parse-once Parquet corpus between the raw USPTO XML and vectorization.
+
+`build` parses XML files (either layout) once, in worker processes, into a
+Hive-partitioned dataset (`year=2024/week=05/part-*.parquet`, ISO week of
+the publication date) with typed columns. Sources already converted are
+listed in `_sources.jsonl`, so rerunning `build` on a growing data directory
+only appends parts for the new weeks.
+
+    python parquet_corpus.py build --data /data --out /corpus
+    python parquet_corpus.py info --corpus /corpus
+
+Readers get column-projected, memory-mapped Arrow batches
+(`iter_record_batches`) or ready-to-index points (`iter_point_batches`);
+`vectorize_gpu.py` uses the latter when `CORPUS_DIR` is set.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from vectorize_gpu import extract_patent_record, parse_patent_file, record_to_point, walk_xml_files
+
+SOURCES_FILE = "_sources.jsonl"
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", str(os.cpu_count() or 4)))
+# Sources converted between checkpoints; each checkpoint closes its parts
+# and records the sources, so an interrupted build resumes from there
+CHECKPOINT_FILES = int(os.environ.get("CORPUS_CHECKPOINT_FILES", "5000"))
+ROW_GROUP_SIZE = int(os.environ.get("CORPUS_ROW_GROUP_SIZE", "2048"))
+
+SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("patent_number", pa.string()),
+    ("publication_date", pa.date32()),
+    ("application_date", pa.date32()),
+    ("title", pa.string()),
+    ("abstract", pa.string()),
+    ("claims", pa.string()),
+    ("description", pa.string()),
+    ("source_file", pa.string()),
+])
+PARTITIONING = ds.partitioning(
+    pa.schema([("year", pa.int16()), ("week", pa.int8())]), flavor="hive"
+)
+# Columns `record_to_point` needs
+POINT_COLUMNS = [
+    "id", "patent_number", "publication_date", "application_date",
+    "title", "abstract", "claims", "description", "source_file",
+]
+
+
+def parse_date(value):
+    """USPTO `YYYYMMDD` string to a date, or None."""
+    try:
+        return datetime.datetime.strptime(value, "%Y%m%d").date() if value else None
+    except ValueError:
+        return None
+
+
+def partition_of(record):
+    """(ISO year, ISO week) of the publication date; (0, 0) when undated."""
+    date = record["publication_date"] or record["application_date"]
+    if date is None:
+        return 0, 0
+    year, week, _ = date.isocalendar()
+    return year, week
+
+
+def parse_source(file_path):
+    """Typed records of one XML file (runs in a worker process)."""
+    records = parse_patent_file(file_path, parse_root=extract_patent_record)
+    for record in records:
+        record["publication_date"] = parse_date(record["publication_date"])
+        record["application_date"] = parse_date(record["application_date"])
+    return file_path, records
+
+
+def read_sources(corpus_dir):
+    """Relative source paths already converted into the corpus."""
+    done = set()
+    try:
+        with open(os.path.join(corpus_dir, SOURCES_FILE), "r", encoding="utf-8") as ledger:
+            for line in ledger:
+                if line.strip():
+                    done.add(json.loads(line)["source"])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+class PartWriter:
+    """
+    One open Parquet part per partition touched since the last checkpoint.
+    Parts are written under a dot-prefixed temp name, which dataset readers
+    skip, and renamed into place on `checkpoint`.
+    """
+
+    def __init__(self, corpus_dir, run_id):
+        self.corpus_dir = corpus_dir
+        self.run_id = run_id
+        self.sequence = 0
+        self.writers = {}
+        self.buffers = {}
+        self.sources = []
+
+    def add(self, source, records):
+        for record in records:
+            self.buffers.setdefault(partition_of(record), []).append(record)
+        for partition, rows in self.buffers.items():
+            if len(rows) >= ROW_GROUP_SIZE:
+                self._flush(partition)
+        self.sources.append({"source": source, "rows": len(records)})
+
+    def _flush(self, partition):
+        rows = self.buffers.get(partition)
+        if not rows:
+            return
+        if partition not in self.writers:
+            year, week = partition
+            directory = os.path.join(self.corpus_dir, f"year={year}", f"week={week:02d}")
+            os.makedirs(directory, exist_ok=True)
+            name = f"part-{self.run_id}-{self.sequence:05d}.parquet"
+            temp = os.path.join(directory, f".{name}.tmp")
+            writer = pq.ParquetWriter(temp, SCHEMA, compression="zstd")
+            self.writers[partition] = (writer, temp, os.path.join(directory, name))
+        self.writers[partition][0].write_table(pa.Table.from_pylist(rows, schema=SCHEMA), row_group_size=ROW_GROUP_SIZE)
+        self.buffers[partition] = []
+
+    def checkpoint(self):
+        """Close the open parts, move them into place and record their sources."""
+        for partition in list(self.buffers):
+            self._flush(partition)
+        for writer, temp, final in self.writers.values():
+            writer.close()
+            os.replace(temp, final)
+        if self.sources:
+            with open(os.path.join(self.corpus_dir, SOURCES_FILE), "a", encoding="utf-8") as ledger:
+                for entry in self.sources:
+                    ledger.write(json.dumps(entry) + "\n")
+                ledger.flush()
+                os.fsync(ledger.fileno())
+        self.writers, self.buffers, self.sources = {}, {}, []
+        self.sequence += 1
+
+
+def remove_stale_parts(corpus_dir):
+    """Temp parts left by an interrupted build; their sources were never recorded."""
+    for dirpath, _, filenames in os.walk(corpus_dir):
+        for name in filenames:
+            if name.startswith(".part-") and name.endswith(".tmp"):
+                os.remove(os.path.join(dirpath, name))
+
+
+def build(data_dir, corpus_dir, workers=PARSE_WORKERS, limit_files=0):
+    """Convert XML sources not yet in the corpus; returns (files, rows) added."""
+    os.makedirs(corpus_dir, exist_ok=True)
+    remove_stale_parts(corpus_dir)
+    done = read_sources(corpus_dir)
+    pending = (
+        path for path in walk_xml_files(data_dir)
+        if os.path.relpath(path, data_dir) not in done
+    )
+    if limit_files:
+        pending = islice(pending, limit_files)
+
+    writer = PartWriter(corpus_dir, f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}")
+    files = rows = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = list(islice(pending, CHECKPOINT_FILES))
+            if not batch:
+                break
+            for file_path, records in executor.map(parse_source, batch, chunksize=16):
+                writer.add(os.path.relpath(file_path, data_dir), records)
+                rows += len(records)
+            writer.checkpoint()
+            files += len(batch)
+            logging.info(f"📦 Converted {files:,} files ({rows:,} documents) so far…")
+    return files, rows
+
+
+def open_corpus(corpus_dir):
+    """The corpus as a dataset; files are memory-mapped rather than read into buffers."""
+    return ds.dataset(
+        os.path.abspath(corpus_dir),
+        format="parquet",
+        partitioning=PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def year_filter(years):
+    return ds.field("year").isin([int(year) for year in years]) if years else None
+
+
+def iter_record_batches(corpus_dir, columns=None, years=None, batch_size=1000):
+    """Arrow record batches with only `columns`, optionally limited to `years`."""
+    dataset = open_corpus(corpus_dir)
+    yield from dataset.to_batches(columns=columns, filter=year_filter(years), batch_size=batch_size)
+
+
+def iter_point_batches(corpus_dir, years=None, batch_size=1000):
+    """Lists of point dicts, as `parse_patent_file` would have returned them."""
+    for batch in iter_record_batches(corpus_dir, POINT_COLUMNS, years, batch_size):
+        points = []
+        for record in batch.to_pylist():
+            for field in ("publication_date", "application_date"):
+                record[field] = record[field].strftime("%Y%m%d") if record[field] else ""
+            points.append(record_to_point(record))
+        yield points
+
+
+def info(corpus_dir):
+    dataset = open_corpus(corpus_dir)
+    table = dataset.to_table(columns=["year", "week"])
+    counts = table.group_by(["year", "week"]).aggregate([([], "count_all")]).sort_by(
+        [("year", "ascending"), ("week", "ascending")]
+    )
+    for row in counts.to_pylist():
+        print(f"year={row['year']} week={row['week']:02d}: {row['count_all']:,} documents")
+    size = sum(os.path.getsize(path) for path in dataset.files)
+    print(f"{table.num_rows:,} documents in {len(dataset.files)} parts ({size / 1e6:.1f} MB), "
+          f"{len(read_sources(corpus_dir)):,} sources")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse-once Parquet corpus of USPTO XML")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="convert new XML files into the corpus")
+    build_parser.add_argument("--data", default=os.environ.get("DATA_DIR", "/data"))
+    build_parser.add_argument("--out", default=os.environ.get("CORPUS_DIR"), required=not os.environ.get("CORPUS_DIR"))
+    build_parser.add_argument("--workers", type=int, default=PARSE_WORKERS)
+    build_parser.add_argument("--limit-files", type=int, default=0)
+    info_parser = commands.add_parser("info", help="documents per partition")
+    info_parser.add_argument("--corpus", default=os.environ.get("CORPUS_DIR"), required=not os.environ.get("CORPUS_DIR"))
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        files, rows = build(args.data, args.out, args.workers, args.limit_files)
+        logging.info(f"🎉 Added {files:,} files ({rows:,} documents) to '{args.out}' "
+                     f"in {time.perf_counter() - started:.1f}s")
+    else:
+        info(args.corpus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Offline pass that moves an existing collection to slim payloads: abstract
+and file path are copied into the `DOC_STORE_PATH` sidecar store,
+and those fields plus the derived `googlePatentUrl` and `preview` are deleted
+from the points. Vectors are left untouched. Points already migrated are
+skipped, so an interrupted run can be restarted.
+
+    docker run --rm -v /mnt/storage_pool/docstore:/docstore -e DOC_STORE_PATH=/docstore/uspto.sqlite \
+        -e QDRANT_HOST=host.docker.internal patent-vectorizer python slim_payloads.py
+    python slim_payloads.py --report-only
+
+Before and after the move it reports the mean payload size per point (and
+the estimate for the whole collection), the store size, and the latency of
+`--searches` random-vector searches returning `--top-k` points with their
+payloads, as the API runs them. Qdrant reclaims the space of deleted
+payload fields when its optimizers vacuum the segments, so disk use shrinks
+some time after the run.
+"""
+import argparse
+import json
+import logging
+import random
+import statistics
+import time
+
+from qdrant_client import QdrantClient
+from qdrant_client import models as qdrant_models
+
+from doc_store import DERIVED_FIELDS, STORED_FIELDS, split_payload
+from vectorize_gpu import (
+    COLLECTION_NAME,
+    QDRANT_HOST,
+    QDRANT_PORT,
+    QDRANT_UPSERT_CHUNK,
+    get_doc_store,
+    resolve_alias,
+)
+
+MOVED_FIELDS = list(STORED_FIELDS + DERIVED_FIELDS)
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def report(client, collection, doc_store, args):
+    """Payload size and search latency of the collection as it is now."""
+    points, _ = client.scroll(
+        collection_name=collection, limit=args.sample, with_payload=True, with_vectors=False
+    )
+    payload_bytes = [len(json.dumps(p.payload or {}, separators=(",", ":")).encode("utf-8")) for p in points]
+    total = client.count(collection_name=collection, exact=False).count
+    vectors = client.get_collection(collection).config.params.vectors
+    dimension = (vectors[""] if isinstance(vectors, dict) else vectors).size
+
+    rng = random.Random(args.seed)
+    latencies = []
+    for index in range(args.searches + 1):
+        vector = [rng.gauss(0.0, 1.0) for _ in range(dimension)]
+        started = time.perf_counter()
+        client.query_points(collection_name=collection, query=vector, limit=args.top_k, with_payload=True)
+        if index:  # the first search warms up
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    mean_bytes = statistics.mean(payload_bytes) if payload_bytes else 0
+    return {
+        "points": total,
+        "payloadBytesPerPoint": round(mean_bytes),
+        "estimatedPayloadMb": round(mean_bytes * total / 1e6, 1),
+        "docStoreMb": round(doc_store.size_bytes() / 1e6, 1) if doc_store else None,
+        "searchP50Ms": round(statistics.median(latencies), 2) if latencies else None,
+        "searchP95Ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+    }
+
+
+def migrate(client, collection, doc_store):
+    # Points that still carry any of the moved fields
+    unmigrated = qdrant_models.Filter(should=[
+        qdrant_models.Filter(must_not=[
+            qdrant_models.IsEmptyCondition(is_empty=qdrant_models.PayloadField(key=field))
+        ])
+        for field in MOVED_FIELDS
+    ])
+    total_moved = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            scroll_filter=unmigrated,
+            limit=QDRANT_UPSERT_CHUNK,
+            offset=offset,
+            with_payload=MOVED_FIELDS,
+            with_vectors=False,
+        )
+        if points:
+            # Store first, so no point ever loses a field the store does not have
+            doc_store.put_many(
+                (str(point.id), split_payload(point.payload or {})[1]) for point in points
+            )
+            client.delete_payload(
+                collection_name=collection,
+                keys=MOVED_FIELDS,
+                points=[point.id for point in points],
+                wait=False,
+            )
+            total_moved += len(points)
+            logging.info(f"✅ Moved text fields of {total_moved:,} points so far…")
+        if offset is None:
+            break
+    return total_moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move text payload fields into the doc store")
+    parser.add_argument("--report-only", action="store_true", help="measure without changing anything")
+    parser.add_argument("--sample", type=int, default=1000, help="points sampled for the payload size")
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--output", help="write the before/after report here as JSON")
+    args = parser.parse_args()
+
+    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT, timeout=180)
+    collection = resolve_alias(client, COLLECTION_NAME)
+    doc_store = get_doc_store()
+    if doc_store is None and not args.report_only:
+        parser.error("DOC_STORE_PATH must be set")
+
+    result = {"collection": collection, "before": report(client, collection, doc_store, args)}
+    logging.info(f"Before: {result['before']}")
+    if not args.report_only:
+        result["moved"] = migrate(client, collection, doc_store)
+        result["after"] = report(client, collection, doc_store, args)
+        logging.info(f"After: {result['after']}")
+        logging.info(f"🎉 Done! {result['moved']:,} points in '{collection}' now have slim payloads.")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(result, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""
+Streaming USPTO download-and-ingest.
+
+Replaces `scripts/download_data.sh` + a separate `vectorize_gpu.py` pass:
+each weekly `.tar` is read straight off the HTTP response (tar members and
+the nested per-document ZIPs are unpacked in memory) and its XML documents
+are parsed, embedded and upserted while the download is still running.
+Nothing is unpacked to disk. A dropped connection is resumed with an HTTP
+`Range` request from the last byte read.
+
+The release selection (latest `_rN` per week, every SUPP archive), the
+per-year state file, the global download log and `vectorization_log.csv`
+are the same files the shell script maintains, so both can be mixed.
+
+    python stream_ingest.py uspto 2024 [--workers 3] [--keep-archive]
+
+Point `USPTO_API_BASE` at `uspto_standin.py` to run it locally.
+"""
+import argparse
+import calendar
+import fcntl
+import gzip
+import io
+import logging
+import os
+import queue
+import re
+import subprocess
+import tarfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import httpx
+from qdrant_client import QdrantClient
+
+from vectorize_gpu import (
+    QDRANT_HOST,
+    QDRANT_PORT,
+    ensure_collection,
+    fetch_existing_ids,
+    index_documents,
+    load_models,
+    parse_patent_root,
+    split_xml_documents,
+)
+
+USPTO_API_BASE = os.environ.get("USPTO_API_BASE", "https://api.uspto.gov")
+USPTO_PRODUCT = os.environ.get("USPTO_PRODUCT", "appdt")
+STORAGE_ROOT = os.environ.get("STORAGE_ROOT", "/mnt/storage_pool")
+
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", "3"))
+# Minimum spacing between request starts (the shell script slept 2 s per file)
+DOWNLOAD_REQUEST_INTERVAL = float(os.environ.get("DOWNLOAD_REQUEST_INTERVAL", "2"))
+# Shared bandwidth cap across all downloads, bytes/s (0 = unlimited)
+DOWNLOAD_MAX_BYTES_PER_SEC = int(os.environ.get("DOWNLOAD_MAX_BYTES_PER_SEC", "0"))
+DOWNLOAD_MAX_RETRIES = int(os.environ.get("DOWNLOAD_MAX_RETRIES", "6"))
+DOWNLOAD_CHUNK_BYTES = 1 << 20
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "1000"))
+
+_SUPP_NAME = re.compile(r"^I\d{8}-SUPP.*\.tar$")
+_REVISION = re.compile(r"_r(\d+)\.tar$")
+
+
+class DownloadError(Exception):
+    pass
+
+
+class _RetryableStatus(Exception):
+    pass
+
+
+# =========================
+# Release selection / state
+# =========================
+def select_release_files(entries):
+    """
+    Same rule as download_data.sh: every SUPP archive, plus only the highest
+    `_rN` revision of each weekly `.tar`.
+    """
+    best = {}
+    best_rev = {}
+    for file_name, uri in entries:
+        if not file_name.endswith(".tar"):
+            continue
+        if _SUPP_NAME.match(file_name):
+            best[f"SUPP:{file_name}"] = (file_name, uri)
+            continue
+        key = f"WEEK:{file_name[1:9]}"
+        match = _REVISION.search(file_name)
+        rev = int(match.group(1)) if match else 0
+        if key not in best or rev > best_rev[key]:
+            best[key] = (file_name, uri)
+            best_rev[key] = rev
+    return list(best.values())
+
+
+class DownloadState:
+    """The shell script's state, log and vectorization-log files."""
+
+    def __init__(self, jurisdiction, year):
+        self.jurisdiction = jurisdiction
+        self.year = year
+        self.data_dir = os.path.join(STORAGE_ROOT, jurisdiction)
+        self.state_file = os.path.join(self.data_dir, f".download_state_{year}.txt")
+        self.log_file = os.path.join(self.data_dir, f"download_{year}.log")
+        self.global_log = os.path.join(STORAGE_ROOT, "download_state", "global_download_log.txt")
+        self.vector_log = os.path.join(STORAGE_ROOT, "global", "vectorization_log.csv")
+        self.vector_log_lock = os.path.join(STORAGE_ROOT, "global", "vectorization_log.lock")
+        for path in (self.state_file, self.global_log, self.vector_log, self.vector_log_lock):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, "a").close()
+        self._lock = threading.Lock()
+
+    def completed(self):
+        with open(self.state_file, "r") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def mark_completed(self, file_name):
+        with self._lock, open(self.state_file, "a") as f:
+            f.write(file_name + "\n")
+
+    def week_dir_has_xml(self, file_name):
+        """The shell flow's fast-skip: an unpacked week folder already holds XML."""
+        target = os.path.join(self.data_dir, f"I{file_name[1:9]}")
+        if "SUPP" in file_name:
+            target += "-SUPP"
+        if not os.path.isdir(target):
+            return False
+        return any(name.lower().endswith(".xml") for name in os.listdir(target))
+
+    def record_global_state(self, month):
+        entry = f"{self.year}-{month:02d}   {self.jurisdiction.upper()}"
+        with self._lock:
+            with open(self.global_log, "r") as f:
+                if entry in (line.rstrip("\n") for line in f):
+                    return
+            with open(self.global_log, "a") as f:
+                f.write(entry + "\n")
+
+    def append_vector_log(self, file_name, xml_count):
+        """Append `timestamp,year,file,count,running_total` under the shared flock."""
+        with open(self.vector_log_lock, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                current_total = 0
+                with open(self.vector_log, "r") as f:
+                    lines = f.read().splitlines()
+                if lines:
+                    parts = lines[-1].split(",")
+                    if len(parts) >= 5 and parts[4].strip().isdigit():
+                        current_total = int(parts[4].strip())
+                new_total = current_total + xml_count
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                with open(self.vector_log, "a") as f:
+                    f.write(f"{timestamp},{self.year},{file_name},{xml_count},{new_total}\n")
+                return new_total
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def get_api_key():
+    key = os.environ.get("USPTO_API_KEY")
+    if key:
+        return key
+    try:
+        key = subprocess.check_output(
+            ["gcloud", "secrets", "versions", "access", "latest", "--secret=USPTO_API_KEY"],
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        key = ""
+    if not key:
+        raise SystemExit("USPTO_API_KEY is not set and could not be loaded from Secret Manager.")
+    return key
+
+
+# =========================
+# HTTP streaming
+# =========================
+class RateLimiter:
+    """Spaces out request starts and caps total bandwidth across threads."""
+
+    def __init__(self, request_interval, max_bytes_per_sec):
+        self.request_interval = request_interval
+        self.max_bytes_per_sec = max_bytes_per_sec
+        self._lock = threading.Lock()
+        self._next_request = 0.0
+        self._bytes_available = float(max_bytes_per_sec)
+        self._refilled_at = time.monotonic()
+
+    def wait_request(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request)
+            self._next_request = start + self.request_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def consume(self, nbytes):
+        if self.max_bytes_per_sec <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._bytes_available = min(
+                self._bytes_available + (now - self._refilled_at) * self.max_bytes_per_sec,
+                float(self.max_bytes_per_sec),
+            )
+            self._refilled_at = now
+            self._bytes_available -= nbytes
+            deficit = -self._bytes_available
+        if deficit > 0:
+            time.sleep(deficit / self.max_bytes_per_sec)
+
+
+class ResumableStream(io.RawIOBase):
+    """
+    Read-only file object over an HTTP download. When the connection drops
+    (or the server answers 429/5xx) it reconnects with `Range: bytes=<offset>-`
+    and carries on, so readers never see the interruption.
+    """
+
+    def __init__(self, client, url, headers, limiter, tee=None, max_retries=DOWNLOAD_MAX_RETRIES):
+        self.client = client
+        self.url = url
+        self.headers = headers
+        self.limiter = limiter
+        self.tee = tee
+        self.max_retries = max_retries
+        self.offset = 0
+        self.total = None
+        self.resumes = 0
+        self._response = None
+        self._chunks = None
+        self._buffer = b""
+        self._failures = 0
+
+    def readable(self):
+        return True
+
+    def _connect(self):
+        self.limiter.wait_request()
+        headers = dict(self.headers)
+        if self.offset:
+            headers["Range"] = f"bytes={self.offset}-"
+        response = self.client.send(self.client.build_request("GET", self.url, headers=headers), stream=True)
+        if response.status_code == 429 or response.status_code >= 500:
+            response.close()
+            raise _RetryableStatus(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            response.close()
+            raise DownloadError(f"HTTP {response.status_code} for {self.url}")
+        if self.offset and response.status_code != 206:
+            response.close()
+            raise DownloadError("Server ignored the Range request; cannot resume")
+        if self.total is None:
+            length = response.headers.get("content-length")
+            self.total = int(length) if length and length.isdigit() else None
+        self._response = response
+        self._chunks = response.iter_raw()
+
+    def _disconnect(self):
+        if self._response is not None:
+            self._response.close()
+        self._response = None
+        self._chunks = None
+
+    def _next_chunk(self):
+        while True:
+            try:
+                if self._chunks is None:
+                    self._connect()
+                chunk = next(self._chunks)
+                if chunk:
+                    return chunk
+            except StopIteration:
+                self._disconnect()
+                if self.total is None or self.offset >= self.total:
+                    return b""
+                error = DownloadError(f"connection closed at byte {self.offset:,} of {self.total:,}")
+            except (httpx.TransportError, _RetryableStatus) as exc:
+                self._disconnect()
+                error = exc
+            self._failures += 1
+            if self._failures > self.max_retries:
+                raise DownloadError(f"giving up on {self.url} after {self.max_retries} retries: {error}")
+            wait = min(2 ** self._failures, 60)
+            logging.warning(f"Download interrupted ({error}); resuming at byte {self.offset:,} in {wait}s")
+            self.resumes += 1
+            time.sleep(wait)
+
+    def readinto(self, buffer):
+        if not self._buffer:
+            self._buffer = self._next_chunk()
+            if not self._buffer:
+                return 0
+        n = min(len(buffer), len(self._buffer))
+        data, self._buffer = self._buffer[:n], self._buffer[n:]
+        buffer[:n] = data
+        self.offset += n
+        self.limiter.consume(n)
+        if self.tee is not None:
+            self.tee.write(data)
+        return n
+
+    def close(self):
+        self._disconnect()
+        super().close()
+
+
+def iter_archive_documents(fileobj):
+    """
+    Yield `(name, xml_bytes)` for every XML document in a (possibly
+    compressed) tar stream, including XML inside nested ZIP members.
+    Tar members are read strictly in order, so nothing needs to seek.
+    """
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            lower = member.name.lower()
+            if not (lower.endswith(".xml") or lower.endswith(".zip")):
+                continue
+            data = archive.extractfile(member).read()
+            if lower.endswith(".xml"):
+                for document in split_xml_documents(io.BytesIO(data)):
+                    yield member.name, document
+                continue
+            # Per-document ZIPs also hold TIFF drawings; only the XML is read
+            with zipfile.ZipFile(io.BytesIO(data)) as inner:
+                for info in inner.infolist():
+                    if info.filename.lower().endswith(".xml"):
+                        with inner.open(info) as entry:
+                            for document in split_xml_documents(entry):
+                                yield info.filename, document
+
+
+# =========================
+# Ingest
+# =========================
+class StreamIngester:
+    """
+    Single consumer that batches parsed documents from all download threads
+    and embeds/upserts them, so the GPU sees full batches. Producers wait on
+    `wait_indexed(release)` before marking a release completed.
+    """
+
+    def __init__(self, client, models, existing_ids, batch_size=INGEST_BATCH_SIZE):
+        self.client = client
+        self.models = models
+        self.existing_ids = existing_ids
+        self.batch_size = batch_size
+        self.indexed = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=batch_size * 4)
+        self._pending = {}
+        self._done = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, release, doc):
+        if doc["id"] in self.existing_ids:
+            return
+        with self._done:
+            if self.error:
+                raise DownloadError(f"indexing failed: {self.error}")
+            self._pending[release] = self._pending.get(release, 0) + 1
+        self._queue.put((release, doc))
+
+    def wait_indexed(self, release):
+        with self._done:
+            self._done.wait_for(lambda: self.error or not self._pending.get(release))
+            self._pending.pop(release, None)
+            if self.error:
+                raise DownloadError(f"indexing failed: {self.error}")
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            index_documents(self.client, self.models, [doc for _, doc in batch])
+        except Exception as exc:
+            logging.error(f"Indexing batch failed: {exc}")
+            with self._done:
+                self.error = exc
+                self._done.notify_all()
+            return
+        with self._done:
+            for release, doc in batch:
+                self.existing_ids.add(doc["id"])
+                self._pending[release] -= 1
+            self.indexed += len(batch)
+            self._done.notify_all()
+        logging.info(f"✅ Indexed {self.indexed:,} so far…")
+
+    def _run(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                # Quiet stream: don't hold a finished release's tail back
+                self._flush(batch)
+                batch = []
+                continue
+            if item is None:
+                self._flush(batch)
+                return
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+
+
+def ingest_release(client, file_name, uri, api_key, limiter, ingester, state, keep_archive):
+    """Stream one weekly tar into the index; returns the XML document count."""
+    archive_path = None
+    tee = None
+    if keep_archive:
+        archive_dir = os.path.join(state.data_dir, "archive")
+        os.makedirs(archive_dir, exist_ok=True)
+        archive_path = os.path.join(archive_dir, f"{file_name}.gz")
+        tee = gzip.open(archive_path + ".part", "wb", compresslevel=3)
+
+    raw = ResumableStream(client, uri, {"x-api-key": api_key}, limiter, tee=tee)
+    xml_count = 0
+    try:
+        with io.BufferedReader(raw, DOWNLOAD_CHUNK_BYTES) as stream:
+            for name, document in iter_archive_documents(stream):
+                xml_count += 1
+                try:
+                    root = ET.fromstring(document)
+                except ET.ParseError:
+                    logging.error(f"Could not parse {name} in {file_name}")
+                    continue
+                doc_name = os.path.basename(name)
+                if doc_name.endswith(".XML"):
+                    doc_name = doc_name[:-4] + ".xml"
+                doc = parse_patent_root(root, doc_name)
+                if doc:
+                    ingester.put(file_name, doc)
+    except (tarfile.TarError, zipfile.BadZipFile) as exc:
+        raise DownloadError(f"corrupt archive: {exc}") from exc
+    finally:
+        if tee is not None:
+            tee.close()
+    ingester.wait_indexed(file_name)
+    if archive_path:
+        os.replace(archive_path + ".part", archive_path)
+    if raw.resumes:
+        logging.info(f"{file_name}: resumed {raw.resumes} time(s) with Range requests")
+    return xml_count
+
+
+def fetch_file_list(client, api_key, limiter, start_date, end_date):
+    limiter.wait_request()
+    response = client.get(
+        f"{USPTO_API_BASE}/api/v1/datasets/products/{USPTO_PRODUCT}",
+        params={"fileDataFromDate": start_date, "fileDataToDate": end_date, "includeFiles": "true"},
+        headers={"Accept": "application/json", "x-api-key": api_key},
+    )
+    response.raise_for_status()
+    products = response.json().get("bulkDataProductBag") or [{}]
+    files = (products[0].get("productFileBag") or {}).get("fileDataBag") or []
+    return [(f.get("fileName", ""), f.get("fileDownloadURI", "")) for f in files]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream USPTO weekly archives into Qdrant")
+    parser.add_argument("jurisdiction")
+    parser.add_argument("year", type=int)
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS)
+    parser.add_argument("--months", default="1-12", help="e.g. 1-3 or 7")
+    parser.add_argument("--keep-archive", action="store_true",
+                        help="also store each tar gzip-compressed under <data dir>/archive/")
+    args = parser.parse_args()
+
+    jurisdiction = args.jurisdiction.lower()
+    if jurisdiction != "uspto":
+        raise SystemExit("Only uspto is supported for streaming downloads.")
+    if args.year < 2010:
+        raise SystemExit("Automatic downloads only supported for 2010 and later.")
+    first, _, last = args.months.partition("-")
+    months = range(int(first), int(last or first) + 1)
+
+    state = DownloadState(jurisdiction, args.year)
+    file_handler = logging.FileHandler(state.log_file)
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    logging.getLogger().addHandler(file_handler)
+    api_key = get_api_key()
+    limiter = RateLimiter(DOWNLOAD_REQUEST_INTERVAL, DOWNLOAD_MAX_BYTES_PER_SEC)
+
+    models = load_models()
+    qdrant = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT, timeout=180)
+    ensure_collection(qdrant, models[0].get_sentence_embedding_dimension())
+    ingester = StreamIngester(qdrant, models, fetch_existing_ids(qdrant))
+
+    timeout = httpx.Timeout(60.0, read=300.0)
+    completed = state.completed()
+    failed = 0
+    with httpx.Client(follow_redirects=True, timeout=timeout) as client, \
+            ThreadPoolExecutor(max_workers=max(args.workers, 1)) as executor:
+        for month in months:
+            start_date = f"{args.year}-{month:02d}-01"
+            end_date = f"{args.year}-{month:02d}-{calendar.monthrange(args.year, month)[1]:02d}"
+            logging.info(f"Fetching file list for {start_date} to {end_date}")
+            try:
+                releases = select_release_files(fetch_file_list(client, api_key, limiter, start_date, end_date))
+            except (httpx.HTTPError, ValueError) as exc:
+                logging.error(f"Failed to fetch file list for {args.year}-{month:02d}: {exc}")
+                continue
+
+            futures = {}
+            for file_name, uri in releases:
+                if file_name in completed:
+                    logging.info(f"Skip: {file_name} (already completed)")
+                    continue
+                if state.week_dir_has_xml(file_name):
+                    logging.info(f"Skip: {file_name} (week folder already contains XML files)")
+                    state.mark_completed(file_name)
+                    continue
+                futures[file_name] = executor.submit(
+                    ingest_release, client, file_name, uri, api_key, limiter, ingester, state, args.keep_archive
+                )
+
+            for file_name, future in futures.items():
+                try:
+                    xml_count = future.result()
+                except (DownloadError, httpx.HTTPError, OSError) as exc:
+                    failed += 1
+                    logging.error(f"Failed: {file_name} ({exc}). Will retry on the next run.")
+                    continue
+                new_total = state.append_vector_log(file_name, xml_count)
+                state.mark_completed(file_name)
+                logging.info(f"Completed: {file_name} (+{xml_count} XML, total {new_total})")
+
+            state.record_global_state(month)
+
+    ingester.close()
+    logging.info(f"🎉 Done! Indexed {ingester.indexed:,} documents; {failed} release(s) failed.")
+
+
+if __name__ == "__main__":
+    main()
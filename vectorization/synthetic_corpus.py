@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Synthetic USPTO application XML for ingest benchmarks.
+
+Documents carry the elements `parse_patent_xml` reads
+(`publication-reference`, `application-reference`, `invention-title`,
+`abstract`, a `description` with TECHNICAL FIELD / BACKGROUND headings, and
+`claims` with dependent-claim `claim-ref`s). Section lengths are drawn from
+log-normal distributions so file sizes spread like real filings.
+
+    python synthetic_corpus.py --out /tmp/uspto_synth --docs 5000 --layout both
+
+`--layout single` writes one file per document in weekly directories,
+`weekly` writes concatenated `ipaYYMMDD.xml` files like the bulk downloads,
+and `both` writes each layout into its own subdirectory.
+"""
+import argparse
+import datetime
+import os
+import random
+from xml.sax.saxutils import escape
+
+_NOUNS = (
+    "sensor actuator controller battery cell valve lens antenna membrane catalyst rotor "
+    "bearing circuit inverter transistor substrate electrode housing frame shaft gear "
+    "spring latch hinge pump compressor filter nozzle channel reservoir module processor "
+    "memory display camera emitter detector coil magnet piston blade panel cartridge"
+).split()
+_ADJECTIVES = (
+    "thermal optical wireless flexible modular rotating adaptive porous conductive "
+    "transparent removable sealed layered compact integrated distributed redundant"
+).split()
+_VERBS = (
+    "receives transmits regulates couples detects stores converts supports directs "
+    "measures adjusts encloses rotates filters heats cools aligns"
+).split()
+_FIELDS = (
+    "energy storage", "medical devices", "autonomous vehicles", "semiconductor packaging",
+    "wireless communication", "fluid handling", "consumer electronics", "robotics",
+)
+_DOCTYPE = (
+    '<!DOCTYPE us-patent-application SYSTEM "us-patent-application-v46-2022-02-17.dtd" [ ]>'
+)
+
+
+def lognormal_count(rng, median, sigma, minimum=1):
+    return max(int(rng.lognormvariate(0, sigma) * median), minimum)
+
+
+def sentence(rng, words):
+    parts = []
+    for _ in range(words):
+        roll = rng.random()
+        if roll < 0.5:
+            parts.append(rng.choice(_NOUNS))
+        elif roll < 0.75:
+            parts.append(rng.choice(_ADJECTIVES))
+        elif roll < 0.9:
+            parts.append(rng.choice(_VERBS))
+        else:
+            parts.append(rng.choice(("the", "a", "of", "with", "and", "to")))
+    return " ".join(parts).capitalize() + "."
+
+
+def paragraph(rng, words):
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(12, 28))
+        sentences.append(sentence(rng, length))
+        words -= length
+    return " ".join(sentences)
+
+
+def claims_xml(rng, args):
+    count = lognormal_count(rng, args.claims_median, 0.4)
+    independent = {1} | {n for n in range(2, count + 1) if rng.random() < 0.12}
+    claims = []
+    for number in range(1, count + 1):
+        elements = "; ".join(
+            f"a {rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} that {rng.choice(_VERBS)} "
+            f"the {rng.choice(_NOUNS)}"
+            for _ in range(rng.randint(2, 5))
+        )
+        if number in independent:
+            text = f"{number}. A {rng.choice(_NOUNS)} assembly, comprising: {elements}."
+        else:
+            parent = max(n for n in independent if n < number)
+            text = (
+                f'{number}. The assembly of <claim-ref idref="CLM-{parent:05d}">claim {parent}</claim-ref>, '
+                f"wherein {elements}."
+            )
+        claims.append(
+            f'<claim id="CLM-{number:05d}" num="{number:05d}"><claim-text>{text}</claim-text></claim>'
+        )
+    return "<claims>" + "".join(claims) + "</claims>"
+
+
+def description_xml(rng, args):
+    paragraphs = lognormal_count(rng, args.description_paragraphs, args.size_sigma)
+    field = rng.choice(_FIELDS)
+    parts = [
+        '<heading id="h-0001" level="1">TECHNICAL FIELD</heading>',
+        f'<p id="p-0001" num="0001">The present disclosure relates to {field}, and more '
+        f"particularly to {escape(paragraph(rng, 12).lower())}</p>",
+        '<heading id="h-0002" level="1">BACKGROUND</heading>',
+        f'<p id="p-0002" num="0002">{escape(paragraph(rng, 20))} However, existing designs '
+        f"fail to {rng.choice(_VERBS).rstrip('s')} the {rng.choice(_NOUNS)} reliably.</p>",
+        '<heading id="h-0003" level="1">DETAILED DESCRIPTION</heading>',
+    ]
+    for index in range(paragraphs):
+        number = index + 3
+        words = lognormal_count(rng, args.paragraph_words, 0.5, minimum=10)
+        parts.append(f'<p id="p-{number:04d}" num="{number:04d}">{escape(paragraph(rng, words))}</p>')
+    return '<description id="description">' + "".join(parts) + "</description>"
+
+
+def patent_xml(rng, args, doc_number, pub_date, filed_date):
+    title = " ".join(
+        [rng.choice(_ADJECTIVES), rng.choice(_NOUNS), "and", rng.choice(_NOUNS), "system"]
+    ).title()
+    abstract = paragraph(rng, lognormal_count(rng, args.abstract_words, args.size_sigma, minimum=20))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f"{_DOCTYPE}\n"
+        f'<us-patent-application lang="EN" dtd-version="v4.6 2022-02-17" file="US{doc_number}A1-{pub_date}.XML">'
+        "<us-bibliographic-data-application>"
+        "<publication-reference><document-id><country>US</country>"
+        f"<doc-number>{doc_number}</doc-number><kind>A1</kind><date>{pub_date}</date>"
+        f"<document-date>{pub_date}</document-date>"
+        "</document-id></publication-reference>"
+        '<application-reference appl-type="utility"><document-id><country>US</country>'
+        f"<doc-number>{rng.randint(17000000, 18999999)}</doc-number><date>{filed_date}</date>"
+        "</document-id></application-reference>"
+        f"<invention-title>{escape(title)}</invention-title>"
+        "</us-bibliographic-data-application>"
+        f'<abstract id="abstract"><p id="p-0000" num="0000">{escape(abstract)}</p></abstract>'
+        f"{description_xml(rng, args)}"
+        f"{claims_xml(rng, args)}"
+        "</us-patent-application>\n"
+    )
+
+
+def generate_documents(args):
+    """Yield (week date, document XML) in publication order."""
+    rng = random.Random(args.seed)
+    first_week = datetime.date.fromisoformat(args.start_date)
+    per_week = max(args.docs // max(args.weeks, 1), 1)
+    for index in range(args.docs):
+        week = first_week + datetime.timedelta(weeks=min(index // per_week, args.weeks - 1))
+        filed = week - datetime.timedelta(days=rng.randint(400, 900))
+        doc_number = f"{week.year}{args.first_number + index:07d}"
+        yield week, patent_xml(rng, args, doc_number, week.strftime("%Y%m%d"), filed.strftime("%Y%m%d"))
+
+
+def write_single(args, out_dir):
+    """One file per document, grouped in weekly directories."""
+    files = total_bytes = 0
+    for index, (week, document) in enumerate(generate_documents(args)):
+        week_dir = os.path.join(out_dir, f"I{week.strftime('%Y%m%d')}")
+        os.makedirs(week_dir, exist_ok=True)
+        data = document.encode("utf-8")
+        with open(os.path.join(week_dir, f"US{index:08d}.xml"), "wb") as f:
+            f.write(data)
+        files += 1
+        total_bytes += len(data)
+    return files, total_bytes
+
+
+def write_weekly(args, out_dir):
+    """Concatenated weekly files, one XML declaration per document."""
+    os.makedirs(out_dir, exist_ok=True)
+    handles = {}
+    total_bytes = 0
+    try:
+        for week, document in generate_documents(args):
+            if week not in handles:
+                path = os.path.join(out_dir, f"ipa{week.strftime('%y%m%d')}.xml")
+                handles[week] = open(path, "wb")
+            data = document.encode("utf-8")
+            handles[week].write(data)
+            total_bytes += len(data)
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return len(handles), total_bytes
+
+
+def add_arguments(parser):
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--layout", choices=("single", "weekly", "both"), default="single")
+    parser.add_argument("--weeks", type=int, default=4)
+    parser.add_argument("--start-date", default="2024-01-04", help="first publication Thursday")
+    parser.add_argument("--first-number", type=int, default=1000)
+    parser.add_argument("--abstract-words", type=int, default=130, help="median abstract length")
+    parser.add_argument("--description-paragraphs", type=int, default=60, help="median paragraph count")
+    parser.add_argument("--paragraph-words", type=int, default=90, help="median words per paragraph")
+    parser.add_argument("--claims-median", type=int, default=18)
+    parser.add_argument("--size-sigma", type=float, default=0.6, help="log-normal spread of section sizes")
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic USPTO XML")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    layouts = ("single", "weekly") if args.layout == "both" else (args.layout,)
+    for layout in layouts:
+        out_dir = os.path.join(args.out, layout) if args.layout == "both" else args.out
+        writer = write_single if layout == "single" else write_weekly
+        files, total_bytes = writer(args, out_dir)
+        print(f"{layout}: {args.docs:,} documents in {files:,} files, {total_bytes / 1e6:.1f} MB -> {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the USPTO bulk-data API, for testing `stream_ingest.py`
+without network access or an API key.
+
+Builds weekly `I<date>.tar` archives shaped like the real ones (one ZIP per
+document holding the XML and a drawing) from `synthetic_corpus.py`
+documents. It serves them with the same file-list JSON as
+`/api/v1/datasets/products/appdt` and supports HTTP `Range`. It also
+publishes a superseded revision and a SUPP archive to exercise release
+selection. `--drop-after` cuts the first response for every file after
+that many bytes so the resume path runs.
+
+    python uspto_standin.py --year 2024 --weeks 3 --docs-per-week 40 --port 8799
+    USPTO_API_BASE=http://127.0.0.1:8799 USPTO_API_KEY=test STORAGE_ROOT=/tmp/pool \\
+        python stream_ingest.py uspto 2024 --months 1
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import re
+import tarfile
+import tempfile
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import synthetic_corpus
+
+_RANGE = re.compile(r"bytes=(\d+)-(\d*)$")
+
+
+def first_thursday(year):
+    day = datetime.date(year, 1, 1)
+    return day + datetime.timedelta(days=(3 - day.weekday()) % 7)
+
+
+def build_week_tar(path, week, documents):
+    stamp = week.strftime("%Y%m%d")
+    with tarfile.open(path, "w") as archive:
+        for index, document in enumerate(documents):
+            doc_name = f"US{stamp[:4]}{index:07d}A1-{stamp}"
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as inner:
+                inner.writestr(f"{doc_name}/{doc_name}.XML", document)
+                inner.writestr(f"{doc_name}/{doc_name}-D00000.TIF", os.urandom(2048))
+            data = buffer.getvalue()
+            info = tarfile.TarInfo(f"I{stamp}/UTIL{index // 500:04d}/{doc_name}.ZIP")
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def build_releases(args, out_dir):
+    """Write the archives; returns [(file name, week date)]."""
+    corpus_args = argparse.Namespace(**vars(args))
+    corpus_args.docs = args.weeks * args.docs_per_week
+    corpus_args.start_date = first_thursday(args.year).isoformat()
+    weeks = {}
+    for week, document in synthetic_corpus.generate_documents(corpus_args):
+        weeks.setdefault(week, []).append(document)
+
+    releases = []
+    for position, (week, documents) in enumerate(sorted(weeks.items())):
+        stamp = week.strftime("%Y%m%d")
+        names = [f"I{stamp}.tar"]
+        if position == 0:
+            # A corrected re-release supersedes the original, and a SUPP rides along
+            names = [f"I{stamp}.tar", f"I{stamp}_r1.tar", f"I{stamp}-SUPP.tar"]
+        for name in names:
+            subset = documents[: max(len(documents) // 4, 1)] if "SUPP" in name else documents
+            build_week_tar(os.path.join(out_dir, name), week, subset)
+            releases.append((name, week))
+    return releases
+
+
+def make_handler(args, out_dir, releases):
+    dropped = set()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+        def _json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if not self.headers.get("x-api-key"):
+                return self._json(401, {"error": "missing x-api-key"})
+            url = urlsplit(self.path)
+            if url.path.startswith("/api/v1/datasets/products/"):
+                return self.file_list(parse_qs(url.query))
+            if url.path.startswith("/files/"):
+                return self.file(os.path.basename(url.path))
+            return self._json(404, {"error": "not found"})
+
+        def file_list(self, query):
+            start = datetime.date.fromisoformat(query.get("fileDataFromDate", ["1970-01-01"])[0])
+            end = datetime.date.fromisoformat(query.get("fileDataToDate", ["2999-12-31"])[0])
+            host = self.headers.get("host", f"127.0.0.1:{args.port}")
+            bag = [
+                {
+                    "fileName": name,
+                    "fileDownloadURI": f"http://{host}/files/{name}",
+                    "fileDataFromDate": week.isoformat(),
+                    "fileSize": os.path.getsize(os.path.join(out_dir, name)),
+                }
+                for name, week in releases
+                if start <= week <= end
+            ]
+            bag.append({"fileName": "README.txt", "fileDownloadURI": f"http://{host}/files/README.txt"})
+            self._json(200, {"bulkDataProductBag": [{"productFileBag": {"fileDataBag": bag}}]})
+
+        def file(self, name):
+            path = os.path.join(out_dir, name)
+            if not os.path.isfile(path):
+                return self._json(404, {"error": "not found"})
+            size = os.path.getsize(path)
+            start, end = 0, size - 1
+            match = _RANGE.match(self.headers.get("range", ""))
+            if match:
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else size - 1
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Type", "application/x-tar")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+
+            limit = end - start + 1
+            with lock:
+                drop = args.drop_after > 0 and name not in dropped and not match
+                if drop:
+                    dropped.add(name)
+                    limit = min(limit, args.drop_after)
+            with open(path, "rb") as f:
+                f.seek(start)
+                remaining = limit
+                while remaining > 0:
+                    chunk = f.read(min(remaining, 64 * 1024))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+            if drop:
+                self.close_connection = True
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local USPTO bulk-data API stand-in")
+    synthetic_corpus.add_arguments(parser)
+    parser.set_defaults(out=None, description_paragraphs=20)
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--docs-per-week", type=int, default=40)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--drop-after", type=int, default=0,
+                        help="cut the first full download of each file after this many bytes")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    out_dir = args.out or tempfile.mkdtemp(prefix="uspto-standin-")
+    os.makedirs(out_dir, exist_ok=True)
+    releases = build_releases(args, out_dir)
+    print(f"Serving {len(releases)} archives from {out_dir} on http://{args.host}:{args.port}", flush=True)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args, out_dir, releases))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 import os
 import glob
+import json
 import logging
 import uuid
 import xml.etree.ElementTree as ET
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 from time import sleep
 
 import torch
@@ -13,6 +15,11 @@ from qdrant_client import models as qdrant_models
 from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
+from claims import CLAIM_VECTOR_NAME, claim_texts
+from doc_store import open_store, split_payload
+from encoder_pool import EncoderPool
+from lexical import SPARSE_VECTOR_NAME, document_vector
+
 # =========================
 # Config (env-overridable)
 # =========================
@@ -20,16 +27,41 @@ DATA_DIR = os.environ.get("DATA_DIR", "/data")
 QDRANT_HOST = os.environ.get("QDRANT_HOST", "qdrant")
 QDRANT_PORT = int(os.environ.get("QDRANT_PORT", "6333"))
 COLLECTION_NAME = os.environ.get("COLLECTION_NAME", "uspto_patents")
+# Per-collection tuning as JSON, e.g. a frozen partition of past years:
+# COLLECTION_OPTIMIZERS='{"default_segment_number": 2, "max_segment_size": 2000000}'
+COLLECTION_OPTIMIZERS = os.environ.get("COLLECTION_OPTIMIZERS", "")
+COLLECTION_HNSW = os.environ.get("COLLECTION_HNSW", "")
+
+# DOC_STORE_PATH (see doc_store.py) moves abstract and file path out
+# of the Qdrant payload into a sidecar store
 
 # Vectorization controls
 CONCURRENT_FILE_READERS = int(os.environ.get("CONCURRENT_FILE_READERS", "24"))
 GPU_BATCH_SIZE = int(os.environ.get("GPU_BATCH_SIZE", "512"))
 QDRANT_UPSERT_CHUNK = int(os.environ.get("QDRANT_UPSERT_CHUNK", "1000"))
 MODEL_NAME = os.environ.get("MODEL_NAME", "all-MiniLM-L6-v2")
+# Encoder worker processes: -1 = one per GPU (or CPU cores / ENCODER_THREADS),
+# 0 = a single in-process model
+ENCODER_WORKERS = int(os.environ.get("ENCODER_WORKERS", "-1"))
+ENCODER_THREADS = int(os.environ.get("ENCODER_THREADS", "4"))
+# Padded tokens per micro-batch; 0 = GPU_BATCH_SIZE full-length texts on GPU, 8192 on CPU
+ENCODER_TOKEN_BUDGET = int(os.environ.get("ENCODER_TOKEN_BUDGET", "0"))
+# BM25 term weights in the `lexical` sparse vector, for keyword and hybrid search
+SPARSE_VECTORS = os.environ.get("SPARSE_VECTORS", "1").lower() not in ("0", "false", "no")
+# Independent claims per patent embedded into the `claims` multivector, next
+# to the title+abstract vector (see claims.py); 0 = no claim vectors
+CLAIM_VECTORS = int(os.environ.get("CLAIM_VECTORS", "0"))
+# In-RAM copy of the claim vectors: int8 (originals stay on disk) or none
+CLAIM_QUANTIZATION = os.environ.get("CLAIM_QUANTIZATION", "int8").strip().lower()
+BATCH_XML_COUNT = 1000  # process 1000 at a time
 
 # Optional limiter during initial prod runs (0 = no limit)
 LIMIT_FILES = int(os.environ.get("LIMIT_FILES", "0"))
 
+# Read the parse-once Parquet corpus (parquet_corpus.py) instead of XML when set
+CORPUS_DIR = os.environ.get("CORPUS_DIR", "")
+CORPUS_YEARS = [y for y in os.environ.get("CORPUS_YEARS", "").split(",") if y.strip()]
+
 # Logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -44,58 +76,102 @@ def get_full_text_from_tag(element, tag_path):
     return " ".join(t.strip() for t in node.itertext() if t and t.strip())
 
 
+def extract_patent_record(root, file_name, id_fallback=None):
+    """
+    Flat record of the parsed fields of one patent document, or None when it
+    has no text. This is what the Parquet corpus stores; `record_to_point`
+    turns it into a Qdrant point.
+    """
+    # Fields
+    title = get_full_text_from_tag(root, ".//invention-title")
+    abstract_text = get_full_text_from_tag(root, ".//abstract")
+    description_text = get_full_text_from_tag(root, ".//description")
+    claims_text = get_full_text_from_tag(root, ".//claims")
+    if not any((title, abstract_text, description_text, claims_text)):
+        return None
+
+    # Dates (try publication date, fall back to application date if available)
+    pub_date_node = root.find(".//publication-reference/document-id/document-date")
+    app_date_node = root.find(".//application-reference/document-id/date")
+    publication_date = (pub_date_node.text or "").strip() if pub_date_node is not None else ""
+    application_date = (app_date_node.text or "").strip() if app_date_node is not None else ""
+
+    # Patent/publication number (publication doc-number is standard for A1/A9 etc.)
+    doc_id_node = root.find(".//publication-reference/document-id/doc-number")
+    patent_number = (doc_id_node.text or "").strip() if doc_id_node is not None else ""
+
+    # Deterministic ID (prefer patent_number; else file basename)
+    source_id_string = patent_number or id_fallback or file_name
+
+    return {
+        "id": str(uuid.uuid5(uuid.NAMESPACE_DNS, source_id_string)),
+        "patent_number": patent_number,
+        "title": title,
+        "abstract": abstract_text,
+        "claims": claims_text,
+        "description": description_text,
+        "publication_date": publication_date,
+        "application_date": application_date,
+        "source_file": file_name,
+    }
+
+
+def filing_date_int(filing_date):
+    """`YYYYMMDD` as an integer (20240118), or None when it is not a date."""
+    digits = (filing_date or "").replace("-", "").strip()
+    return int(digits) if len(digits) == 8 and digits.isdigit() else None
+
+
+def record_to_point(record):
+    """Point dict (id, text to embed, payload) for one patent record."""
+    title = record["title"]
+    abstract_text = record["abstract"]
+    description_text = record["description"]
+    patent_number = record["patent_number"]
+
+    # Combined text for embedding
+    combined_text = " ".join(filter(None, [title, abstract_text, description_text, record["claims"]]))
+
+    # Preview + external URLs
+    preview_source = abstract_text or description_text or title
+    preview = (preview_source[:500] + "…") if len(preview_source) > 500 else preview_source
+
+    google_url = f"https://patents.google.com/patent/US{patent_number}/en" if patent_number else ""
+    filing_date = record["publication_date"] or record["application_date"]
+
+    return {
+        "id": record["id"],
+        "text_for_embedding": combined_text,
+        "sparse_vector": document_vector(
+            {"title": title, "abstract": abstract_text, "claims": record["claims"]}
+        ) if SPARSE_VECTORS else None,
+        "claim_texts": claim_texts(
+            title, abstract_text, record["claims"], CLAIM_VECTORS
+        ) if CLAIM_VECTORS else None,
+        "payload": {
+            "title": title,
+            "abstract": abstract_text,
+            "filingDate": filing_date,
+            # Sortable copy for range filters (payload-indexed)
+            "filingDateInt": filing_date_int(filing_date),
+            "patentNumber": patent_number,
+            "googlePatentUrl": google_url,
+            "preview": preview,
+            "file_path": record["source_file"],
+        },
+    }
+
+
+def parse_patent_root(root, file_name, id_fallback=None):
+    """Point dict for one parsed patent document, or None when it has no text."""
+    record = extract_patent_record(root, file_name, id_fallback)
+    return record_to_point(record) if record else None
+
+
 def parse_patent_xml(file_path):
     try:
         tree = ET.parse(file_path)
-        root = tree.getroot()
-
-        # Fields
-        title = get_full_text_from_tag(root, ".//invention-title")
-        abstract_text = get_full_text_from_tag(root, ".//abstract")
-        description_text = get_full_text_from_tag(root, ".//description")
-        claims_text = get_full_text_from_tag(root, ".//claims")
-
-        # Dates (try publication date, fall back to application date if available)
-        pub_date_node = root.find(".//publication-reference/document-id/document-date")
-        app_date_node = root.find(".//application-reference/document-id/date")
-        filing_date = ""
-        if pub_date_node is not None and pub_date_node.text:
-            filing_date = pub_date_node.text
-        elif app_date_node is not None and app_date_node.text:
-            filing_date = app_date_node.text
-
-        # Patent/publication number (publication doc-number is standard for A1/A9 etc.)
-        doc_id_node = root.find(".//publication-reference/document-id/doc-number")
-        patent_number = (doc_id_node.text or "").strip() if doc_id_node is not None else ""
-
-        # Combined text for embedding
-        combined_text = " ".join(filter(None, [title, abstract_text, description_text, claims_text]))
-        if not combined_text:
-            return None
-
-        # Deterministic ID (prefer patent_number; else file basename)
-        source_id_string = patent_number if patent_number else os.path.basename(file_path)
-        point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, source_id_string))
-
-        # Preview + external URLs
-        preview_source = abstract_text or description_text or title
-        preview = (preview_source[:500] + "…") if len(preview_source) > 500 else preview_source
-
-        google_url = f"https://patents.google.com/patent/US{patent_number}/en" if patent_number else ""
-
-        return {
-            "id": point_id,
-            "text_for_embedding": combined_text,
-            "payload": {
-                "title": title,
-                "abstract": abstract_text,
-                "filingDate": filing_date,
-                "patentNumber": patent_number,
-                "googlePatentUrl": google_url,
-                "preview": preview,
-                "file_path": os.path.basename(file_path),
-            },
-        }
+        return parse_patent_root(tree.getroot(), os.path.basename(file_path))
     except ET.ParseError:
         logging.error(f"Could not parse XML file: {file_path}")
         return None
@@ -104,6 +180,53 @@ def parse_patent_xml(file_path):
         return None
 
 
+def split_xml_documents(lines):
+    """
+    Yield each XML document in a stream of byte lines. Weekly USPTO bulk
+    files concatenate thousands of documents, each with its own `<?xml`
+    declaration.
+    """
+    chunk = []
+    has_content = False
+    for line in lines:
+        if line.lstrip().startswith(b"<?xml") and has_content:
+            yield b"".join(chunk)
+            chunk, has_content = [], False
+        chunk.append(line)
+        has_content = has_content or bool(line.strip())
+    if has_content:
+        yield b"".join(chunk)
+
+
+def iter_xml_documents(file_path):
+    with open(file_path, "rb") as f:
+        yield from split_xml_documents(f)
+
+
+def parse_patent_file(file_path, parse_root=parse_patent_root):
+    """
+    All patents in one file, whether one-document or concatenated weekly
+    layout. `parse_root=extract_patent_record` returns flat records instead
+    of points.
+    """
+    file_name = os.path.basename(file_path)
+    docs = []
+    try:
+        for index, document in enumerate(iter_xml_documents(file_path)):
+            try:
+                root = ET.fromstring(document)
+            except ET.ParseError:
+                logging.error(f"Could not parse document {index} in XML file: {file_path}")
+                continue
+            # Single-document files keep their basename as the ID fallback
+            doc = parse_root(root, file_name, f"{file_name}#{index}" if index else None)
+            if doc:
+                docs.append(doc)
+    except Exception as e:
+        logging.error(f"Unexpected error parsing {file_path}: {e}")
+    return docs
+
+
 def upsert_with_retry(client, collection_name, points, max_retries=3):
     for attempt in range(max_retries):
         try:
@@ -125,51 +248,194 @@ def walk_xml_files(root_dir):
             if f.lower().endswith(".xml"):
                 yield os.path.join(dirpath, f)
 
-def main():
-    # ====== Model setup (multi-GPU) ======
+def encoder_devices(workers=ENCODER_WORKERS, threads=ENCODER_THREADS):
+    """Device per encoder worker: GPUs round-robin, else CPU workers that fit the cores."""
     num_gpus = torch.cuda.device_count()
+    if num_gpus:
+        count = workers if workers > 0 else num_gpus
+        return [f"cuda:{i % num_gpus}" for i in range(count)]
+    count = workers if workers > 0 else max((os.cpu_count() or 1) // max(threads, 1), 1)
+    return ["cpu"] * count
+
+
+def load_models():
+    """
+    `[EncoderPool]` over `encoder_devices()`, or with `ENCODER_WORKERS=0` a
+    single in-process CUDA/CPU model. Either way `models[0]` has
+    `get_sentence_embedding_dimension()` and `encode_texts` accepts the list.
+    """
     logging.info(f"Loading SentenceTransformer: {MODEL_NAME}")
-
-    if num_gpus > 1:
-        logging.info(f"🔥 Loading model on {num_gpus} GPUs")
-        models = [SentenceTransformer(MODEL_NAME, device=f"cuda:{i}") for i in range(num_gpus)]
-        for m in models:
-            m.eval()
-        logging.info(f"✅ {num_gpus} models ready")
-    else:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        models = [SentenceTransformer(MODEL_NAME, device=device)]
-        models[0].eval()
-        logging.info(f"✅ Model ready on {models[0]._target_device}")
-
-    # ====== Qdrant client ======
-    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT, timeout=180)
-    embedding_size = models[0].get_sentence_embedding_dimension()
-
-    # Create or resume
+    if ENCODER_WORKERS != 0:
+        devices = encoder_devices()
+        on_gpu = devices[0].startswith("cuda")
+        max_batch = GPU_BATCH_SIZE if on_gpu else 64
+        logging.info(f"🔥 Starting {len(devices)} encoder workers")
+        pool = EncoderPool(
+            MODEL_NAME,
+            devices,
+            # GPUs get one CPU thread each for tokenization
+            threads=1 if on_gpu else min(ENCODER_THREADS, os.cpu_count() or 1),
+            token_budget=ENCODER_TOKEN_BUDGET or (max_batch * 256 if on_gpu else 8192),
+            max_batch=max_batch,
+        )
+        return [pool]
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    models = [SentenceTransformer(MODEL_NAME, device=device)]
+    models[0].eval()
+    logging.info(f"✅ Model ready on {models[0].device}")
+    return models
+
+
+def optimizer_settings():
+    """The `COLLECTION_OPTIMIZERS` fields as a dict."""
+    return json.loads(COLLECTION_OPTIMIZERS) if COLLECTION_OPTIMIZERS else {}
+
+
+def collection_tuning(**optimizer_overrides):
+    """Optimizer and HNSW overrides from the environment (plus `optimizer_overrides`), or None."""
+    optimizers = hnsw = None
+    optimizer_fields = {**optimizer_settings(), **optimizer_overrides}
+    if optimizer_fields:
+        optimizers = qdrant_models.OptimizersConfigDiff(**optimizer_fields)
+    if COLLECTION_HNSW:
+        hnsw = qdrant_models.HnswConfigDiff(**json.loads(COLLECTION_HNSW))
+    return optimizers, hnsw
+
+
+# Payload fields the API filters on, and their index types
+PAYLOAD_INDEXES = {
+    "filingDateInt": qdrant_models.IntegerIndexParams(
+        type=qdrant_models.IntegerIndexType.INTEGER, lookup=False, range=True
+    ),
+    "patentNumber": qdrant_models.PayloadSchemaType.KEYWORD,
+}
+
+
+def ensure_payload_indexes(client, collection_name=None):
+    """
+    Create the filter indexes (a no-op when they exist). On a new collection
+    this runs before any upload, so HNSW segments are built with the extra
+    payload-aware links that keep filtered searches on the graph.
+    """
+    collection_name = collection_name or COLLECTION_NAME
+    existing = client.get_collection(collection_name).payload_schema or {}
+    for field, schema in PAYLOAD_INDEXES.items():
+        if field not in existing:
+            logging.info(f"🗂️  Creating payload index on '{field}'")
+            client.create_payload_index(collection_name=collection_name, field_name=field, field_schema=schema)
+
+
+def resolve_alias(client, name):
+    """Collection an alias points to, or `name` itself when it is not an alias."""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
+    return name
+
+
+def vector_names(client, collection_name=None):
+    """Names of the collection's sparse and named dense vectors."""
+    params = client.get_collection(collection_name or COLLECTION_NAME).config.params
+    names = set(params.sparse_vectors or {})
+    if isinstance(params.vectors, dict):
+        names.update(params.vectors)
+    return names
+
+
+def has_sparse_vectors(client, collection_name=None):
+    """True when the collection was created with the `lexical` sparse vector."""
+    return SPARSE_VECTOR_NAME in vector_names(client, collection_name)
+
+
+def has_claim_vectors(client, collection_name=None):
+    """True when the collection was created with the `claims` multivector."""
+    return CLAIM_VECTOR_NAME in vector_names(client, collection_name)
+
+
+def claim_vector_params(embedding_size, quantization_type=CLAIM_QUANTIZATION):
+    """
+    The `claims` multivector: MaxSim over the patent's vectors, originals on
+    disk and (by default) an int8 copy in RAM for the HNSW search.
+    """
+    quantization = None
+    if quantization_type == "int8":
+        quantization = qdrant_models.ScalarQuantization(
+            scalar=qdrant_models.ScalarQuantizationConfig(type=qdrant_models.ScalarType.INT8, always_ram=True)
+        )
+    return qdrant_models.VectorParams(
+        size=embedding_size,
+        distance=qdrant_models.Distance.COSINE,
+        on_disk=True,
+        multivector_config=qdrant_models.MultiVectorConfig(
+            comparator=qdrant_models.MultiVectorComparator.MAX_SIM
+        ),
+        quantization_config=quantization,
+    )
+
+
+def ensure_collection(client, embedding_size, defer_indexing=False):
+    """
+    Create the collection (or reuse it; writes through an alias go to the
+    collection behind it). `defer_indexing` creates it with HNSW indexing
+    off, for bulk builds that switch it on once the upload is done.
+    """
+    optimizers, hnsw = collection_tuning()
+    collection_name = resolve_alias(client, COLLECTION_NAME)
     try:
-        exists = client.collection_exists(COLLECTION_NAME)
+        exists = client.collection_exists(collection_name)
     except Exception:
         try:
-            client.get_collection(COLLECTION_NAME)
+            client.get_collection(collection_name)
             exists = True
         except Exception:
             exists = False
 
     if not exists:
         logging.info(f"🆕 Creating collection '{COLLECTION_NAME}'")
+        if defer_indexing:
+            # Plain segments while uploading; the HNSW graph is built once at the end
+            optimizers, hnsw = collection_tuning(indexing_threshold=0)
+        vectors_config = qdrant_models.VectorParams(
+            size=embedding_size,
+            distance=qdrant_models.Distance.COSINE,
+            on_disk=True,
+        )
+        if CLAIM_VECTORS:
+            # "" keeps the main vector unnamed, as in collections without claims
+            vectors_config = {"": vectors_config, CLAIM_VECTOR_NAME: claim_vector_params(embedding_size)}
         client.create_collection(
             collection_name=COLLECTION_NAME,
-            vectors_config=qdrant_models.VectorParams(
-                size=embedding_size,
-                distance=qdrant_models.Distance.COSINE,
-                on_disk=True,
+            vectors_config=vectors_config,
+            sparse_vectors_config=(
+                # Qdrant weighs the stored BM25 term frequencies by IDF at query time
+                {SPARSE_VECTOR_NAME: qdrant_models.SparseVectorParams(modifier=qdrant_models.Modifier.IDF)}
+                if SPARSE_VECTORS else None
             ),
+            optimizers_config=optimizers,
+            hnsw_config=hnsw,
         )
     else:
-        logging.info(f"↩️  Resuming with existing collection '{COLLECTION_NAME}'")
+        logging.info(f"↩️  Resuming with existing collection '{collection_name}'")
+        if optimizers or hnsw:
+            client.update_collection(
+                collection_name=collection_name, optimizers_config=optimizers, hnsw_config=hnsw
+            )
+        if SPARSE_VECTORS and not has_sparse_vectors(client, collection_name):
+            logging.warning(
+                f"'{collection_name}' has no '{SPARSE_VECTOR_NAME}' sparse vector; indexing dense "
+                f"vectors only (re-index into a new collection version to add it)"
+            )
+        if CLAIM_VECTORS and not has_claim_vectors(client, collection_name):
+            logging.warning(
+                f"'{collection_name}' has no '{CLAIM_VECTOR_NAME}' multivector; skipping claim vectors "
+                f"(re-index into a new collection version to add it)"
+            )
+    ensure_payload_indexes(client, collection_name)
 
-    # ====== Resume-safety: fetch existing IDs ======
+
+def fetch_existing_ids(client):
+    """IDs already in the collection, so a rerun only indexes new documents."""
     logging.info("🔎 Scanning existing IDs in collection to enable resume…")
     existing_ids = set()
     scroll = client.scroll(collection_name=COLLECTION_NAME, limit=1000, with_payload=False)
@@ -180,17 +446,101 @@ def main():
             break
         scroll = client.scroll(collection_name=COLLECTION_NAME, limit=1000, with_payload=False, offset=scroll.next_page_offset)
     logging.info(f"📦 Found {len(existing_ids):,} existing vectors")
-
+    return existing_ids
+
+
+def encode_texts(models, texts):
+    """Normalized embeddings; an `EncoderPool` spreads micro-batches over its workers."""
+    if isinstance(models[0], EncoderPool):
+        return models[0].encode(texts)
+    return models[0].encode(
+        texts,
+        batch_size=GPU_BATCH_SIZE,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+
+
+_vectors_by_collection = {}
+_doc_store = None
+
+
+def get_doc_store():
+    """The `DOC_STORE_PATH` sidecar store (opened once), or None for full payloads."""
+    global _doc_store
+    if _doc_store is None:
+        _doc_store = open_store()
+    return _doc_store
+
+
+def _writes_vector(client, name):
+    """Whether the target collection has the named vector `name`, looked up once per collection."""
+    if COLLECTION_NAME not in _vectors_by_collection:
+        _vectors_by_collection[COLLECTION_NAME] = vector_names(client, resolve_alias(client, COLLECTION_NAME))
+    return name in _vectors_by_collection[COLLECTION_NAME]
+
+
+def encode_claim_texts(models, parsed_docs):
+    """One multivector (list of vectors) per document, from a single encode call."""
+    groups = [d.get("claim_texts") or [d["text_for_embedding"]] for d in parsed_docs]
+    embeddings = encode_texts(models, [text for group in groups for text in group]).tolist()
+    multivectors, start = [], 0
+    for group in groups:
+        multivectors.append(embeddings[start:start + len(group)])
+        start += len(group)
+    return multivectors
+
+
+def index_documents(client, models, parsed_docs):
+    """Encode and upsert one batch of parsed documents."""
+    texts = [d["text_for_embedding"] for d in parsed_docs]
+    embeddings = encode_texts(models, texts)
+    vectors = embeddings.tolist()
+    named_vectors = {}
+    if SPARSE_VECTORS and _writes_vector(client, SPARSE_VECTOR_NAME):
+        named_vectors[SPARSE_VECTOR_NAME] = [
+            qdrant_models.SparseVector(indices=indices, values=values)
+            for indices, values in (d.get("sparse_vector") or ([], []) for d in parsed_docs)
+        ]
+    if CLAIM_VECTORS and _writes_vector(client, CLAIM_VECTOR_NAME):
+        named_vectors[CLAIM_VECTOR_NAME] = encode_claim_texts(models, parsed_docs)
+    if named_vectors:
+        # "" is the collection's unnamed dense vector
+        vectors = {"": vectors, **named_vectors}
+
+    payloads = [d["payload"] for d in parsed_docs]
+    doc_store = get_doc_store()
+    if doc_store is not None:
+        # Text fields go to the sidecar store before the point exists, so a
+        # resumed run never finds a point without its document
+        split = [split_payload(payload) for payload in payloads]
+        doc_store.put_many((d["id"], document) for d, (_, document) in zip(parsed_docs, split))
+        payloads = [slim for slim, _ in split]
+
+    # ====== Upsert ======
+    upsert_with_retry(
+        client=client,
+        collection_name=COLLECTION_NAME,
+        points=qdrant_models.Batch(
+            ids=[d["id"] for d in parsed_docs],
+            vectors=vectors,
+            payloads=payloads,
+        ),
+    )
+
+    # Manual cleanup
+    del texts, embeddings, vectors, payloads
+    torch.cuda.empty_cache()
+
+
+def iter_xml_batches(data_dir):
+    """Parsed documents of the XML files under `data_dir`, one list per file batch."""
     # ====== Stream XML files instead of list() ======
-    xml_generator = walk_xml_files(DATA_DIR)
+    xml_generator = walk_xml_files(data_dir)
     if LIMIT_FILES and LIMIT_FILES > 0:
-        from itertools import islice
         xml_generator = islice(xml_generator, LIMIT_FILES)
 
-    from itertools import islice
-    total_processed = 0
-    BATCH_XML_COUNT = 1000  # process 1000 at a time
-
     while True:
         batch_files = list(islice(xml_generator, BATCH_XML_COUNT))
         if not batch_files:
@@ -198,74 +548,48 @@ def main():
 
         parsed_docs = []
         with ThreadPoolExecutor(max_workers=CONCURRENT_FILE_READERS) as executor:
-            futures = {executor.submit(parse_patent_xml, f): f for f in batch_files}
+            futures = {executor.submit(parse_patent_file, f): f for f in batch_files}
             for future in tqdm(as_completed(futures), total=len(futures), desc="Parsing XML batch"):
-                doc = future.result()
-                if doc and doc["id"] not in existing_ids:
-                    parsed_docs.append(doc)
+                parsed_docs.extend(future.result())
+        yield parsed_docs
+
 
+def index_corpus(client, models):
+    """Index every document from `CORPUS_DIR` or `DATA_DIR` that is not in the collection yet."""
+    # ====== Resume-safety: fetch existing IDs ======
+    existing_ids = fetch_existing_ids(client)
+
+    total_processed = 0
+    if CORPUS_DIR:
+        from parquet_corpus import iter_point_batches
+        logging.info(f"📚 Reading parsed documents from corpus '{CORPUS_DIR}'")
+        batches = iter_point_batches(CORPUS_DIR, years=CORPUS_YEARS, batch_size=BATCH_XML_COUNT)
+    else:
+        batches = iter_xml_batches(DATA_DIR)
+
+    for batch in batches:
+        parsed_docs = [doc for doc in batch if doc["id"] not in existing_ids]
         if not parsed_docs:
             continue
 
-        texts = [d["text_for_embedding"] for d in parsed_docs]
-
-        # Multi-GPU encoding
-        if len(models) > 1:
-            import numpy as np
-            from threading import Thread
-            chunk_size = max(1, len(texts) // len(models))
-            embeddings_list = [None] * len(models)
-
-            def encode_on_gpu(gpu_id, model, texts_chunk):
-                emb = model.encode(
-                    texts_chunk,
-                    batch_size=GPU_BATCH_SIZE,
-                    show_progress_bar=False,
-                    convert_to_numpy=True,
-                    normalize_embeddings=True,
-                )
-                embeddings_list[gpu_id] = emb
-
-            threads = []
-            for i, model in enumerate(models):
-                start = i * chunk_size
-                end = len(texts) if i == (len(models) - 1) else start + chunk_size
-                t = Thread(target=encode_on_gpu, args=(i, model, texts[start:end]))
-                t.start()
-                threads.append(t)
-            for t in threads:
-                t.join()
-
-            import numpy as np
-            embeddings = np.vstack([e for e in embeddings_list if e is not None])
-        else:
-            embeddings = models[0].encode(
-                texts,
-                batch_size=GPU_BATCH_SIZE,
-                show_progress_bar=False,
-                convert_to_numpy=True,
-                normalize_embeddings=True,
-            )
-
-        # ====== Upsert ======
-        upsert_with_retry(
-            client=client,
-            collection_name=COLLECTION_NAME,
-            points=qdrant_models.Batch(
-                ids=[d["id"] for d in parsed_docs],
-                vectors=embeddings.tolist(),
-                payloads=[d["payload"] for d in parsed_docs],
-            ),
-        )
+        index_documents(client, models, parsed_docs)
 
         total_processed += len(parsed_docs)
         logging.info(f"✅ Indexed {total_processed:,} so far…")
-
-        # Manual cleanup
-        del parsed_docs, texts, embeddings
-        torch.cuda.empty_cache()
+        del parsed_docs
 
     logging.info(f"🎉 Done! Total indexed: {total_processed:,} into '{COLLECTION_NAME}'.")
+    return total_processed
+
+
+def main():
+    # ====== Model setup (multi-GPU) ======
+    models = load_models()
+
+    # ====== Qdrant client ======
+    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT, timeout=180)
+    ensure_collection(client, models[0].get_sentence_embedding_dimension())
+    index_corpus(client, models)
 
 if __name__ == "__main__":
     main()